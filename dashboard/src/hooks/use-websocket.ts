@@ -37,6 +37,11 @@ export function useWebSocket({ url, onMessage, reconnectInterval = 3000 }: UseWe
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        // Answer server heartbeats so the connection is not reaped as idle
+        if (data?.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }));
+          return;
+        }
         onMessageRef.current?.(data);
       } catch {
         // Ignore non-JSON messages
@@ -157,6 +157,11 @@ export type WebSocketMessageType =
   | "drift.resolved"
   | "replay.status"
   | "notification"
+  | "spans.batch"
+  | "subscribed"
+  | "unsubscribed"
+  | "error"
+  | "ping"
   | "pong";
 
 export interface WebSocketMessage {
@@ -0,0 +1,24 @@
+"""Add composite (trace_id, parent_span_id) index for span tree queries.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-07-15 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_spans_trace_id_parent_span_id", "spans", ["trace_id", "parent_span_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spans_trace_id_parent_span_id", table_name="spans")
@@ -0,0 +1,122 @@
+"""Partition traces and spans by day on created_at (PostgreSQL only).
+
+The existing tables are not copied: each is renamed to ``<table>_legacy``
+and attached as the partition covering everything before tomorrow, so the
+migration only rewrites the primary key index and validates the range.
+Daily partitions from tomorrow on are created here and then kept ahead of
+time by ``vigil_server.services.partitions``, which also drops partitions
+past the retention horizon (the legacy partition included).
+
+A partitioned table's unique constraints must include the partition key,
+so the primary keys become ``(id, created_at)``, ``traces.external_id``
+is no longer unique, and the foreign keys to ``traces.id`` are dropped;
+retention removes traces and their spans by dropping partitions rather
+than by cascading deletes.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-08-01 00:00:00.000000
+
+"""
+
+from datetime import UTC, datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREMAKE_DAYS = 7
+
+# table -> [(index name, columns, unique)]
+_INDEXES = {
+    "traces": [
+        ("ix_traces_project_id", "project_id", False),
+        ("ix_traces_created_at", "created_at", False),
+        ("ix_traces_external_id", "external_id", True),
+    ],
+    "spans": [
+        ("ix_spans_trace_id", "trace_id", False),
+        ("ix_spans_parent_span_id", "parent_span_id", False),
+        ("ix_spans_kind", "kind", False),
+        ("ix_spans_status", "status", False),
+        ("ix_spans_start_time", "start_time", False),
+        ("ix_spans_created_at", "created_at", False),
+        ("ix_spans_trace_id_parent_span_id", "trace_id, parent_span_id", False),
+    ],
+}
+
+_FOREIGN_KEYS = [
+    ("spans_trace_id_fkey", "spans", "trace_id"),
+    ("replay_runs_original_trace_id_fkey", "replay_runs", "original_trace_id"),
+]
+
+
+def _partition(table: str, first_day: datetime) -> None:
+    legacy = f"{table}_legacy"
+    op.execute(f"UPDATE {table} SET created_at = now() WHERE created_at IS NULL")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    for name, _, _ in _INDEXES[table]:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+    op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+    op.execute(f"ALTER TABLE {legacy} ADD PRIMARY KEY (id, created_at)")
+
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    )
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+    for name, columns, _ in _INDEXES[table]:
+        op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+    op.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{first_day.isoformat()}')"
+    )
+    for offset in range(PREMAKE_DAYS):
+        start = first_day + timedelta(days=offset)
+        end = start + timedelta(days=1)
+        op.execute(
+            f"CREATE TABLE {table}_p{start:%Y%m%d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+
+def _unpartition(table: str) -> None:
+    plain = f"{table}_plain"
+    op.execute(f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+    op.execute(f"DROP TABLE {table}")
+    op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+    for name, columns, unique in _INDEXES[table]:
+        op.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for name, table, _ in _FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_="foreignkey")
+
+    today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day = today + timedelta(days=1)
+    _partition("traces", first_day)
+    _partition("spans", first_day)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    _unpartition("spans")
+    _unpartition("traces")
+
+    for name, table, column in _FOREIGN_KEYS:
+        # Partition drops may have left rows whose trace is gone.
+        op.execute(f"DELETE FROM {table} WHERE {column} NOT IN (SELECT id FROM traces)")
+        op.create_foreign_key(name, table, "traces", [column], ["id"], ondelete="CASCADE")
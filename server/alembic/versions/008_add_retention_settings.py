@@ -0,0 +1,31 @@
+"""Add per-project retention TTLs and traces.summary.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-08-15 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TTL_COLUMNS = ("payload_ttl_days", "raw_span_ttl_days", "summary_ttl_days")
+
+
+def upgrade() -> None:
+    for column in _TTL_COLUMNS:
+        op.add_column("project_settings", sa.Column(column, sa.Integer(), nullable=True))
+    op.add_column("traces", sa.Column("summary", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("traces", "summary")
+    for column in reversed(_TTL_COLUMNS):
+        op.drop_column("project_settings", column)
@@ -0,0 +1,44 @@
+"""Add archived_traces, the index of traces moved to cold storage.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-09-01 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_traces",
+        sa.Column("id", sa.String(length=64), nullable=False),
+        sa.Column("project_id", sa.String(length=64), nullable=False),
+        sa.Column("trace_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("segment", sa.String(length=512), nullable=False),
+        sa.Column("offset", sa.BigInteger(), nullable=False),
+        sa.Column("length", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_archived_traces_project_id", "archived_traces", ["project_id"])
+    op.create_index("ix_archived_traces_trace_created_at", "archived_traces", ["trace_created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_archived_traces_trace_created_at", table_name="archived_traces")
+    op.drop_index("ix_archived_traces_project_id", table_name="archived_traces")
+    op.drop_table("archived_traces")
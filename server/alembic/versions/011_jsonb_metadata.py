@@ -0,0 +1,40 @@
+"""Store traces/spans metadata as JSONB with GIN indexes (PostgreSQL only).
+
+``jsonb_path_ops`` indexes support the ``@>`` containment queries that
+``metadata.<key>=<value>`` filters compile to.  The type change rewrites
+both tables, so run it in a maintenance window on large databases.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2024-10-01 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TABLES = ("traces", "spans")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in _TABLES:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN metadata TYPE JSONB USING metadata::jsonb")
+        op.execute(
+            f"CREATE INDEX ix_{table}_metadata ON {table} USING gin (metadata jsonb_path_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in _TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_metadata")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN metadata TYPE JSON USING metadata::json")
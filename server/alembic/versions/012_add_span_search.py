@@ -0,0 +1,51 @@
+"""Add the span_search full-text index.
+
+SQLite gets an FTS5 virtual table; PostgreSQL a table with a generated
+tsvector column and a GIN index.  Spans ingested before this migration are
+not indexed.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2024-10-08 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS span_search USING fts5("
+            "content, project_id, trace_id, span_id, created_at UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif dialect == "postgresql":
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS span_search ("
+            "span_id VARCHAR(64) NOT NULL, "
+            "trace_id VARCHAR(64) NOT NULL, "
+            "project_id VARCHAR(64) NOT NULL, "
+            "created_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "content TEXT NOT NULL, "
+            "tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_span_search_tsv ON span_search USING gin (tsv)")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_span_search_project_created "
+            "ON span_search (project_id, created_at)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_span_search_trace_id ON span_search (trace_id)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_span_search_span_id ON span_search (span_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS span_search")
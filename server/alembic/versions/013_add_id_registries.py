@@ -0,0 +1,59 @@
+"""Add the trace and span id registries.
+
+Since migration 007 the partitioned PostgreSQL tables enforce neither
+``traces.id``, ``traces.external_id`` nor ``spans.id`` on their own;
+ingest now claims ids in these unpartitioned tables first.  Existing rows
+are registered here.  On PostgreSQL, ids already duplicated by earlier
+ingests are registered once and the duplicate rows are left in place.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2024-10-20 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trace_registry",
+        sa.Column("id", sa.String(128), primary_key=True),
+        sa.Column("external_id", sa.String(256), nullable=True, unique=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_trace_registry_created_at", "trace_registry", ["created_at"])
+    op.create_table(
+        "span_registry",
+        sa.Column("id", sa.String(128), primary_key=True),
+        sa.Column("trace_id", sa.String(128), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_span_registry_trace_id", "span_registry", ["trace_id"])
+    op.create_index("ix_span_registry_created_at", "span_registry", ["created_at"])
+
+    # ON CONFLICT DO NOTHING keeps the first of any duplicates; "WHERE true"
+    # lets SQLite parse the upsert clause after a SELECT.
+    op.execute(
+        "INSERT INTO trace_registry (id, external_id, created_at) "
+        "SELECT id, external_id, coalesce(created_at, CURRENT_TIMESTAMP) FROM traces "
+        "WHERE true ON CONFLICT DO NOTHING"
+    )
+    op.execute(
+        "INSERT INTO span_registry (id, trace_id, created_at) "
+        "SELECT id, trace_id, coalesce(created_at, CURRENT_TIMESTAMP) FROM spans "
+        "WHERE true ON CONFLICT DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("span_registry")
+    op.drop_table("trace_registry")
@@ -0,0 +1,101 @@
+"""Diagnostics endpoints: profiles, tracemalloc diffs, event-loop stalls, payload dictionaries.
+
+Every route requires ``X-Debug-Token`` to match ``settings.debug_token`` and
+answers 404 while no token is configured.
+"""
+
+from __future__ import annotations
+
+import hmac
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from vigil_server.config import settings
+from vigil_server.dependencies import DBSession  # noqa: TC001
+from vigil_server.exceptions import NotFoundError
+from vigil_server.services.executor import run_in_thread
+from vigil_server.services.loop_monitor import loop_monitor
+from vigil_server.services.payload_dictionaries import train_dictionary
+from vigil_server.services.profiling import profile_store, tracemalloc_diff
+
+
+def require_debug_token(x_debug_token: Annotated[str | None, Header()] = None) -> None:
+    """Reject the request unless it carries the configured debug token."""
+    if not settings.debug_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_debug_token is None or not hmac.compare_digest(
+        x_debug_token.encode(), settings.debug_token.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid debug token")
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    include_in_schema=False,
+    dependencies=[Depends(require_debug_token)],
+)
+
+
+class ArmRequest(BaseModel):
+    count: int = Field(default=1, ge=0, le=1000)
+    path_prefix: str = Field(default="", max_length=512)
+
+
+@router.post("/profiles/arm")
+async def arm_profiling(body: ArmRequest) -> dict[str, Any]:
+    """Profile the next ``count`` requests whose path starts with ``path_prefix``."""
+    profile_store.arm(body.count, body.path_prefix)
+    return profile_store.armed()
+
+
+@router.get("/profiles")
+async def list_profiles() -> dict[str, Any]:
+    return {"armed": profile_store.armed(), "profiles": profile_store.list()}
+
+
+@router.get("/profiles/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str) -> str:
+    """Return the cProfile report for one request."""
+    profile = profile_store.get(request_id)
+    if profile is None:
+        raise NotFoundError("Profile", request_id)
+    return profile.stats
+
+
+@router.post("/tracemalloc")
+async def tracemalloc_snapshot(
+    limit: int = Query(default=25, ge=1, le=500),
+    frames: int = Query(default=1, ge=1, le=50),
+) -> dict[str, Any]:
+    """Start tracing allocations, or return the growth since the previous call."""
+    return await run_in_thread(tracemalloc_diff.diff, limit=limit, frames=frames)
+
+
+@router.delete("/tracemalloc", status_code=status.HTTP_204_NO_CONTENT)
+async def tracemalloc_stop() -> None:
+    tracemalloc_diff.stop()
+
+
+@router.get("/event-loop")
+async def event_loop_status() -> dict[str, Any]:
+    """Current loop lag and the stacks of recent stalls."""
+    return loop_monitor.snapshot()
+
+
+@router.post("/payload-dictionary", status_code=status.HTTP_201_CREATED)
+async def train_payload_dictionary(db: DBSession) -> dict[str, Any]:
+    """Train a zstd dictionary from recent span payloads.
+
+    Workers start compressing with it after two refresh intervals.
+    """
+    dictionary = await train_dictionary(db)
+    return {
+        "id": dictionary.id,
+        "size": len(dictionary.data),
+        "sample_count": dictionary.sample_count,
+        "activate_after": dictionary.activate_after.isoformat(),
+    }
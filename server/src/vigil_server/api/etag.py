@@ -0,0 +1,54 @@
+"""Conditional GET helpers.
+
+ETags are derived from cheap update markers (row counts and ``updated_at``
+timestamps) rather than from the response body, so a matching
+``If-None-Match`` can be answered with ``304 Not Modified`` before the
+expensive part of the request runs.  They are weak validators because the
+body may be re-encoded by the compression middleware.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+from urllib.parse import urlencode
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*markers: Any) -> str:
+    """Build a weak ETag from a sequence of version markers."""
+    digest = hashlib.blake2b("|".join(map(str, markers)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def query_marker(request: Request) -> str:
+    """Normalised query string, so each page and filter gets its own ETag."""
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True if an ``If-None-Match`` header matches *etag*."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """Return an empty ``304 Not Modified`` response carrying *etag*."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    """Attach validator headers to a full response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
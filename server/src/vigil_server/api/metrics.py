@@ -0,0 +1,72 @@
+"""Prometheus metrics endpoint.
+
+Metric labels carry no project or tenant identifiers.  When
+``settings.metrics_token`` is set, scrapes must send it as a bearer token.
+"""
+
+from __future__ import annotations
+
+import hmac
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, status
+from starlette.responses import Response
+
+from vigil_server import metrics
+from vigil_server.config import settings
+from vigil_server.db.pool import pool_status
+from vigil_server.db.session import engine, read_engine
+from vigil_server.logging_config import dropped_records
+from vigil_server.services.auth_cache import auth_cache
+from vigil_server.services.executor import crypto_executor, process_executor, thread_executor
+from vigil_server.services.websocket_manager import manager
+
+router = APIRouter(tags=["metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Annotated[str | None, Header()] = None) -> Response:
+    """Expose this worker's metrics in the Prometheus text format."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token:
+        expected = f"Bearer {settings.metrics_token}".encode()
+        if authorization is None or not hmac.compare_digest(authorization.encode(), expected):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    _collect_runtime()
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+def _collect_runtime() -> None:
+    """Copy state owned by other components into gauges at scrape time."""
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["read"] = read_engine
+    for name, eng in engines.items():
+        for state, value in pool_status(eng.pool).items():
+            metrics.DB_POOL_CONNECTIONS.labels(name, state).set(value)
+
+    ws = manager.stats()
+    metrics.WS_CONNECTIONS.set(ws["connections"])
+    metrics.WS_QUEUED_MESSAGES.set(ws["queued"])
+    metrics.WS_TAIL_SUBSCRIBERS.set(ws["tail_subscribers"])
+    metrics.WS_MESSAGES_DROPPED.set(ws["dropped"])
+    metrics.WS_MESSAGES_COALESCED.set(ws["coalesced"])
+    metrics.WS_DISCONNECTS.labels("send_timeout").set(ws["send_timeouts"])
+    metrics.WS_DISCONNECTS.labels("idle").set(ws["reaped"])
+
+    for executor in (crypto_executor, thread_executor, process_executor):
+        metrics.EXECUTOR_PENDING.labels(executor.name).set(executor.pending)
+        metrics.EXECUTOR_REJECTED.labels(executor.name).set(executor.rejected)
+
+    cache = auth_cache.stats()
+    for result in ("hits", "negative_hits", "misses"):
+        metrics.AUTH_CACHE_LOOKUPS.labels(result).set(cache[result])
+
+    metrics.LOG_RECORDS_DROPPED.set(dropped_records())
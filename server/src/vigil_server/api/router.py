@@ -4,7 +4,9 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from vigil_server.api.debug import router as debug_router
 from vigil_server.api.health import router as health_router
+from vigil_server.api.metrics import router as metrics_router
 from vigil_server.api.v1.auth import router as auth_router
 from vigil_server.api.v1.drift import router as drift_router
 from vigil_server.api.v1.notifications import router as notifications_router
@@ -18,6 +20,8 @@ api_router = APIRouter()
 
 # Health (no prefix)
 api_router.include_router(health_router)
+api_router.include_router(metrics_router)
+api_router.include_router(debug_router)
 
 # V1 API
 v1 = APIRouter(prefix="/v1")
@@ -15,8 +15,8 @@ from vigil_server.schemas.auth import (
 from vigil_server.services.auth_service import (
     create_access_token,
     get_user_by_email,
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -34,7 +34,7 @@ async def register(body: RegisterRequest, db: DBSession) -> UserResponse:
 
     user = User(
         email=body.email,
-        hashed_password=hash_password(body.password),
+        hashed_password=await hash_password_async(body.password),
     )
     db.add(user)
     await db.flush()
@@ -46,7 +46,7 @@ async def register(body: RegisterRequest, db: DBSession) -> UserResponse:
 async def login(body: LoginRequest, db: DBSession) -> TokenResponse:
     """Authenticate and return a JWT access token."""
     user = await get_user_by_email(db, body.email)
-    if not user or not verify_password(body.password, user.hashed_password):
+    if not user or not await verify_password_async(body.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
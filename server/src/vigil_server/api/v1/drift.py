@@ -4,7 +4,12 @@ from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException
 
-from vigil_server.dependencies import CurrentProject, DBSession, GuestProject  # noqa: TC001
+from vigil_server.dependencies import (  # noqa: TC001
+    CurrentProject,
+    DBSession,
+    GuestProject,
+    ReadDBSession,
+)
 from vigil_server.schemas.drift import DriftAlertResponse, DriftSummary
 from vigil_server.services.drift_detector import (
     get_drift_alerts,
@@ -18,7 +23,7 @@ router = APIRouter(prefix="/drift", tags=["drift"])
 
 @router.get("/alerts")
 async def list_alerts(
-    db: DBSession,
+    db: ReadDBSession,
     project_id: GuestProject,
     include_resolved: bool = False,
 ) -> list[DriftAlertResponse]:
@@ -29,7 +34,7 @@ async def list_alerts(
 
 @router.get("/summary")
 async def summary(
-    db: DBSession,
+    db: ReadDBSession,
     project_id: GuestProject,
 ) -> DriftSummary:
     """Get drift alert summary for the current project."""
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Query
 
-from vigil_server.dependencies import CurrentProject, DBSession  # noqa: TC001
+from vigil_server.dependencies import CurrentProject, DBSession, ReadDBSession  # noqa: TC001
 from vigil_server.schemas.notifications import NotificationCountResponse, NotificationResponse
 from vigil_server.services.notification_service import (
     list_notifications,
@@ -18,7 +18,7 @@ router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 @router.get("")
 async def list_all(
-    db: DBSession,
+    db: ReadDBSession,
     project_id: CurrentProject,
     unread_only: bool = Query(False),
     limit: int = Query(50, ge=1, le=200),
@@ -56,7 +56,7 @@ async def read_all(
 
 @router.get("/count")
 async def count(
-    db: DBSession,
+    db: ReadDBSession,
     project_id: CurrentProject,
 ) -> NotificationCountResponse:
     """Get unread notification count."""
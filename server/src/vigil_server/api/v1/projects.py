@@ -5,12 +5,22 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import func, select
 
-from vigil_server.dependencies import CurrentProject, DBSession, GuestProject  # noqa: TC001
+from vigil_server.dependencies import (  # noqa: TC001
+    CurrentProject,
+    DBSession,
+    GuestProject,
+    ReadDBSession,
+)
 from vigil_server.models.project import APIKey, Project
 from vigil_server.models.project_settings import ProjectSettings
-from vigil_server.schemas.project_settings import ProjectSettingsResponse, ProjectSettingsUpdate
+from vigil_server.schemas.project_settings import (
+    ProjectSettingsResponse,
+    ProjectSettingsUpdate,
+    check_ttl_order,
+)
 from vigil_server.schemas.projects import ProjectCreate, ProjectListResponse, ProjectResponse
-from vigil_server.services.encryption import decrypt, encrypt, mask_key
+from vigil_server.services.auth_service import invalidate_project_tokens_on_commit
+from vigil_server.services.encryption import decrypt_async, encrypt_async, mask_key
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -36,7 +46,7 @@ async def create_project(
 
 
 @router.get("")
-async def list_projects(db: DBSession, _project_id: GuestProject) -> ProjectListResponse:
+async def list_projects(db: ReadDBSession, _project_id: GuestProject) -> ProjectListResponse:
     """List all projects."""
     count_result = await db.execute(select(func.count()).select_from(Project))
     total = count_result.scalar() or 0
@@ -51,7 +61,7 @@ async def list_projects(db: DBSession, _project_id: GuestProject) -> ProjectList
 
 
 @router.get("/{project_id}")
-async def get_project(project_id: str, db: DBSession, _auth: GuestProject) -> ProjectResponse:
+async def get_project(project_id: str, db: ReadDBSession, _auth: GuestProject) -> ProjectResponse:
     """Get a project by ID."""
     project = await db.get(Project, project_id)
     if not project:
@@ -70,9 +80,10 @@ async def rotate_api_key(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # Deactivate existing keys
+    # Deactivate existing keys; the auth caches drop them once this commits
     for key in project.api_keys:
         key.is_active = False
+    invalidate_project_tokens_on_commit(db, project_id, [key.key for key in project.api_keys])
 
     # Create new key
     new_key = APIKey(project_id=project_id, name="rotated")
@@ -82,23 +93,27 @@ async def rotate_api_key(
     return {"key": new_key.key}
 
 
-def _build_settings_response(s: ProjectSettings) -> ProjectSettingsResponse:
+async def _build_settings_response(s: ProjectSettings) -> ProjectSettingsResponse:
     """Build a settings response with masked keys."""
-    openai_set = s.openai_api_key_encrypted is not None
-    anthropic_set = s.anthropic_api_key_encrypted is not None
+    openai_masked = anthropic_masked = None
+    if s.openai_api_key_encrypted is not None:
+        openai_masked = mask_key(await decrypt_async(s.openai_api_key_encrypted))
+    if s.anthropic_api_key_encrypted is not None:
+        anthropic_masked = mask_key(await decrypt_async(s.anthropic_api_key_encrypted))
     return ProjectSettingsResponse(
         id=s.id,
         project_id=s.project_id,
-        openai_api_key_set=openai_set,
-        openai_api_key_masked=mask_key(decrypt(s.openai_api_key_encrypted)) if openai_set else None,
-        anthropic_api_key_set=anthropic_set,
-        anthropic_api_key_masked=(
-            mask_key(decrypt(s.anthropic_api_key_encrypted)) if anthropic_set else None
-        ),
+        openai_api_key_set=openai_masked is not None,
+        openai_api_key_masked=openai_masked,
+        anthropic_api_key_set=anthropic_masked is not None,
+        anthropic_api_key_masked=anthropic_masked,
         default_openai_model=s.default_openai_model,
         default_anthropic_model=s.default_anthropic_model,
         drift_check_interval_minutes=s.drift_check_interval_minutes,
         drift_check_enabled=s.drift_check_enabled,
+        payload_ttl_days=s.payload_ttl_days,
+        raw_span_ttl_days=s.raw_span_ttl_days,
+        summary_ttl_days=s.summary_ttl_days,
         created_at=s.created_at,
         updated_at=s.updated_at,
     )
@@ -123,7 +138,7 @@ async def get_settings(
         db.add(s)
         await db.flush()
         await db.refresh(s)
-    return _build_settings_response(s)
+    return await _build_settings_response(s)
 
 
 @router.put("/{project_id}/settings")
@@ -146,9 +161,9 @@ async def update_settings(
         await db.flush()
 
     if body.openai_api_key is not None:
-        s.openai_api_key_encrypted = encrypt(body.openai_api_key)
+        s.openai_api_key_encrypted = await encrypt_async(body.openai_api_key)
     if body.anthropic_api_key is not None:
-        s.anthropic_api_key_encrypted = encrypt(body.anthropic_api_key)
+        s.anthropic_api_key_encrypted = await encrypt_async(body.anthropic_api_key)
     if body.default_openai_model is not None:
         s.default_openai_model = body.default_openai_model
     if body.default_anthropic_model is not None:
@@ -157,7 +172,19 @@ async def update_settings(
         s.drift_check_interval_minutes = body.drift_check_interval_minutes
     if body.drift_check_enabled is not None:
         s.drift_check_enabled = body.drift_check_enabled
+    # TTLs may be cleared with an explicit null.  A partial update must also
+    # be consistent with the TTLs already stored.
+    ttls = {
+        field: getattr(body if field in body.model_fields_set else s, field)
+        for field in ("payload_ttl_days", "raw_span_ttl_days", "summary_ttl_days")
+    }
+    try:
+        check_ttl_order(*ttls.values())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    for field, ttl in ttls.items():
+        setattr(s, field, ttl)
 
     await db.flush()
     await db.refresh(s)
-    return _build_settings_response(s)
+    return await _build_settings_response(s)
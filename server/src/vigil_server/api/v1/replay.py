@@ -4,14 +4,19 @@ from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException
 
-from vigil_server.dependencies import CurrentProject, DBSession, GuestProject  # noqa: TC001
+from vigil_server.dependencies import (  # noqa: TC001
+    CurrentProject,
+    DBSession,
+    GuestProject,
+    ReadDBSession,
+)
 from vigil_server.schemas.replay import (
     ReplayDiffResponse,
     ReplayEstimateResponse,
     ReplayRequest,
     ReplayRunResponse,
 )
-from vigil_server.services.encryption import decrypt
+from vigil_server.services.encryption import decrypt_async
 from vigil_server.services.replay_engine import (
     cancel_replay,
     confirm_replay,
@@ -64,9 +69,9 @@ async def confirm(
             if not settings:
                 return None
             if provider == "openai" and settings.openai_api_key_encrypted:
-                return decrypt(settings.openai_api_key_encrypted)
+                return await decrypt_async(settings.openai_api_key_encrypted)
             if provider == "anthropic" and settings.anthropic_api_key_encrypted:
-                return decrypt(settings.anthropic_api_key_encrypted)
+                return await decrypt_async(settings.anthropic_api_key_encrypted)
             return None
 
     try:
@@ -98,7 +103,7 @@ async def cancel(
 async def get_replay_status(
     trace_id: str,
     replay_id: str,
-    db: DBSession,
+    db: ReadDBSession,
     _auth: GuestProject,
 ) -> ReplayRunResponse:
     """Get the status of a replay run."""
@@ -112,7 +117,7 @@ async def get_replay_status(
 async def get_replay_diff_endpoint(
     trace_id: str,
     replay_id: str,
-    db: DBSession,
+    db: ReadDBSession,
     _auth: GuestProject,
 ) -> ReplayDiffResponse:
     """Get the diff output from a completed replay run."""
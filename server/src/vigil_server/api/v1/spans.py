@@ -2,36 +2,61 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Query
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, Header, Query, Request
 from sqlalchemy import func, select
+from starlette.responses import Response
 
-from vigil_server.dependencies import DBSession, GuestProject  # noqa: TC001
+from vigil_server.api.etag import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    query_marker,
+    set_etag,
+)
+from vigil_server.db.json_filters import metadata_condition, metadata_params
+from vigil_server.dependencies import GuestProject, ReadDBSession  # noqa: TC001
 from vigil_server.models.span import Span as SpanModel
 from vigil_server.models.trace import Trace as TraceModel
-from vigil_server.schemas.spans import SpanListResponse, SpanResponse
+from vigil_server.schemas.spans import SpanListResponse, SpanSearchResponse
+from vigil_server.serialization import FastJSONResponse
+from vigil_server.services.filter_query import plan_query
+from vigil_server.services.search import search_spans
+from vigil_server.services.trace_service import SPAN_COLUMNS, span_row_to_dict
 
 router = APIRouter(prefix="/spans", tags=["spans"])
 
 
-@router.get("")
+@router.get("", response_model=SpanListResponse)
 async def list_spans(
-    db: DBSession,
+    request: Request,
+    db: ReadDBSession,
     project_id: GuestProject,
     kind: str | None = None,
     status: str | None = None,
     trace_id: str | None = None,
+    q: str | None = Query(None, max_length=1000),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
-) -> SpanListResponse:
-    """Query spans across traces with filters."""
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Query spans across traces with filters.
+
+    ``metadata.<key>=<value>`` query parameters filter on span metadata;
+    ``q`` takes a filter query (see :mod:`vigil_server.services.filter_query`).
+    """
+    metadata = metadata_params(request.query_params.multi_items())
+    dialect = db.get_bind().dialect.name
     stmt = (
-        select(SpanModel)
+        select(*SPAN_COLUMNS)
         .join(SpanModel.trace)
         .where(TraceModel.project_id == project_id)
         .order_by(SpanModel.created_at.desc())
     )
     count_stmt = (
-        select(func.count())
+        select(func.count(), func.max(SpanModel.updated_at))
         .select_from(SpanModel)
         .join(SpanModel.trace)
         .where(TraceModel.project_id == project_id)
@@ -46,33 +71,57 @@ async def list_spans(
     if trace_id:
         stmt = stmt.where(SpanModel.trace_id == trace_id)
         count_stmt = count_stmt.where(SpanModel.trace_id == trace_id)
+    if metadata:
+        condition = metadata_condition(SpanModel.metadata_, metadata, dialect)
+        stmt = stmt.where(condition)
+        count_stmt = count_stmt.where(condition)
+    if q:
+        bounded_by = None
+        if trace_id:
+            bounded_by = "trace_id"
+        elif metadata and dialect == "postgresql":
+            bounded_by = "metadata"
+        plan = plan_query(q, "spans", dialect, bounded_by=bounded_by)
+        stmt = stmt.where(*plan.conditions)
+        count_stmt = count_stmt.where(*plan.conditions)
 
-    total_result = await db.execute(count_stmt)
-    total = total_result.scalar() or 0
+    total, last_updated = (await db.execute(count_stmt)).one()
+    total = total or 0
+    etag = make_etag("spans", total, last_updated, query_marker(request))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
     result = await db.execute(stmt.offset(offset).limit(limit))
-    spans = result.scalars().all()
 
-    return SpanListResponse(
-        spans=[
-            SpanResponse(
-                id=s.id,
-                trace_id=s.trace_id,
-                parent_span_id=s.parent_span_id,
-                name=s.name,
-                kind=s.kind,
-                status=s.status,
-                input=s.input,
-                output=s.output,
-                metadata=s.metadata_ or {},
-                events=s.events or [],
-                start_time=s.start_time,
-                end_time=s.end_time,
-                created_at=s.created_at,
-            )
-            for s in spans
-        ],
-        total=total,
+    response = FastJSONResponse(
+        {
+            "spans": [span_row_to_dict(row) for row in result.all()],
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
+    )
+    return set_etag(response, etag)
+
+
+@router.get("/search", response_model=SpanSearchResponse)
+async def search(
+    db: ReadDBSession,
+    project_id: GuestProject,
+    q: str = Query(..., min_length=1, max_length=500),
+    offset: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    start_date: datetime | None = Query(None),
+    end_date: datetime | None = Query(None),
+) -> Response:
+    """Full-text search over span names and payloads, best matches first."""
+    results = await search_spans(
+        db,
+        project_id,
+        q,
         offset=offset,
         limit=limit,
+        start_date=start_date,
+        end_date=end_date,
     )
+    return FastJSONResponse({"query": q, "results": results, "offset": offset, "limit": limit})
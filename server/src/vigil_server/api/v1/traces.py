@@ -3,10 +3,27 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from starlette.responses import Response
 
-from vigil_server.dependencies import CurrentProject, DBSession, GuestProject  # noqa: TC001
+from vigil_server.api.etag import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    query_marker,
+    set_etag,
+)
+from vigil_server.db.json_filters import metadata_params
+from vigil_server.dependencies import (  # noqa: TC001
+    CurrentProject,
+    DBSession,
+    GuestProject,
+    ReadDBSession,
+)
+from vigil_server.metrics import INGEST_BATCH_SIZE, INGEST_SPANS
+from vigil_server.schemas.spans import SpanTreeResponse
 from vigil_server.schemas.traces import (
     EventAppendRequest,
     IngestRequest,
@@ -15,12 +32,20 @@ from vigil_server.schemas.traces import (
     TraceResponse,
     TraceUpdateRequest,
 )
+from vigil_server.serialization import FastJSONResponse
+from vigil_server.services.live_tail import span_summaries
+from vigil_server.services.sqlite_writer import sqlite_writer
 from vigil_server.services.trace_service import (
     append_event,
     build_trace_response,
-    get_trace,
+    get_span_tree,
+    get_trace_document,
+    get_trace_list_version,
+    get_trace_version,
     ingest_spans,
-    list_traces,
+    list_trace_documents,
+    offload_span_payloads,
+    resolve_trace_response,
     update_trace,
 )
 from vigil_server.services.websocket_manager import manager
@@ -35,7 +60,16 @@ async def ingest(
     project_id: CurrentProject,
 ) -> IngestResponse:
     """Ingest spans from the SDK."""
-    trace_id, count = await ingest_spans(db, request, project_id)
+    # Blob writes happen before the write transaction (or writer queue) is entered.
+    payloads = await offload_span_payloads(request.spans, project_id)
+    if sqlite_writer.running:
+        trace_id, count = await sqlite_writer.submit(
+            lambda session: ingest_spans(session, request, project_id, payloads)
+        )
+    else:
+        trace_id, count = await ingest_spans(db, request, project_id, payloads)
+    INGEST_SPANS.inc(count)
+    INGEST_BATCH_SIZE.observe(count)
 
     # Broadcast new trace event
     await manager.broadcast(
@@ -45,22 +79,45 @@ async def ingest(
             "data": {"trace_id": trace_id, "span_count": count},
         },
     )
+    if manager.wants_spans(project_id):
+        await manager.publish_spans(project_id, span_summaries(trace_id, request.spans))
 
     return IngestResponse(trace_id=trace_id, span_count=count)
 
 
-@router.get("")
+@router.get("", response_model=TraceListResponse)
 async def list_all(
-    db: DBSession,
+    request: Request,
+    db: ReadDBSession,
     project_id: GuestProject,
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     status_filter: str | None = Query(None, alias="status"),
     start_date: datetime | None = Query(None),
     end_date: datetime | None = Query(None),
-) -> TraceListResponse:
-    """List traces with pagination and optional filters."""
-    traces, total = await list_traces(
+    q: str | None = Query(None, max_length=1000),
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """List traces with pagination and optional filters.
+
+    ``metadata.<key>=<value>`` query parameters filter on trace metadata;
+    ``q`` takes a filter query (see :mod:`vigil_server.services.filter_query`).
+    """
+    metadata = metadata_params(request.query_params.multi_items())
+    total, last_updated = await get_trace_list_version(
+        db,
+        project_id,
+        status=status_filter,
+        start_date=start_date,
+        end_date=end_date,
+        metadata=metadata,
+        query=q,
+    )
+    etag = make_etag("traces", total, last_updated, query_marker(request))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    traces = await list_trace_documents(
         db,
         project_id,
         offset,
@@ -68,26 +125,60 @@ async def list_all(
         status=status_filter,
         start_date=start_date,
         end_date=end_date,
+        metadata=metadata,
+        query=q,
     )
-    return TraceListResponse(
-        traces=[build_trace_response(t) for t in traces],
-        total=total,
-        offset=offset,
-        limit=limit,
+    response = FastJSONResponse(
+        {"traces": traces, "total": total, "offset": offset, "limit": limit}
     )
+    return set_etag(response, etag)
 
 
-@router.get("/{trace_id}")
+@router.get("/{trace_id}", response_model=TraceResponse)
 async def get_one(
     trace_id: str,
-    db: DBSession,
+    db: ReadDBSession,
     project_id: GuestProject,
-) -> TraceResponse:
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """Get a single trace with all spans."""
-    trace = await get_trace(db, trace_id)
+    version = await get_trace_version(db, trace_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    etag = make_etag("trace", trace_id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    trace = await get_trace_document(db, trace_id)
     if not trace:
         raise HTTPException(status_code=404, detail="Trace not found")
-    return build_trace_response(trace)
+    return set_etag(FastJSONResponse(trace), etag)
+
+
+@router.get("/{trace_id}/tree")
+async def get_tree(
+    trace_id: str,
+    db: ReadDBSession,
+    project_id: GuestProject,
+    parent_span_id: str | None = None,
+    depth: int = Query(3, ge=1, le=10),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    children_limit: int = Query(20, ge=1, le=200),
+) -> SpanTreeResponse:
+    """Get a page of the span hierarchy, expanded up to ``depth`` levels."""
+    tree = await get_span_tree(
+        db,
+        trace_id,
+        parent_span_id=parent_span_id,
+        depth=depth,
+        offset=offset,
+        limit=limit,
+        children_limit=children_limit,
+    )
+    if not tree:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return tree
 
 
 @router.patch("/{trace_id}")
@@ -99,7 +190,7 @@ async def patch_trace(
 ) -> TraceResponse:
     """Update a trace's status and/or metadata."""
     trace = await update_trace(db, trace_id, status=body.status, metadata=body.metadata)
-    return build_trace_response(trace)
+    return await resolve_trace_response(build_trace_response(trace))
 
 
 @router.post("/{trace_id}/events/{span_id}", status_code=status.HTTP_201_CREATED)
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 
-from vigil_server.services.auth_service import decode_token
+from vigil_server.services.auth_service import resolve_token_project
+from vigil_server.services.live_tail import TailFilter
 from vigil_server.services.websocket_manager import manager
 
 router = APIRouter(tags=["websocket"])
@@ -17,7 +19,11 @@ async def websocket_endpoint(
 ) -> None:
     """WebSocket endpoint for real-time project updates.
 
-    Authenticates via token query parameter (JWT or API key).
+    Authenticates via token query parameter (JWT or API key).  Besides
+    ``ping``, clients may send ``{"type": "subscribe", "data": {...}}`` with
+    optional ``kind``, ``status``, ``name_prefix`` and ``trace_id`` filters
+    to receive batched ``spans.batch`` messages for newly ingested spans,
+    and ``{"type": "unsubscribe"}`` to stop.
     """
     # Validate token
     project_id = await _resolve_project_id(token)
@@ -29,36 +35,36 @@ async def websocket_endpoint(
     try:
         while True:
             data = await ws.receive_json()
-            # Handle client pings
-            if data.get("type") == "ping":
-                await ws.send_json({"type": "pong"})
+            manager.touch(ws)
+            # Handle client pings; replies to server pings only need the touch
+            msg_type = data.get("type")
+            if msg_type == "ping":
+                manager.send(ws, {"type": "pong"})
+            elif msg_type == "subscribe":
+                _subscribe(ws, data.get("data") or {})
+            elif msg_type == "unsubscribe":
+                manager.unsubscribe_tail(ws)
+                manager.send(ws, {"type": "unsubscribed", "data": {}})
     except WebSocketDisconnect:
         manager.disconnect(ws, project_id)
     except Exception:
         manager.disconnect(ws, project_id)
 
 
-async def _resolve_project_id(token: str) -> str | None:
-    """Resolve a token to a project_id. Returns None if invalid."""
-    from vigil_server.config import settings
-
-    # Try JWT
-    subject = decode_token(token)
-    if subject is not None:
-        return "default"
-
-    # Try dev API key
-    if token == settings.api_key:
-        return "default"
-
-    # Try database API key
-    from sqlalchemy import select
+def _subscribe(ws: WebSocket, filters: dict[str, object]) -> None:
+    """Validate a subscribe message and start the socket's live tail."""
+    try:
+        tail_filter = TailFilter.model_validate(filters)
+    except ValidationError as exc:
+        errors = [e["msg"] for e in exc.errors()]
+        manager.send(
+            ws, {"type": "error", "data": {"message": "Invalid subscription", "errors": errors}}
+        )
+        return
+    manager.subscribe_tail(ws, tail_filter)
+    manager.send(ws, {"type": "subscribed", "data": tail_filter.model_dump()})
 
-    from vigil_server.db.session import async_session
-    from vigil_server.models.project import APIKey
 
-    async with async_session() as session:
-        stmt = select(APIKey).where(APIKey.key == token, APIKey.is_active == True)  # noqa: E712
-        result = await session.execute(stmt)
-        key_record = result.scalar_one_or_none()
-        return key_record.project_id if key_record else None
+async def _resolve_project_id(token: str) -> str | None:
+    """Resolve a token to a project_id. Returns None if invalid."""
+    return await resolve_token_project(token)
@@ -23,6 +23,63 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite+aiosqlite:///./vigil.db"
+    database_read_url: str | None = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_checkout_warn_ms: int = 100
+    db_statement_timeout_ms: int = 0
+    db_statement_cache_size: int = 100
+
+    # PostgreSQL daily partitions (after migration 007)
+    partition_premake_days: int = 7
+    partition_retention_days: int = 0
+    partition_maintenance_interval_minutes: int = 60
+
+    # Per-project retention (TTLs live in project settings)
+    retention_interval_minutes: int = 60
+    retention_batch_size: int = 500
+    retention_batch_pause_ms: int = 50
+
+    # Cold storage: traces older than this move to compressed segment files
+    cold_storage_after_days: int = 0
+    cold_storage_dir: str = "./vigil-cold"
+    cold_storage_batch_size: int = 1000
+    cold_storage_compression_level: int = 6
+    cold_storage_interval_minutes: int = 60
+
+    # Compressed span payloads (needs the zstd extra; 0 = off)
+    payload_compression_min_bytes: int = 0
+    payload_compression_level: int = 3
+    payload_dictionary_size_kb: int = 112
+    payload_dictionary_samples: int = 2000
+    payload_dictionary_refresh_minutes: int = 5
+
+    # Blob store for large span payloads (0 = keep payloads in the row)
+    blob_offload_min_bytes: int = 0
+    blob_store_backend: str = "local"
+    blob_store_dir: str = "./vigil-blobs"
+    blob_gc_grace_minutes: int = 60
+
+    # Full-text search over span payloads
+    search_index_enabled: bool = True
+    search_max_text_chars: int = 16384
+    search_candidate_limit: int = 10000
+
+    # Filter query language (``q`` on list endpoints)
+    filter_max_scan_days: int = 31
+
+    # SQLite high-throughput mode (WAL, read pool, batched single writer)
+    sqlite_high_throughput: bool = False
+    sqlite_read_pool_size: int = 8
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_mb: int = 64
+    sqlite_mmap_size_mb: int = 256
+    sqlite_write_batch_max: int = 256
+    sqlite_write_batch_wait_ms: int = 2
+    sqlite_write_queue_max: int = 4096
 
     # Redis
     redis_url: str = "redis://localhost:6379/0"
@@ -31,6 +88,8 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     log_level: str = "info"
+    log_queue_size: int = 10_000
+    log_debug_max_per_second: int = 20
     cors_origins: list[str] = ["http://localhost:3000"]
 
     # Auth
@@ -39,12 +98,65 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 60
 
+    # Auth cache (resolved API keys / JWTs)
+    auth_cache_ttl_seconds: int = 60
+    auth_cache_negative_ttl_seconds: int = 10
+    auth_cache_max_entries: int = 10_000
+
     # Encryption
     encryption_key: str = ""
 
+    # Executors for blocking / CPU-bound work
+    executor_thread_workers: int = 4
+    executor_crypto_workers: int = 2
+    executor_process_workers: int = 2
+    executor_max_pending: int = 64
+
+    # Shared state across workers ("memory" or "redis", which uses redis_url)
+    shared_state_backend: str = "memory"
+    shared_state_local_ttl_seconds: int = 5
+
+    # WebSocket fan-out (batching of cross-worker broadcasts)
+    ws_batch_interval_ms: int = 20
+    ws_batch_max_messages: int = 100
+    ws_outbox_size: int = 10_000
+
+    # WebSocket back-pressure and liveness
+    ws_send_queue_size: int = 256
+    ws_send_timeout_seconds: float = 5.0
+    ws_heartbeat_interval_seconds: float = 25.0
+    ws_idle_timeout_seconds: float = 75.0
+
+    # WebSocket live tail (span batches per subscribed socket)
+    ws_tail_interval_ms: int = 500
+    ws_tail_max_spans: int = 500
+
+    # Metrics
+    metrics_enabled: bool = True
+    metrics_token: str = ""
+
+    # Event-loop lag monitor
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: int = 100
+    loop_monitor_threshold_ms: int = 100
+    loop_monitor_max_offenders: int = 20
+
+    # Debugging (profiling and /debug endpoints are off unless debug_token is set)
+    debug_token: str = ""
+    request_db_stats: bool = False
+    profiling_max_profiles: int = 20
+    profiling_stats_limit: int = 50
+
     # Rate limiting
     rate_limit_requests: int = 100
     rate_limit_window_seconds: int = 60
+    rate_limit_key: str = "api_key"  # "api_key", "project" or "ip"
+    rate_limit_max_buckets: int = 100_000
+
+    # Response compression
+    compression_minimum_size: int = 1024
+    compression_level: int = 6
+    compression_brotli_quality: int = 5
 
     @property
     def is_sqlite(self) -> bool:
@@ -0,0 +1,161 @@
+"""Compressed storage encoding for large span payloads.
+
+With ``settings.payload_compression_min_bytes`` set and the optional
+``zstandard`` package installed, span ``input``, ``output`` and ``events``
+values whose JSON encoding is at least that large are stored zstd-compressed
+inside a small JSON envelope::
+
+    {"__vigil_z__": 1, "dict": <dictionary id or 0>, "data": "<base64>"}
+
+The columns stay ``JSON``, so existing rows, migrations and ``IS NULL``
+checks are unaffected, and values are only decompressed when a query
+actually selects the column.  Prompt payloads repeat a lot of structure
+(roles, tool schemas, system prompts), so compression uses the newest
+zstd dictionary trained from stored spans (see
+:mod:`vigil_server.services.payload_dictionaries`) once it is active.
+
+A client value that itself carries the envelope key is always stored
+wrapped, even with compression off, as ``{"__vigil_z__": 0, "raw": <value>}``,
+so every envelope read back was written here.  Malformed envelopes (rows
+written before that) are returned as stored instead of failing the read.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import logging
+from typing import Any
+
+import orjson
+from sqlalchemy import JSON
+from sqlalchemy.types import TypeDecorator
+
+from vigil_server.config import settings
+from vigil_server.exceptions import VigilError
+from vigil_server.metrics import PAYLOAD_BYTES
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger("vigil_server.db.compression")
+
+ENVELOPE_KEY = "__vigil_z__"
+
+
+def is_compressed(value: Any) -> bool:
+    return isinstance(value, dict) and ENVELOPE_KEY in value
+
+
+class PayloadCodec:
+    """Encodes payloads into compressed envelopes and back.
+
+    Holds every known dictionary (needed to read old rows) and the id of
+    the one used for new writes.
+    """
+
+    def __init__(self) -> None:
+        self._dictionaries: dict[int, Any] = {}
+        self._compressors: dict[int, Any] = {}
+        self._decompressors: dict[int, Any] = {}
+        self.active_dictionary = 0
+
+    @property
+    def enabled(self) -> bool:
+        return zstandard is not None and settings.payload_compression_min_bytes > 0
+
+    @property
+    def dictionary_ids(self) -> set[int]:
+        return set(self._dictionaries)
+
+    def add_dictionary(self, dictionary_id: int, data: bytes) -> None:
+        if zstandard is None or dictionary_id in self._dictionaries:
+            return
+        self._dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(data)
+
+    def activate(self, dictionary_id: int) -> None:
+        if dictionary_id not in self._dictionaries:
+            raise VigilError(f"Unknown payload dictionary {dictionary_id}")
+        self.active_dictionary = dictionary_id
+
+    def _compressor(self, dictionary_id: int) -> Any:
+        compressor = self._compressors.get(dictionary_id)
+        if compressor is None:
+            level = settings.payload_compression_level
+            if dictionary_id:
+                compressor = zstandard.ZstdCompressor(
+                    level=level, dict_data=self._dictionaries[dictionary_id]
+                )
+            else:
+                compressor = zstandard.ZstdCompressor(level=level)
+            self._compressors[dictionary_id] = compressor
+        return compressor
+
+    def _decompressor(self, dictionary_id: int) -> Any:
+        decompressor = self._decompressors.get(dictionary_id)
+        if decompressor is None:
+            if dictionary_id and dictionary_id not in self._dictionaries:
+                raise VigilError(f"Payload dictionary {dictionary_id} is not loaded", 500)
+            dict_data = self._dictionaries.get(dictionary_id)
+            decompressor = (
+                zstandard.ZstdDecompressor(dict_data=dict_data)
+                if dict_data is not None
+                else zstandard.ZstdDecompressor()
+            )
+            self._decompressors[dictionary_id] = decompressor
+        return decompressor
+
+    def encode(self, value: Any) -> Any:
+        """Return *value*, or a compressed envelope if it is large enough."""
+        if is_compressed(value):
+            return {ENVELOPE_KEY: 0, "raw": value}
+        if value is None or not self.enabled:
+            return value
+        raw = orjson.dumps(value)
+        if len(raw) < settings.payload_compression_min_bytes:
+            return value
+        dictionary_id = self.active_dictionary
+        data = base64.b64encode(self._compressor(dictionary_id).compress(raw)).decode("ascii")
+        if len(data) >= len(raw):
+            return value
+        PAYLOAD_BYTES.labels("raw").inc(len(raw))
+        PAYLOAD_BYTES.labels("stored").inc(len(data))
+        return {ENVELOPE_KEY: 1, "dict": dictionary_id, "data": data}
+
+    def decode(self, value: Any) -> Any:
+        """Return the original payload for a stored value."""
+        if not is_compressed(value):
+            return value
+        version = value[ENVELOPE_KEY]
+        if version == 0 and "raw" in value:
+            return value["raw"]
+        data, dictionary_id = value.get("data"), value.get("dict")
+        if version != 1 or not isinstance(data, str) or not isinstance(dictionary_id, int):
+            return value
+        if zstandard is None:
+            raise VigilError("Reading compressed payloads requires the zstandard package", 500)
+        decompressor = self._decompressor(dictionary_id)
+        try:
+            return orjson.loads(decompressor.decompress(base64.b64decode(data, validate=True)))
+        except (binascii.Error, zstandard.ZstdError, orjson.JSONDecodeError):
+            logger.warning("Returning an unreadable payload envelope as stored")
+            return value
+
+
+# Singleton instance
+payload_codec = PayloadCodec()
+
+
+class CompressedJSON(TypeDecorator[Any]):
+    """``JSON`` column whose large values are stored via :data:`payload_codec`."""
+
+    impl = JSON
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        return payload_codec.encode(value)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        return payload_codec.decode(value)
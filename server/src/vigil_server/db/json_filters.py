@@ -0,0 +1,73 @@
+"""``metadata.<key>=<value>`` filters compiled to JSON containment.
+
+On PostgreSQL every filter of a request is merged into one document and
+compiled to ``metadata @> '<document>'::jsonb``, which the GIN
+(``jsonb_path_ops``) indexes from migration 011 answer directly.  Other
+databases compare ``JSON_EXTRACT`` results instead.  Dotted keys address
+nested objects (``metadata.user.id=u1``); values match JSON strings.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+from typing import Any
+
+import orjson
+from sqlalchemy import and_, cast, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+from vigil_server.exceptions import VigilError
+
+PREFIX = "metadata."
+MAX_FILTERS = 10
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_\-]+(\.[A-Za-z0-9_\-]+)*$")
+
+
+def metadata_params(items: Iterable[tuple[str, str]]) -> dict[str, str]:
+    """Collect ``metadata.<key>`` query parameters as ``{key: value}``."""
+    filters: dict[str, str] = {}
+    for name, value in items:
+        if not name.startswith(PREFIX):
+            continue
+        key = name[len(PREFIX) :]
+        if not _KEY_RE.match(key):
+            raise VigilError(f"Invalid metadata filter key {key!r}", 422)
+        filters[key] = value
+    if len(filters) > MAX_FILTERS:
+        raise VigilError(f"At most {MAX_FILTERS} metadata filters are allowed", 422)
+    return filters
+
+
+def containment_document(filters: dict[str, str]) -> dict[str, Any]:
+    """Merge dotted-key filters into the nested document they must be contained in."""
+    document: dict[str, Any] = {}
+    for key, value in filters.items():
+        *parents, leaf = key.split(".")
+        node = document
+        for part in parents:
+            child = node.setdefault(part, {})
+            if not isinstance(child, dict):
+                raise VigilError(f"Conflicting metadata filters on {key!r}", 422)
+            node = child
+        if isinstance(node.get(leaf), dict):
+            raise VigilError(f"Conflicting metadata filters on {key!r}", 422)
+        node[leaf] = value
+    return document
+
+
+def metadata_condition(
+    column: Any, filters: dict[str, str], dialect_name: str
+) -> ColumnElement[bool]:
+    """Return a WHERE clause requiring *column* to match every filter."""
+    if dialect_name == "postgresql":
+        document = orjson.dumps(containment_document(filters)).decode()
+        contains: ColumnElement[bool] = column.op("@>", is_comparison=True)(
+            cast(literal(document), JSONB)
+        )
+        return contains
+    return and_(
+        *(column[tuple(key.split("."))].as_string() == value for key, value in filters.items())
+    )
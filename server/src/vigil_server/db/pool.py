@@ -0,0 +1,121 @@
+"""Connection pool configuration and checkout instrumentation.
+
+:func:`engine_options` turns the ``db_*`` settings into
+``create_async_engine`` keyword arguments for a given URL.  File-backed
+and server databases get an :class:`InstrumentedPool`, which times every
+checkout into ``vigil_db_pool_checkout_seconds`` and keeps a count of
+callers currently waiting for a connection.  A checkout slower than
+``settings.db_pool_checkout_warn_ms`` means requests are queueing for
+the pool; that is logged as a warning at most once per
+``_WARN_INTERVAL`` seconds per pool, with the number of slow checkouts
+since the last warning.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+from vigil_server.config import settings
+from vigil_server.metrics import DB_POOL_CHECKOUT_DURATION, DB_POOL_SLOW_CHECKOUTS
+
+logger = logging.getLogger("vigil_server.db.pool")
+
+_WARN_INTERVAL = 10.0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout latency and waiters."""
+
+    engine_name = "primary"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._slow_since_warning = 0
+        self._last_warning = 0.0
+
+    def connect(self) -> PoolProxiedConnection:
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.waiting -= 1
+            self._observe(time.perf_counter() - start)
+
+    def _observe(self, elapsed: float) -> None:
+        DB_POOL_CHECKOUT_DURATION.labels(self.engine_name).observe(elapsed)
+        if elapsed * 1000 < settings.db_pool_checkout_warn_ms:
+            return
+        DB_POOL_SLOW_CHECKOUTS.labels(self.engine_name).inc()
+        self._slow_since_warning += 1
+        now = time.monotonic()
+        if now - self._last_warning >= _WARN_INTERVAL:
+            logger.warning(
+                "Waited %.0f ms for a %s database connection "
+                "(%d slow checkouts since last warning; size=%d, checked_out=%d, overflow=%d)",
+                elapsed * 1000,
+                self.engine_name,
+                self._slow_since_warning,
+                self.size(),
+                self.checkedout(),
+                self.overflow(),
+            )
+            self._slow_since_warning = 0
+            self._last_warning = now
+
+
+def engine_options(
+    url: str,
+    engine_name: str,
+    *,
+    pool_size: int | None = None,
+    max_overflow: int | None = None,
+) -> dict[str, Any]:
+    """Return ``create_async_engine`` keyword arguments for *url*.
+
+    *pool_size* and *max_overflow* override the ``db_*`` settings.
+    """
+    options: dict[str, Any] = {"echo": settings.log_level == "debug", "future": True}
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a single shared connection (StaticPool).
+        return options
+
+    options.update(
+        poolclass=type(
+            f"{engine_name.title()}Pool", (InstrumentedPool,), {"engine_name": engine_name}
+        ),
+        pool_size=settings.db_pool_size if pool_size is None else pool_size,
+        max_overflow=settings.db_max_overflow if max_overflow is None else max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if backend == "postgresql" and parsed.get_driver_name() == "asyncpg":
+        connect_args: dict[str, Any] = {"statement_cache_size": settings.db_statement_cache_size}
+        if settings.db_statement_timeout_ms:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.db_statement_timeout_ms)
+            }
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(pool: Any) -> dict[str, int]:
+    """Return the state of *pool* for metrics (empty for non-queue pools)."""
+    if not isinstance(pool, InstrumentedPool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "waiting": pool.waiting,
+    }
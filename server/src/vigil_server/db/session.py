@@ -1,19 +1,93 @@
-"""Async SQLAlchemy engine and session factory."""
+"""Async SQLAlchemy engines and session factories.
+
+``engine`` / ``async_session`` talk to the primary database and are used
+for anything that writes.  ``read_engine`` / ``async_read_session`` serve
+read-only requests: they point at ``settings.database_read_url`` (e.g. a
+streaming replica) when it is set, and at the primary otherwise.  Sessions
+from ``async_read_session`` refuse to flush, so a write routed to a replica
+by mistake fails loudly instead of silently going nowhere.
+
+Pool sizing, recycling, pre-ping and driver options come from the
+``db_*`` settings; see :mod:`vigil_server.db.pool`.
+
+In SQLite high-throughput mode (:mod:`vigil_server.db.sqlite`) the read
+engine is a separate ``query_only`` pool on the same file, and
+``write_engine`` / ``async_write_session`` hold the single connection
+used by the batching ingest writer.  Otherwise ``write_engine`` is None.
+"""
 
 from __future__ import annotations
 
+from typing import Any
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 
 from vigil_server.config import settings
+from vigil_server.db.pool import engine_options
+from vigil_server.db.sqlite import apply_pragmas, is_file_sqlite
+from vigil_server.exceptions import VigilError
+
+_sqlite_fast = settings.sqlite_high_throughput and is_file_sqlite(settings.database_url)
 
 engine = create_async_engine(
-    settings.database_url,
-    echo=settings.log_level == "debug",
-    future=True,
+    settings.database_url, **engine_options(settings.database_url, "primary")
 )
 
+if settings.database_read_url:
+    read_engine = create_async_engine(
+        settings.database_read_url, **engine_options(settings.database_read_url, "read")
+    )
+elif _sqlite_fast:
+    read_engine = create_async_engine(
+        settings.database_url,
+        **engine_options(settings.database_url, "read", pool_size=settings.sqlite_read_pool_size),
+    )
+else:
+    read_engine = engine
+
+write_engine = (
+    create_async_engine(
+        settings.database_url,
+        **engine_options(settings.database_url, "writer", pool_size=1, max_overflow=0),
+    )
+    if _sqlite_fast
+    else None
+)
+
+if _sqlite_fast:
+    apply_pragmas(engine)
+    apply_pragmas(write_engine)  # type: ignore[arg-type]
+    if not settings.database_read_url:
+        apply_pragmas(read_engine, query_only=True)
+
 async_session = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
+
+
+class ReadOnlySession(Session):
+    """Session that raises on flush; backs :data:`async_read_session`."""
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _reject_flush(session: Session, *_args: Any) -> None:
+    if session.new or session.dirty or session.deleted:
+        raise VigilError("Attempted to write through a read-only database session")
+
+
+async_read_session = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    sync_session_class=ReadOnlySession,
+    expire_on_commit=False,
+)
+
+async_write_session = (
+    async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    if write_engine is not None
+    else None
+)
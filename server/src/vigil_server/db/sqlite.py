@@ -0,0 +1,56 @@
+"""SQLite high-throughput mode.
+
+With ``settings.sqlite_high_throughput`` on and a file-backed SQLite URL,
+every connection is opened with WAL journalling, ``synchronous=NORMAL``,
+a busy timeout and larger page-cache/mmap sizes.  WAL lets readers run
+alongside the single writer, so :mod:`vigil_server.db.session` adds a
+separate read pool (with ``query_only`` set) and a one-connection write
+engine used by :mod:`vigil_server.services.sqlite_writer`, which batches
+ingest transactions instead of letting requests fight over the write lock.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from vigil_server.config import settings
+
+
+def is_file_sqlite(url: str) -> bool:
+    """Return True for a SQLite URL that points at a file (not ``:memory:``)."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def connection_pragmas(query_only: bool = False) -> list[str]:
+    """PRAGMA statements run on every new connection."""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        # Negative cache_size is in KiB.
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_mb * 1024}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def apply_pragmas(engine: AsyncEngine, query_only: bool = False) -> None:
+    """Run :func:`connection_pragmas` on each connection *engine* opens."""
+    pragmas = connection_pragmas(query_only)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -2,20 +2,42 @@
 
 from __future__ import annotations
 
+import time
 from collections.abc import AsyncGenerator
 from typing import Annotated
 
 from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from vigil_server.config import settings
-from vigil_server.db.session import async_session
+from vigil_server.db.session import async_read_session, async_session
+from vigil_server.metrics import DB_SESSION_DURATION
+from vigil_server.services.auth_service import resolve_token_project
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Provide an async database session."""
-    async with async_session() as session, session.begin():
-        yield session
+    start = time.perf_counter()
+    try:
+        async with async_session() as session, session.begin():
+            yield session
+    finally:
+        DB_SESSION_DURATION.observe(time.perf_counter() - start)
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Provide a read-only session, on the read replica when one is configured.
+
+    No explicit transaction is opened and nothing is committed; the
+    implicit transaction is rolled back when the session closes.  Use it
+    for endpoints that only read -- replicas lag the primary, so anything
+    that must see its own writes belongs on :func:`get_db`.
+    """
+    start = time.perf_counter()
+    try:
+        async with async_read_session() as session:
+            yield session
+    finally:
+        DB_SESSION_DURATION.observe(time.perf_counter() - start)
 
 
 async def get_current_project(
@@ -30,35 +52,15 @@ async def get_current_project(
         )
 
     token = authorization.removeprefix("Bearer ").strip()
+    project_id = await resolve_token_project(token, db)
 
-    # Try JWT decode first
-    from vigil_server.services.auth_service import decode_token
-
-    subject = decode_token(token)
-    if subject is not None:
-        # Valid JWT — subject is user id; return "default" project for JWT users
-        return "default"
-
-    # Dev key returns default project
-    if token == settings.api_key:
-        return "default"
-
-    # Look up as API key in database
-    from sqlalchemy import select
-
-    from vigil_server.models.project import APIKey
-
-    stmt = select(APIKey).where(APIKey.key == token, APIKey.is_active == True)  # noqa: E712
-    result = await db.execute(stmt)
-    key_record = result.scalar_one_or_none()
-
-    if not key_record:
+    if project_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key or token",
         )
 
-    return key_record.project_id
+    return project_id
 
 
 async def get_optional_project(
@@ -73,30 +75,11 @@ async def get_optional_project(
         return "default"
 
     token = authorization.removeprefix("Bearer ").strip()
-
-    from vigil_server.services.auth_service import decode_token
-
-    subject = decode_token(token)
-    if subject is not None:
-        return "default"
-
-    if token == settings.api_key:
-        return "default"
-
-    from sqlalchemy import select
-
-    from vigil_server.models.project import APIKey
-
-    stmt = select(APIKey).where(APIKey.key == token, APIKey.is_active == True)  # noqa: E712
-    result = await db.execute(stmt)
-    key_record = result.scalar_one_or_none()
-
-    if not key_record:
-        return "default"
-
-    return key_record.project_id
+    project_id = await resolve_token_project(token, db)
+    return project_id or "default"
 
 
 DBSession = Annotated[AsyncSession, Depends(get_db)]
+ReadDBSession = Annotated[AsyncSession, Depends(get_read_db)]
 CurrentProject = Annotated[str, Depends(get_current_project)]
 GuestProject = Annotated[str, Depends(get_optional_project)]
@@ -58,6 +58,13 @@ class AuthenticationError(VigilError):
         super().__init__(message=message, status_code=401)
 
 
+class ServiceBusyError(VigilError):
+    """Raised when a bounded work queue is full and the request is shed."""
+
+    def __init__(self, message: str = "Server busy, retry later") -> None:
+        super().__init__(message=message, status_code=503)
+
+
 def register_error_handlers(app: FastAPI) -> None:
     """Register global exception handlers that return structured JSON."""
 
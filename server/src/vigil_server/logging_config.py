@@ -2,16 +2,37 @@
 
 Provides a JSON formatter and a ``configure_logging`` helper that should
 be called during application startup.
+
+Records are not written from the thread that logs them.  A
+:class:`ContextQueueHandler` captures everything that depends on the
+calling context (the rendered message, the traceback text and the
+``request_id``) and puts the record on a bounded queue; a
+:class:`~logging.handlers.QueueListener` thread formats it with orjson
+and writes it to stdout.  The event loop therefore never blocks on a slow
+stdout, and when the queue is full records are dropped and counted rather
+than waited on.  High-frequency DEBUG messages are rate limited per call
+site by :class:`DebugRateLimitFilter`.
 """
 
 from __future__ import annotations
 
-import json
+import copy
 import logging
+import queue
 import sys
+import time
+from collections import OrderedDict
 from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 
+import orjson
+
+from vigil_server.middleware.request_id import get_request_id
+
+_listener: QueueListener | None = None
+_handler: ContextQueueHandler | None = None
+
 
 class StructuredFormatter(logging.Formatter):
     """JSON log formatter that includes timestamp, level, logger, message,
@@ -20,42 +41,141 @@ class StructuredFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         log_entry: dict[str, Any] = {
-            "timestamp": datetime.now(UTC).isoformat(),
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
-        # Attach request_id if available
-        try:
-            from vigil_server.middleware.request_id import get_request_id
+        # Queued records carry the request_id captured when they were logged
+        request_id = getattr(record, "request_id", None) or get_request_id()
+        if request_id:
+            log_entry["request_id"] = request_id
 
-            request_id = get_request_id()
-            if request_id:
-                log_entry["request_id"] = request_id
-        except ImportError:
-            pass
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            log_entry["suppressed"] = suppressed
 
-        if record.exc_info and record.exc_info[1]:
+        if record.exc_text:
+            log_entry["exception"] = record.exc_text
+        elif record.exc_info and record.exc_info[1]:
             log_entry["exception"] = self.formatException(record.exc_info)
 
-        return json.dumps(log_entry)
+        return orjson.dumps(log_entry, default=str).decode()
+
+
+class ContextQueueHandler(QueueHandler):
+    """Queue handler that snapshots per-call context and never blocks."""
+
+    def __init__(self, log_queue: queue.Queue[logging.LogRecord]) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = get_request_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """Let through at most ``max_per_second`` DEBUG records per call site.
 
+    A call site is identified by logger name and message template.  The
+    first record after a throttled interval carries a ``suppressed`` count
+    so totals can still be reconstructed.  Other levels are never limited.
 
-def configure_logging(level: str = "info") -> None:
+    At most ``max_sites`` call sites are tracked; the one least recently
+    active is forgotten first, so messages logged with a non-constant
+    template cannot grow the table without bound.
+    """
+
+    def __init__(self, max_per_second: int, max_sites: int = 1024) -> None:
+        super().__init__()
+        self._max = max_per_second
+        self._max_sites = max_sites
+        # key -> [window start, records passed in window, records suppressed]
+        self._sites: OrderedDict[tuple[str, object], list[Any]] = OrderedDict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self._max <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= 1.0:
+            suppressed = site[2] if site is not None else 0
+            self._sites[key] = [now, 1, 0]
+            self._sites.move_to_end(key)
+            if len(self._sites) > self._max_sites:
+                self._sites.popitem(last=False)
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if site[1] < self._max:
+            site[1] += 1
+            return True
+        site[2] += 1
+        return False
+
+
+def configure_logging(
+    level: str = "info",
+    *,
+    queue_size: int = 10_000,
+    debug_max_per_second: int = 20,
+) -> None:
     """Configure root logging with the structured JSON formatter.
 
     Args:
         level: Log level name (e.g. ``"info"``, ``"debug"``).
+        queue_size: Records buffered for the writer thread before new ones
+            are dropped.
+        debug_max_per_second: Per-call-site DEBUG rate limit (0 disables).
     """
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(StructuredFormatter())
+    global _listener, _handler
+    shutdown_logging()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter())
+
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(DebugRateLimitFilter(debug_max_per_second))
 
     root = logging.getLogger()
     root.handlers.clear()
-    root.addHandler(handler)
+    root.addHandler(queue_handler)
     root.setLevel(level.upper())
+    _handler = queue_handler
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
 
     # Quiet noisy third-party loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Stop the writer thread after flushing queued records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Return how many records were dropped because the log queue was full."""
+    return _handler.dropped if _handler is not None else 0
@@ -11,11 +11,17 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from vigil_server.api.router import api_router
 from vigil_server.config import settings
-from vigil_server.db.session import engine
+from vigil_server.db.session import engine, read_engine, write_engine
 from vigil_server.exceptions import register_error_handlers
-from vigil_server.logging_config import configure_logging
+from vigil_server.logging_config import configure_logging, shutdown_logging
+from vigil_server.middleware.compression import CompressionMiddleware
+from vigil_server.middleware.metrics import MetricsMiddleware
+from vigil_server.middleware.profiling import ProfilingMiddleware
 from vigil_server.middleware.rate_limit import RateLimitMiddleware
 from vigil_server.middleware.request_id import RequestIDMiddleware
+from vigil_server.serialization import FastJSONResponse
+from vigil_server.services.executor import shutdown_executors
+from vigil_server.services.shared_state import close_backend
 
 logger = logging.getLogger("vigil_server")
 
@@ -23,7 +29,11 @@ logger = logging.getLogger("vigil_server")
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Manage application lifecycle: DB pool, Redis connection."""
-    configure_logging(settings.log_level)
+    configure_logging(
+        settings.log_level,
+        queue_size=settings.log_queue_size,
+        debug_max_per_second=settings.log_debug_max_per_second,
+    )
     logger.info("Starting Vigil server...")
 
     # For SQLite dev mode, create tables automatically
@@ -34,6 +44,13 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("SQLite tables created")
 
+    # SQLite high-throughput mode: batch ingest writes through one task
+    from vigil_server.db.session import async_write_session
+    from vigil_server.services.sqlite_writer import sqlite_writer
+
+    if async_write_session is not None:
+        await sqlite_writer.start(async_write_session)
+
     # Crash recovery: mark any "running" replays as "failed"
     await _recover_stuck_replays()
 
@@ -42,12 +59,57 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     await drift_scheduler.start()
 
+    # Keep daily partitions ahead of ingest and drop expired ones (PostgreSQL)
+    from vigil_server.services.partitions import partition_maintainer
+
+    await partition_maintainer.start()
+
+    # Apply per-project retention TTLs
+    from vigil_server.services.retention import retention_service
+
+    await retention_service.start()
+
+    # Load the zstd dictionaries used for compressed span payloads
+    from vigil_server.services.payload_dictionaries import dictionary_refresher
+
+    await dictionary_refresher.start()
+
+    # Move old traces to cold storage segment files
+    from vigil_server.services.cold_storage import cold_storage
+
+    await cold_storage.start()
+
+    # Deliver broadcasts from other workers to this worker's sockets
+    from vigil_server.services.websocket_manager import manager
+
+    await manager.start()
+
+    # Watch for handlers that block the event loop
+    from vigil_server.services.loop_monitor import loop_monitor
+
+    if settings.loop_monitor_enabled:
+        await loop_monitor.start()
+
     yield
 
     # Cleanup
+    await loop_monitor.stop()
+    await sqlite_writer.stop()
     await drift_scheduler.stop()
+    await partition_maintainer.stop()
+    await retention_service.stop()
+    await cold_storage.stop()
+    await dictionary_refresher.stop()
+    await manager.stop()
+    shutdown_executors()
+    await close_backend()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    if write_engine is not None:
+        await write_engine.dispose()
     await engine.dispose()
     logger.info("Vigil server shut down")
+    shutdown_logging()
 
 
 async def _recover_stuck_replays() -> None:
@@ -78,20 +140,26 @@ def create_app() -> FastAPI:
         description="Observability server for AI agent pipelines",
         version="0.1.0",
         lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
 
     # Error handlers
     register_error_handlers(app)
 
     # Middleware (order matters — outermost first)
+    if settings.debug_token or settings.request_db_stats:
+        app.add_middleware(ProfilingMiddleware)
     app.add_middleware(RateLimitMiddleware)
     app.add_middleware(RequestIDMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origins,
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-        allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+        allow_headers=["Authorization", "Content-Type", "X-Request-ID", "If-None-Match"],
+        expose_headers=["ETag", "X-Request-ID"],
     )
 
     # Routes
@@ -0,0 +1,316 @@
+"""In-process Prometheus metrics.
+
+A deliberately small implementation of counters, gauges and histograms
+rendered in the Prometheus text exposition format by ``GET /metrics``.
+Recording is a dict lookup plus an addition (and a bisect for histograms),
+so instrumentation can stay on under full ingest load.  Values are kept
+per worker process; Prometheus aggregates across workers at query time.
+
+Metrics are module-level objects, labelled with :meth:`_Metric.labels`::
+
+    HTTP_REQUEST_DURATION.labels("GET", "/v1/traces").observe(0.012)
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any, Generic, TypeVar
+
+C = TypeVar("C")
+
+_registry: list[_Metric[Any]] = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC, Generic[C]):
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        registered: bool = True,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], C] = {}
+        if registered:
+            _registry.append(self)
+
+    @abstractmethod
+    def _new_child(self) -> C:
+        """Create the value holder for a new label combination."""
+
+    def labels(self, *values: str) -> C:
+        """Return the child for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def clear(self) -> None:
+        """Drop all recorded label combinations."""
+        self._children.clear()
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """Render one sample line per child (and bucket)."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric[_Value]):
+    """Monotonically increasing total.
+
+    ``set`` exists for totals maintained elsewhere (e.g. dropped WebSocket
+    messages) that are copied in when metrics are scraped.
+    """
+
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(c.value)}"
+            for k, c in self._children.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: tuple[float, ...]) -> None:
+        self._upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self._upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric[_HistogramChild]):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        *,
+        registered: bool = True,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registered=registered)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, h in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), h.counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(h.sum)}")
+            lines.append(f"{self.name}_count{labels} {h.count}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# --- HTTP ---------------------------------------------------------------------
+
+HTTP_REQUESTS = Counter(
+    "vigil_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "vigil_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "vigil_log_records_dropped_total", "Log records dropped because the log queue was full."
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "vigil_event_loop_lag_seconds",
+    "How late the event loop ran a scheduled tick.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "vigil_event_loop_blocked_total", "Ticks delayed past the loop monitor threshold."
+)
+
+# --- Ingest -------------------------------------------------------------------
+
+INGEST_SPANS = Counter("vigil_ingest_spans_total", "Spans ingested.")
+INGEST_BATCH_SIZE = Histogram(
+    "vigil_ingest_batch_size",
+    "Spans per ingest request.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+
+# --- Database -----------------------------------------------------------------
+
+DB_SESSION_DURATION = Histogram(
+    "vigil_db_session_duration_seconds", "Time a request-scoped database session is held."
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "vigil_db_pool_connections", "Database pool connections by state.", ("engine", "state")
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "vigil_db_pool_checkout_seconds",
+    "Time spent obtaining a database connection from the pool.",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_SLOW_CHECKOUTS = Counter(
+    "vigil_db_pool_slow_checkouts_total",
+    "Pool checkouts slower than the configured warning threshold.",
+    ("engine",),
+)
+DB_WRITE_BATCH_SIZE = Histogram(
+    "vigil_db_write_batch_size",
+    "Write jobs committed per transaction by the SQLite batching writer.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+DB_PARTITIONS_DROPPED = Counter(
+    "vigil_db_partitions_dropped_total", "Expired partitions dropped by retention.", ("table",)
+)
+COLD_TRACES_ARCHIVED = Counter(
+    "vigil_cold_traces_archived_total", "Traces moved to cold storage segment files."
+)
+PAYLOAD_BYTES = Counter(
+    "vigil_payload_bytes_total",
+    "Span payload bytes before (raw) and after (stored) compression.",
+    ("kind",),
+)
+BLOB_BYTES_OFFLOADED = Counter(
+    "vigil_blob_bytes_offloaded_total", "Span payload bytes moved to the blob store."
+)
+BLOBS_COLLECTED = Counter(
+    "vigil_blobs_collected_total", "Unreferenced blobs deleted from the blob store."
+)
+RETENTION_ROWS = Counter(
+    "vigil_retention_rows_total",
+    "Rows processed by per-project retention, by action.",
+    ("action",),
+)
+
+# --- WebSocket ----------------------------------------------------------------
+
+WS_CONNECTIONS = Gauge("vigil_ws_connections", "Open WebSocket connections.")
+WS_QUEUED_MESSAGES = Gauge("vigil_ws_queued_messages", "Messages waiting in WebSocket send queues.")
+WS_TAIL_SUBSCRIBERS = Gauge(
+    "vigil_ws_tail_subscribers", "WebSockets with a live-tail subscription."
+)
+WS_MESSAGES_DROPPED = Counter(
+    "vigil_ws_messages_dropped_total", "WebSocket messages dropped from full send queues."
+)
+WS_MESSAGES_COALESCED = Counter(
+    "vigil_ws_messages_coalesced_total", "WebSocket messages merged into a queued message."
+)
+WS_DISCONNECTS = Counter(
+    "vigil_ws_forced_disconnects_total", "WebSockets closed by the server.", ("reason",)
+)
+
+# --- Background work ----------------------------------------------------------
+
+DRIFT_CHECK_DURATION = Histogram(
+    "vigil_drift_check_duration_seconds",
+    "Duration of scheduled per-project drift checks.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+REPLAY_RUNS = Counter("vigil_replay_runs_total", "Finished replay executions.", ("status",))
+LLM_CALL_DURATION = Histogram(
+    "vigil_llm_call_duration_seconds",
+    "Latency of replay LLM calls.",
+    ("provider", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+EXECUTOR_PENDING = Gauge(
+    "vigil_executor_pending_jobs", "Queued plus running executor jobs.", ("executor",)
+)
+EXECUTOR_REJECTED = Counter(
+    "vigil_executor_rejected_total", "Executor submissions rejected as busy.", ("executor",)
+)
+AUTH_CACHE_LOOKUPS = Counter(
+    "vigil_auth_cache_lookups_total", "Auth cache lookups by result.", ("result",)
+)
@@ -0,0 +1,185 @@
+"""Response compression middleware.
+
+Compresses responses with brotli when the optional ``brotli`` package is
+installed and the client accepts it, otherwise with gzip.  Body chunks are
+buffered until the size threshold is reached; smaller responses are sent
+as-is, larger ones are compressed (incrementally if the body is streamed).
+Server-sent events and responses that already carry a
+``Content-Encoding`` pass through unchanged.
+"""
+
+from __future__ import annotations
+
+import gzip
+import zlib
+from typing import Any, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from vigil_server.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def _quality(params: list[str]) -> float:
+    """Return the ``q`` value among an encoding's parameters (default 1)."""
+    for param in params:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _choose_encoding(accept_encoding: str) -> str | None:
+    """Pick the best supported encoding from an ``Accept-Encoding`` header."""
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, *params = token.split(";")
+        if _quality(params) > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    """Compress *body*; *level* is the brotli quality for ``br``, else the gzip level."""
+    if encoding == "br":
+        compressed: bytes = brotli.compress(body, quality=level)
+        return compressed
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class _StreamCompressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipStream:
+    def __init__(self, level: int) -> None:
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level: int) -> None:
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        chunk: bytes = self._obj.process(data) + self._obj.flush()
+        return chunk
+
+    def finish(self) -> bytes:
+        chunk: bytes = self._obj.finish()
+        return chunk
+
+
+class CompressionMiddleware:
+    """Compress HTTP responses with brotli or gzip.
+
+    Configuration is read from ``settings.compression_minimum_size`` (bytes
+    below which responses are sent as-is), ``settings.compression_level``
+    (gzip, 1-9) and ``settings.compression_brotli_quality`` (brotli, 0-11).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._minimum_size = settings.compression_minimum_size
+        self._level = settings.compression_level
+        self._brotli_quality = settings.compression_brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict[str, Any] | None = None
+        passthrough = False
+        buffer: list[bytes] = []
+        buffered = 0
+        stream: _StreamCompressor | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough, buffered, stream
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start = dict(message)
+                headers = Headers(raw=start["headers"])
+                if "content-encoding" in headers or headers.get("content-type", "").startswith(
+                    "text/event-stream"
+                ):
+                    passthrough = True
+                    await send(start)
+                return
+
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+
+            if stream is not None:
+                chunk = stream.compress(body)
+                if not more_body:
+                    chunk += stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            buffer.append(body)
+            buffered += len(body)
+            if more_body and buffered < self._minimum_size:
+                return
+
+            headers = MutableHeaders(raw=list(start["headers"]))
+            headers.add_vary_header("Accept-Encoding")
+            pending = b"".join(buffer)
+            buffer.clear()
+
+            if not more_body and buffered < self._minimum_size:
+                # Small response: send it as-is.
+                start["headers"] = headers.raw
+                await send(start)
+                await send({"type": "http.response.body", "body": pending})
+                return
+
+            headers["Content-Encoding"] = encoding
+            level = self._brotli_quality if encoding == "br" else self._level
+            if more_body:
+                # Streamed response: compress the rest chunk by chunk.
+                stream = _BrotliStream(level) if encoding == "br" else _GzipStream(level)
+                del headers["Content-Length"]
+                pending = stream.compress(pending)
+            else:
+                pending = _compress(pending, encoding, level)
+                headers["Content-Length"] = str(len(pending))
+            start["headers"] = headers.raw
+
+            await send(start)
+            await send({"type": "http.response.body", "body": pending, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
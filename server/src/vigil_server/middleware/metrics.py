@@ -0,0 +1,69 @@
+"""Request metrics middleware."""
+
+from __future__ import annotations
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from vigil_server.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+# Any other request method is labelled "other", so clients cannot add series.
+KNOWN_METHODS = frozenset(
+    {"GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"}
+)
+
+
+def _route_template(scope: Scope) -> str:
+    """Return the full path template of the matched route.
+
+    Routes from included routers may report their path relative to the
+    include prefix, so the prefix is recovered from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not isinstance(template, str) or not template:
+        return "unmatched"
+    path: str = scope["path"]
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    if path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency per route.
+
+    Requests are labelled with the route template (``/v1/traces/{trace_id}``)
+    rather than the raw path so label cardinality stays bounded; requests
+    that match no route share the ``unmatched`` label, and non-standard
+    methods the ``other`` label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            template = _route_template(scope)
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "other"
+            HTTP_REQUEST_DURATION.labels(method, template).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, template, str(status_code)).inc()
@@ -0,0 +1,129 @@
+"""Opt-in request profiling middleware.
+
+Only installed when ``settings.debug_token`` or ``settings.request_db_stats``
+is set, so a default deployment pays nothing for it.  A request is profiled
+when it carries ``X-Vigil-Profile: <debug_token>`` or when profiling has been
+armed through ``POST /debug/profiles/arm``; see
+:mod:`vigil_server.services.profiling`.
+
+Profiled requests, and every request when ``request_db_stats`` is on, get
+their SQL statement count and time logged with the request ID and reported
+in a ``Server-Timing`` header.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import logging
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from vigil_server.config import settings
+from vigil_server.middleware.request_id import get_request_id
+from vigil_server.services.profiling import (
+    ProfileStore,
+    RequestProfile,
+    install_query_listeners,
+    profile_store,
+    render_stats,
+    stop_tracking,
+    track_queries,
+)
+
+logger = logging.getLogger("vigil_server.middleware.profiling")
+
+PROFILE_HEADER = "x-vigil-profile"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles selected requests."""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore | None = None) -> None:
+        self.app = app
+        self.store = profile_store if store is None else store
+        self._token = settings.debug_token.encode()
+        self._db_stats = settings.request_db_stats
+        install_query_listeners()
+
+    def _claim_profile(self, scope: Scope) -> bool:
+        """Claim the profiler if this request asked for a profile or is armed."""
+        if not self._token:
+            return False
+        header = Headers(scope=scope).get(PROFILE_HEADER)
+        if header is not None and hmac.compare_digest(header.encode(), self._token):
+            return self.store.acquire()
+        if not self.store.take_armed(scope["path"]):
+            return False
+        if self.store.acquire():
+            return True
+        # Another request holds the profiler; keep the slot for a later one.
+        self.store.return_armed()
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = self._claim_profile(scope)
+        if not profile and not self._db_stats:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = get_request_id() or str(uuid.uuid4())
+        queries, token = track_queries()
+        status: int | None = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"',
+                )
+                if profile:
+                    headers["X-Vigil-Profile-Id"] = request_id
+            await send(message)
+
+        profiler = cProfile.Profile() if profile else None
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            stop_tracking(token)
+            logger.info(
+                "%s %s: %d queries in %.1f ms (request %.1f ms)",
+                scope["method"],
+                scope["path"],
+                queries.count,
+                queries.seconds * 1000,
+                duration_ms,
+            )
+            if profiler is not None:
+                try:
+                    self.store.add(
+                        RequestProfile(
+                            request_id=request_id,
+                            method=scope["method"],
+                            path=scope["path"],
+                            status=status,
+                            duration_ms=duration_ms,
+                            queries=queries.count,
+                            query_ms=round(queries.seconds * 1000, 3),
+                            created_at=time.time(),
+                            stats=render_stats(profiler, settings.profiling_stats_limit),
+                        )
+                    )
+                finally:
+                    self.store.release()
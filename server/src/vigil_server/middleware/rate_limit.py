@@ -1,56 +1,81 @@
-"""In-memory token-bucket rate limiter by client IP."""
+"""Token-bucket rate limiter keyed by API key, project or client IP."""
 
 from __future__ import annotations
 
-import time
-from collections import defaultdict
-from typing import Any
+import hashlib
+import logging
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from vigil_server.config import settings
+from vigil_server.services.auth_cache import auth_cache
+from vigil_server.services.shared_state import SharedStateBackend, get_backend
 
+logger = logging.getLogger("vigil_server.middleware.rate_limit")
 
-class _Bucket:
-    __slots__ = ("tokens", "last_refill")
 
-    def __init__(self, capacity: int) -> None:
-        self.tokens = float(capacity)
-        self.last_refill = time.monotonic()
+def rate_limit_key(scope: Scope, key_by: str) -> str:
+    """Derive the bucket key for a request.
+
+    ``key_by`` is ``"project"`` (bucket per project), ``"api_key"`` (bucket
+    per bearer token) or ``"ip"``.  A token only gets its own bucket once the
+    auth cache holds a positive resolution for it; unknown or invalid tokens
+    fall back to the client IP, so random bearer strings can neither dodge
+    the limit nor flood the bucket table.
+    """
+    if key_by in ("project", "api_key"):
+        authorization = Headers(scope=scope).get("authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization.removeprefix("Bearer ").strip()
+            project_id = auth_cache.peek(token)
+            if project_id is not None:
+                if key_by == "project":
+                    return f"project:{project_id}"
+                return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Token-bucket rate limiter keyed by client IP.
+class RateLimitMiddleware:
+    """Pure ASGI token-bucket rate limiter.
 
     Configuration is read from ``settings.rate_limit_requests`` (bucket
-    capacity) and ``settings.rate_limit_window_seconds`` (refill window).
+    capacity), ``settings.rate_limit_window_seconds`` (refill window),
+    and ``settings.rate_limit_key`` (what a bucket is keyed by).  Buckets
+    live in the shared-state backend, so with Redis the limit holds across
+    all workers.  If the backend is unreachable requests are let through.
     """
 
-    def __init__(self, app: Any) -> None:
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, backend: SharedStateBackend | None = None) -> None:
+        self.app = app
+        self._backend = backend
         self._capacity = settings.rate_limit_requests
         self._window = settings.rate_limit_window_seconds
-        self._rate = self._capacity / self._window
-        self._buckets: dict[str, _Bucket] = defaultdict(lambda: _Bucket(self._capacity))
+        self._key_by = settings.rate_limit_key
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        client_ip = request.client.host if request.client else "unknown"
-        bucket = self._buckets[client_ip]
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        now = time.monotonic()
-        elapsed = now - bucket.last_refill
-        bucket.tokens = min(self._capacity, bucket.tokens + elapsed * self._rate)
-        bucket.last_refill = now
-
-        if bucket.tokens < 1:
-            retry_after = int((1 - bucket.tokens) / self._rate) + 1
-            return JSONResponse(
+        backend = self._backend or get_backend()
+        try:
+            retry_after = await backend.take_token(
+                rate_limit_key(scope, self._key_by), self._capacity, self._window
+            )
+        except Exception:
+            logger.warning("Rate-limit backend unavailable; allowing request", exc_info=True)
+            retry_after = 0.0
+        if retry_after > 0:
+            response = JSONResponse(
                 status_code=429,
                 content={"error": "Too many requests"},
-                headers={"Retry-After": str(retry_after)},
+                headers={"Retry-After": str(int(retry_after) + 1)},
             )
+            await response(scope, receive, send)
+            return
 
-        bucket.tokens -= 1
-        return await call_next(request)
+        await self.app(scope, receive, send)
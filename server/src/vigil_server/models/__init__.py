@@ -1,12 +1,16 @@
 """Import all models so Alembic can discover them."""
 
+from vigil_server.models.archived_trace import ArchivedTrace
 from vigil_server.models.base import Base
 from vigil_server.models.drift import DriftAlert
+from vigil_server.models.id_registry import SpanRegistration, TraceRegistration
 from vigil_server.models.notification import Notification
+from vigil_server.models.payload_dictionary import PayloadDictionary
 from vigil_server.models.project import APIKey, Project
 from vigil_server.models.project_settings import ProjectSettings
 from vigil_server.models.replay import ReplayRun
 from vigil_server.models.span import Span
+from vigil_server.models.span_search import span_search
 from vigil_server.models.trace import Trace
 from vigil_server.models.user import User
 
@@ -21,4 +25,9 @@ __all__ = [
     "ReplayRun",
     "ProjectSettings",
     "Notification",
+    "ArchivedTrace",
+    "PayloadDictionary",
+    "span_search",
+    "TraceRegistration",
+    "SpanRegistration",
 ]
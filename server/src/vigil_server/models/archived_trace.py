@@ -0,0 +1,23 @@
+"""Index of traces moved to cold storage segment files."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from vigil_server.models.base import Base, TimestampMixin, UUIDMixin
+
+
+class ArchivedTrace(UUIDMixin, TimestampMixin, Base):
+    """Where an archived trace lives; ``id`` is the original trace id."""
+
+    __tablename__ = "archived_traces"
+
+    project_id: Mapped[str] = mapped_column(String(64), index=True)
+    trace_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    # Path relative to ``settings.cold_storage_dir``
+    segment: Mapped[str] = mapped_column(String(512))
+    offset: Mapped[int] = mapped_column(BigInteger)
+    length: Mapped[int] = mapped_column(Integer)
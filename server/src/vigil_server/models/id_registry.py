@@ -0,0 +1,38 @@
+"""Registries that keep trace and span ids unique.
+
+After migration 007 the partitioned PostgreSQL ``traces`` and ``spans``
+tables can only enforce uniqueness together with ``created_at``, so
+``traces.id``, ``traces.external_id`` and ``spans.id`` are unique only
+through these plain tables: ingest claims an id here (``INSERT ... ON
+CONFLICT DO NOTHING``) before writing the row, see
+:mod:`vigil_server.services.id_registry`.  The same code path runs on
+SQLite, where the tables are redundant with the primary keys.
+
+Each entry carries the ``created_at`` of the row it registers, so dropping
+a partition can drop its entries too.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from vigil_server.models.base import Base
+
+
+class TraceRegistration(Base):
+    __tablename__ = "trace_registry"
+
+    id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    external_id: Mapped[str | None] = mapped_column(String(256), unique=True, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+
+class SpanRegistration(Base):
+    __tablename__ = "span_registry"
+
+    id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    trace_id: Mapped[str] = mapped_column(String(128), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
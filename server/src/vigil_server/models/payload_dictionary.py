@@ -0,0 +1,22 @@
+"""Trained zstd dictionaries used to compress span payloads."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from vigil_server.models.base import Base, TimestampMixin
+
+
+class PayloadDictionary(TimestampMixin, Base):
+    """A dictionary; new writes use the newest one past ``activate_after``."""
+
+    __tablename__ = "payload_dictionaries"
+
+    # Small integer ids keep the per-value envelope short.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    sample_count: Mapped[int] = mapped_column(Integer, default=0)
+    activate_after: Mapped[datetime] = mapped_column(DateTime(timezone=True))
@@ -34,4 +34,9 @@ class ProjectSettings(UUIDMixin, TimestampMixin, Base):
     drift_check_interval_minutes: Mapped[int] = mapped_column(Integer, default=60)
     drift_check_enabled: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    # Retention, in days; None keeps data forever
+    payload_ttl_days: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    raw_span_ttl_days: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    summary_ttl_days: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
     project: Mapped[Project] = relationship(back_populates="settings")
@@ -5,14 +5,24 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import JSON, DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from vigil_server.models.base import Base, TimestampMixin, UUIDMixin
+from vigil_server.db.compression import CompressedJSON
+from vigil_server.models.base import Base, MetadataJSON, TimestampMixin, UUIDMixin
 
 
 class Span(UUIDMixin, TimestampMixin, Base):
     __tablename__ = "spans"
+    __table_args__ = (
+        Index("ix_spans_trace_id_parent_span_id", "trace_id", "parent_span_id"),
+        Index(
+            "ix_spans_metadata",
+            "metadata",
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     trace_id: Mapped[str] = mapped_column(
         String(64), ForeignKey("traces.id", ondelete="CASCADE"), index=True
@@ -21,10 +31,14 @@ class Span(UUIDMixin, TimestampMixin, Base):
     name: Mapped[str] = mapped_column(String(256), default="")
     kind: Mapped[str] = mapped_column(String(32), default="custom", index=True)
     status: Mapped[str] = mapped_column(String(32), default="unset", index=True)
-    input: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
-    output: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
-    metadata_: Mapped[dict[str, Any]] = mapped_column("metadata", JSON, default=dict, nullable=True)
-    events: Mapped[list[dict[str, Any]]] = mapped_column(JSON, default=list, nullable=True)
+    input: Mapped[dict[str, Any] | None] = mapped_column(CompressedJSON, nullable=True)
+    output: Mapped[dict[str, Any] | None] = mapped_column(CompressedJSON, nullable=True)
+    metadata_: Mapped[dict[str, Any]] = mapped_column(
+        "metadata", MetadataJSON, default=dict, nullable=True
+    )
+    events: Mapped[list[dict[str, Any]]] = mapped_column(
+        CompressedJSON, default=list, nullable=True
+    )
     start_time: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True, index=True
     )
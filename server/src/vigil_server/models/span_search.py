@@ -0,0 +1,73 @@
+"""Full-text index over span payload text.
+
+Not a mapped model: the table differs per database, so it is created with
+raw DDL when the schema is created (and by migration 012).
+
+* SQLite: an FTS5 virtual table.  The id columns are indexed too, so
+  project scoping and deletes resolve through the FTS index with
+  ``MATCH`` instead of scanning it.
+* PostgreSQL: a plain table with a generated ``tsvector`` column and a GIN
+  index on it.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Text, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from vigil_server.models.base import Base
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+# Text search configuration on PostgreSQL.  ``simple`` does no stemming or
+# stop-word removal, which suits multilingual prompts and identifiers.
+TS_CONFIG = "simple"
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS span_search USING fts5("
+    "content, project_id, trace_id, span_id, created_at UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+POSTGRESQL_DDL = (
+    "CREATE TABLE IF NOT EXISTS span_search ("
+    "span_id VARCHAR(64) NOT NULL, "
+    "trace_id VARCHAR(64) NOT NULL, "
+    "project_id VARCHAR(64) NOT NULL, "
+    "created_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "content TEXT NOT NULL, "
+    f"tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', content)) STORED)",
+    "CREATE INDEX IF NOT EXISTS ix_span_search_tsv ON span_search USING gin (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_span_search_project_created "
+    "ON span_search (project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_span_search_trace_id ON span_search (trace_id)",
+    "CREATE INDEX IF NOT EXISTS ix_span_search_span_id ON span_search (span_id)",
+)
+
+# Detached from ``Base.metadata`` so ``create_all`` leaves it to the DDL below.
+span_search = Table(
+    "span_search",
+    MetaData(),
+    Column("span_id", String(64)),
+    Column("trace_id", String(64)),
+    Column("project_id", String(64)),
+    Column("created_at", DateTime(timezone=True)),
+    Column("content", Text),
+    Column("tsv", TSVECTOR),
+)
+
+_DDL_BY_DIALECT = {"sqlite": (SQLITE_DDL,), "postgresql": POSTGRESQL_DDL}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_span_search(target: MetaData, connection: Connection, **kw: Any) -> None:
+    for statement in _DDL_BY_DIALECT.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_span_search(target: MetaData, connection: Connection, **kw: Any) -> None:
+    connection.exec_driver_sql("DROP TABLE IF EXISTS span_search")
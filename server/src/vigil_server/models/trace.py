@@ -5,24 +5,37 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import JSON, DateTime, String
+from sqlalchemy import JSON, DateTime, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from vigil_server.models.base import Base, TimestampMixin, UUIDMixin
+from vigil_server.models.base import Base, MetadataJSON, TimestampMixin, UUIDMixin
 
 
 class Trace(UUIDMixin, TimestampMixin, Base):
     __tablename__ = "traces"
+    __table_args__ = (
+        Index(
+            "ix_traces_metadata",
+            "metadata",
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     project_id: Mapped[str] = mapped_column(String(64), index=True)
     name: Mapped[str] = mapped_column(String(256), default="")
     status: Mapped[str] = mapped_column(String(32), default="unset")
-    external_id: Mapped[str | None] = mapped_column(
-        String(256), unique=True, index=True, nullable=True
+    # Unique through ``trace_registry`` (models.id_registry): the partitioned
+    # PostgreSQL table cannot enforce it, and neither ``id`` here nor in
+    # ``spans`` is a primary key on its own there.
+    external_id: Mapped[str | None] = mapped_column(String(256), index=True, nullable=True)
+    metadata_: Mapped[dict[str, Any]] = mapped_column(
+        "metadata", MetadataJSON, default=dict, nullable=True
     )
-    metadata_: Mapped[dict[str, Any]] = mapped_column("metadata", JSON, default=dict, nullable=True)
     start_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     end_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Aggregates kept after retention has deleted the trace's spans.
+    summary: Mapped[dict[str, Any] | None] = mapped_column(JSON(none_as_null=True), nullable=True)
 
     spans: Mapped[list[Span]] = relationship(  # noqa: F821
         back_populates="trace",
@@ -3,8 +3,22 @@
 from __future__ import annotations
 
 from datetime import datetime
+from itertools import pairwise
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+
+def check_ttl_order(payload: int | None, raw_span: int | None, summary: int | None) -> None:
+    """Raise ValueError unless the set TTLs satisfy payload <= raw_span <= summary."""
+    names = ("payload_ttl_days", "raw_span_ttl_days", "summary_ttl_days")
+    ttls = [
+        (name, ttl)
+        for name, ttl in zip(names, (payload, raw_span, summary), strict=True)
+        if ttl is not None
+    ]
+    for (shorter, low), (longer, high) in pairwise(ttls):
+        if low > high:
+            raise ValueError(f"{shorter} ({low}) must not exceed {longer} ({high})")
 
 
 class ProjectSettingsUpdate(BaseModel):
@@ -20,6 +34,20 @@ class ProjectSettingsUpdate(BaseModel):
     default_anthropic_model: str | None = Field(default=None, max_length=128)
     drift_check_interval_minutes: int | None = Field(default=None, ge=5, le=1440)
     drift_check_enabled: bool | None = None
+    payload_ttl_days: int | None = Field(
+        default=None, ge=1, description="Strip span input/output after this many days"
+    )
+    raw_span_ttl_days: int | None = Field(
+        default=None, ge=1, description="Delete spans after this many days, keeping a summary"
+    )
+    summary_ttl_days: int | None = Field(
+        default=None, ge=1, description="Delete traces entirely after this many days"
+    )
+
+    @model_validator(mode="after")
+    def ttls_ordered(self) -> ProjectSettingsUpdate:
+        check_ttl_order(self.payload_ttl_days, self.raw_span_ttl_days, self.summary_ttl_days)
+        return self
 
 
 class ProjectSettingsResponse(BaseModel):
@@ -35,5 +63,8 @@ class ProjectSettingsResponse(BaseModel):
     default_anthropic_model: str
     drift_check_interval_minutes: int
     drift_check_enabled: bool
+    payload_ttl_days: int | None = None
+    raw_span_ttl_days: int | None = None
+    summary_ttl_days: int | None = None
     created_at: datetime
     updated_at: datetime
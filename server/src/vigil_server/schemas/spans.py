@@ -28,11 +28,55 @@ class SpanResponse(BaseModel):
 
 class SpanTreeNode(BaseModel):
     span: SpanResponse
+    child_count: int = 0
     children: list[SpanTreeNode] = Field(default_factory=list)
 
 
+class SpanTreeResponse(BaseModel):
+    """One page of a trace's span hierarchy.
+
+    ``nodes`` are the children of ``parent_span_id`` (or the trace's root
+    spans when it is ``None``), expanded at most ``depth`` levels.  A node
+    whose ``children`` list is shorter than its ``child_count`` can be
+    expanded lazily by requesting the tree again with its id as
+    ``parent_span_id``.
+    """
+
+    trace_id: str
+    parent_span_id: str | None
+    nodes: list[SpanTreeNode]
+    total: int
+    offset: int
+    limit: int
+    depth: int
+
+
 class SpanListResponse(BaseModel):
     spans: list[SpanResponse]
     total: int
     offset: int
     limit: int
+
+
+class SpanSearchHit(BaseModel):
+    span_id: str
+    trace_id: str
+    name: str
+    kind: str
+    status: str
+    start_time: datetime | None
+    snippet: str
+    score: float
+
+
+class SpanSearchResponse(BaseModel):
+    """A page of search hits, best first.
+
+    ``snippet`` is HTML-escaped text with the matched terms wrapped in
+    ``<mark>`` tags.
+    """
+
+    query: str
+    results: list[SpanSearchHit]
+    offset: int
+    limit: int
@@ -94,6 +94,7 @@ class TraceResponse(BaseModel):
     end_time: datetime | None
     created_at: datetime
     span_count: int = 0
+    summary: dict[str, Any] | None = None
     spans: list[SpanResponse] = Field(default_factory=list)
 
     model_config = {"from_attributes": True}
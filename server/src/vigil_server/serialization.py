@@ -0,0 +1,52 @@
+"""Fast JSON encoding for API responses.
+
+Read endpoints that return large collections build plain dicts straight
+from database rows and hand them to :class:`FastJSONResponse`, which
+encodes with :mod:`orjson` instead of constructing a pydantic model per
+row and re-encoding it with the stdlib encoder.  The emitted JSON matches
+what the corresponding pydantic response schema would produce.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import date, datetime
+from typing import Any
+
+import orjson
+from starlette.responses import Response
+
+logger = logging.getLogger("vigil_server.serialization")
+
+# UTC datetimes are rendered with a trailing "Z", as pydantic does.
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for values the stdlib encoder does not handle."""
+    if isinstance(obj, datetime | date):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode *obj* as compact UTF-8 JSON.
+
+    Falls back to the stdlib encoder for values orjson rejects, such as
+    integers wider than 64 bits in user-supplied span payloads.
+    """
+    try:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        logger.debug("orjson could not encode response, falling back to json")
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with :func:`dumps`."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,128 @@
+"""In-process TTL/LRU cache for resolved bearer tokens.
+
+Maps a SHA-256 digest of a bearer token (never the token itself) to the
+project it authenticates, or to ``None`` for tokens known to be invalid.
+Negative entries expire sooner than positive ones so a newly issued key
+is never rejected for long.  Entries can be dropped per project when its
+keys are rotated.
+
+With a shared-state backend (see :mod:`vigil_server.services.shared_state`)
+this cache is the per-worker first tier in front of the shared one, and its
+TTLs are capped at ``settings.shared_state_local_ttl_seconds`` so a rotation
+on one worker is honoured by the others within a few seconds.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from vigil_server.config import settings
+
+
+class _Entry(NamedTuple):
+    project_id: str | None
+    expires_at: float
+
+
+class AuthCache:
+    """Bounded token -> project_id cache with expiry and hit/miss counters."""
+
+    def __init__(
+        self,
+        ttl_seconds: float | None = None,
+        negative_ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+    ) -> None:
+        self._ttl = settings.auth_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._negative_ttl = (
+            settings.auth_cache_negative_ttl_seconds
+            if negative_ttl_seconds is None
+            else negative_ttl_seconds
+        )
+        self._max_entries = settings.auth_cache_max_entries if max_entries is None else max_entries
+        if settings.shared_state_backend != "memory":
+            local_ttl = settings.shared_state_local_ttl_seconds
+            self._ttl = min(self._ttl, local_ttl)
+            self._negative_ttl = min(self._negative_ttl, local_ttl)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> tuple[bool, str | None]:
+        """Look up *token*.
+
+        Returns ``(found, project_id)``; ``project_id`` is ``None`` for a
+        cached rejection.
+        """
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        if entry.project_id is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, entry.project_id
+
+    def peek(self, token: str) -> str | None:
+        """Return the cached project for *token* without touching counters or LRU order."""
+        entry = self._entries.get(self._key(token))
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry.project_id
+
+    def set(self, token: str, project_id: str | None, ttl_seconds: float | None = None) -> None:
+        """Cache the resolution of *token*; ``None`` records a rejection."""
+        if ttl_seconds is None:
+            ttl_seconds = self._ttl if project_id is not None else self._negative_ttl
+        if ttl_seconds <= 0 or self._max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = _Entry(project_id, time.monotonic() + ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_token(self, token: str) -> None:
+        """Forget a single token."""
+        self._entries.pop(self._key(token), None)
+
+    def invalidate_project(self, project_id: str) -> int:
+        """Forget every cached token that resolves to *project_id*."""
+        stale = [k for k, e in self._entries.items() if e.project_id == project_id]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the current size."""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Singleton instance
+auth_cache = AuthCache()
@@ -2,18 +2,29 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import logging
+import time
 from datetime import UTC, datetime, timedelta
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import bcrypt
 from jose import JWTError, jwt
-from sqlalchemy import select
+from sqlalchemy import event, select
 
 from vigil_server.config import settings
+from vigil_server.models.project import APIKey
 from vigil_server.models.user import User
+from vigil_server.services.auth_cache import auth_cache
+from vigil_server.services.executor import run_crypto
+from vigil_server.services.shared_state import SharedStateBackend, get_backend
 
 if TYPE_CHECKING:
     from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+logger = logging.getLogger("vigil_server.services.auth_service")
 
 
 def hash_password(password: str) -> str:
@@ -26,6 +37,16 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the shared thread pool (bcrypt releases the GIL)."""
+    return await run_crypto(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """Verify a password on the shared thread pool."""
+    return await run_crypto(verify_password, plain, hashed)
+
+
 def create_access_token(subject: str, expires_delta: timedelta | None = None) -> str:
     """Create a signed JWT access token."""
     expire = datetime.now(UTC) + (expires_delta or timedelta(minutes=settings.jwt_expire_minutes))
@@ -33,15 +54,145 @@ def create_access_token(subject: str, expires_delta: timedelta | None = None) ->
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
-def decode_token(token: str) -> str | None:
-    """Decode a JWT and return the subject, or None if invalid."""
+def _decode_claims(token: str) -> dict[str, Any] | None:
     try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        return payload.get("sub")
+        return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
     except JWTError:
         return None
 
 
+def decode_token(token: str) -> str | None:
+    """Decode a JWT and return the subject, or None if invalid."""
+    claims = _decode_claims(token)
+    return claims.get("sub") if claims else None
+
+
+async def resolve_token_project(token: str, session: AsyncSession | None = None) -> str | None:
+    """Resolve a bearer token (JWT, dev key or API key) to a project_id.
+
+    Results, including rejections, are cached in :data:`auth_cache`, so
+    repeat requests with the same token skip both JWT verification and the
+    ``api_keys`` lookup.  A JWT is never cached past its ``exp`` claim.
+    With a shared-state backend, API-key resolutions are also cached there
+    so other workers skip the database too.  When *session* is omitted a
+    short-lived session is opened for the lookup on a cache miss.  Returns
+    ``None`` if the token is invalid.
+    """
+    found, project_id = auth_cache.get(token)
+    if found:
+        return project_id
+
+    # Valid JWT — subject is a user id; JWT users get the "default" project
+    claims = _decode_claims(token)
+    if claims is not None and claims.get("sub") is not None:
+        ttl = float(settings.auth_cache_ttl_seconds)
+        exp = claims.get("exp")
+        if isinstance(exp, int | float):
+            ttl = min(ttl, exp - time.time())
+        auth_cache.set(token, "default", ttl_seconds=ttl)
+        return "default"
+
+    # Dev key returns default project
+    if token == settings.api_key:
+        auth_cache.set(token, "default")
+        return "default"
+
+    backend = get_backend()
+    if backend.shared:
+        try:
+            cached = await backend.get(_shared_token_key(token))
+        except Exception:
+            logger.warning("Shared auth cache unavailable", exc_info=True)
+            cached = None
+        if cached is not None:
+            project_id = cached or None
+            auth_cache.set(token, project_id)
+            return project_id
+
+    # Look up as API key in database
+    stmt = select(APIKey.project_id).where(APIKey.key == token, APIKey.is_active == True)  # noqa: E712
+    if session is None:
+        from vigil_server.db.session import async_session
+
+        async with async_session() as own_session:
+            result = await own_session.execute(stmt)
+    else:
+        result = await session.execute(stmt)
+    project_id = result.scalar_one_or_none()
+
+    auth_cache.set(token, project_id)
+    if backend.shared:
+        try:
+            await _share_token_project(backend, token, project_id)
+        except Exception:
+            logger.warning("Shared auth cache unavailable", exc_info=True)
+    return project_id
+
+
+def _shared_token_key(token: str) -> str:
+    return "auth:token:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _share_token_project(
+    backend: SharedStateBackend, token: str, project_id: str | None
+) -> None:
+    """Publish an API-key resolution to the shared tier ("" marks a rejection)."""
+    key = _shared_token_key(token)
+    if project_id is None:
+        await backend.set(key, "", settings.auth_cache_negative_ttl_seconds)
+        return
+    ttl = settings.auth_cache_ttl_seconds
+    await backend.set(key, project_id, ttl)
+    await backend.add_to_index(f"auth:project:{project_id}", key, ttl)
+
+
+def _invalidate_local(project_id: str, tokens: list[str]) -> None:
+    for token in tokens:
+        auth_cache.invalidate_token(token)
+    auth_cache.invalidate_project(project_id)
+
+
+async def _invalidate_shared(project_id: str, tokens: list[str]) -> None:
+    backend = get_backend()
+    if not backend.shared:
+        return
+    try:
+        keys = await backend.pop_index(f"auth:project:{project_id}")
+        keys.extend(_shared_token_key(t) for t in tokens)
+        await backend.delete(*keys)
+    except Exception:
+        # Shared entries then expire on their own TTL.
+        logger.warning("Shared auth cache unavailable; not invalidated", exc_info=True)
+
+
+async def invalidate_project_tokens(project_id: str, tokens: list[str]) -> None:
+    """Drop cached resolutions for *tokens* and everything mapped to *project_id*."""
+    _invalidate_local(project_id, tokens)
+    await _invalidate_shared(project_id, tokens)
+
+
+# Shared-tier invalidations started from commit hooks, kept referenced until done.
+_pending_invalidations: set[asyncio.Task[None]] = set()
+
+
+def invalidate_project_tokens_on_commit(
+    session: AsyncSession, project_id: str, tokens: list[str]
+) -> None:
+    """Run :func:`invalidate_project_tokens` once *session* commits.
+
+    Invalidating earlier would let a concurrent request read the
+    not-yet-committed keys as still active and cache them again.
+    """
+
+    def _after_commit(_session: Session) -> None:
+        _invalidate_local(project_id, tokens)
+        task = asyncio.get_running_loop().create_task(_invalidate_shared(project_id, tokens))
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
+
+    event.listen(session.sync_session, "after_commit", _after_commit, once=True)
+
+
 async def get_user_by_email(session: AsyncSession, email: str) -> User | None:
     """Look up a user by email address."""
     result = await session.execute(select(User).where(User.email == email))
@@ -0,0 +1,294 @@
+"""Content-addressed blob storage for large span payloads.
+
+With ``settings.blob_offload_min_bytes`` set, span ``input``/``output``
+values whose JSON encoding is at least that large are written to the blob
+store at ingest and replaced in the row by a small reference::
+
+    {"__vigil_blob__": "sha256:<hex>", "size": <bytes>}
+
+Rows stay small, so list and aggregate queries no longer drag large values
+through the buffer cache.  List endpoints return the reference as-is; the
+trace detail, span tree and replay paths resolve it with
+:func:`resolve_payload`.  A blob that cannot be read leaves its reference
+in place instead of failing the request.
+
+Only :func:`offload_payload` writes references: a client value that looks
+like one is itself offloaded, so it comes back exactly as sent.  Blobs are
+stored per project and keyed by the SHA-256 of their content, so identical
+payloads in a project are stored once and re-running an ingest is harmless.
+
+Blobs are never rewritten, only collected: :func:`collect_blobs` deletes
+those no span of their project refers to any more.  It runs after every
+step that removes payloads (retention, partition drops and archiving);
+blobs stored within ``settings.blob_gc_grace_minutes`` are kept so a
+payload offloaded for a transaction that has not committed yet survives.
+
+:class:`LocalBlobStore` keeps blobs under ``settings.blob_store_dir``.
+Other stores (e.g. object storage) implement :class:`BlobStore` and are
+installed with :func:`set_blob_store`; ``settings.blob_store_backend``
+selects the built-in one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from sqlalchemy import or_, select
+
+from vigil_server.config import settings
+from vigil_server.exceptions import NotFoundError, VigilError
+from vigil_server.metrics import BLOB_BYTES_OFFLOADED, BLOBS_COLLECTED
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.models.trace import Trace as TraceModel
+from vigil_server.services.executor import run_in_thread
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger("vigil_server.services.blob_store")
+
+REFERENCE_KEY = "__vigil_blob__"
+
+# Fetches issued at once, well under the thread executor's pending limit.
+RESOLVE_CONCURRENCY = 16
+
+_PROJECT_RE = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+def is_reference(value: Any) -> bool:
+    return isinstance(value, dict) and REFERENCE_KEY in value
+
+
+class BlobStore(ABC):
+    """Interface for an immutable, content-addressed blob store, per project."""
+
+    @abstractmethod
+    async def put(self, project_id: str, key: str, data: bytes) -> None:
+        """Store *data* under *key*; if it is already there, only mark it as stored now."""
+
+    @abstractmethod
+    async def get(self, project_id: str, key: str) -> bytes:
+        """Return the blob stored under *key*; raises ``NotFoundError``."""
+
+    @abstractmethod
+    async def delete(self, project_id: str, key: str, stored_before: datetime) -> bool:
+        """Delete the blob unless it was stored at or after *stored_before*."""
+
+    @abstractmethod
+    async def keys(self, project_id: str) -> list[str]:
+        """Return the keys of every blob stored for *project_id*."""
+
+    @abstractmethod
+    async def projects(self) -> list[str]:
+        """Return the ids of the projects that have blobs."""
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under ``root/<project_id>``, fanned out by key prefix."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def _path(self, project_id: str, key: str) -> Path:
+        algorithm, _, digest = key.partition(":")
+        if algorithm != "sha256" or len(digest) != 64 or not digest.isalnum():
+            raise VigilError(f"Invalid blob key {key!r}", 400)
+        if not _PROJECT_RE.match(project_id):
+            raise VigilError(f"Invalid project id {project_id!r}", 400)
+        return self.root / project_id / digest[:2] / digest[2:4] / digest
+
+    def _write(self, path: Path, data: bytes) -> None:
+        if path.exists():
+            # Refresh the mtime so the collector's grace period starts over.
+            os.utime(path)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _unlink(path: Path, stored_before: datetime) -> bool:
+        try:
+            if path.stat().st_mtime >= stored_before.timestamp():
+                return False
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _keys(self, project_id: str) -> list[str]:
+        if not _PROJECT_RE.match(project_id):
+            raise VigilError(f"Invalid project id {project_id!r}", 400)
+        # Skips the temporary files of writes in progress.
+        return [
+            f"sha256:{path.name}"
+            for path in (self.root / project_id).glob("*/*/*")
+            if len(path.name) == 64 and path.is_file()
+        ]
+
+    def _projects(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return [p.name for p in self.root.iterdir() if p.is_dir() and _PROJECT_RE.match(p.name)]
+
+    async def put(self, project_id: str, key: str, data: bytes) -> None:
+        await run_in_thread(self._write, self._path(project_id, key), data)
+
+    async def get(self, project_id: str, key: str) -> bytes:
+        path = self._path(project_id, key)
+        try:
+            return await run_in_thread(path.read_bytes)
+        except FileNotFoundError as exc:
+            raise NotFoundError("Blob", key) from exc
+
+    async def delete(self, project_id: str, key: str, stored_before: datetime) -> bool:
+        return await run_in_thread(self._unlink, self._path(project_id, key), stored_before)
+
+    async def keys(self, project_id: str) -> list[str]:
+        return await run_in_thread(self._keys, project_id)
+
+    async def projects(self) -> list[str]:
+        return await run_in_thread(self._projects)
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the configured blob store, creating it on first use."""
+    global _store
+    if _store is None:
+        kind = settings.blob_store_backend
+        if kind == "local":
+            _store = LocalBlobStore(settings.blob_store_dir)
+        else:
+            raise VigilError(f"Unknown blob_store_backend: {kind!r}")
+        logger.info("Using %s blob store", kind)
+    return _store
+
+
+def set_blob_store(store: BlobStore | None) -> None:
+    """Replace the active store (``None`` re-reads settings on next use)."""
+    global _store
+    _store = store
+
+
+async def offload_payload(value: Any, project_id: str) -> Any:
+    """Return *value*, or a blob reference if it is at least the offload size."""
+    if value is None:
+        return value
+    # A client value shaped like a reference is always offloaded (even with
+    # offload off), so every reference stored in a row was made here.
+    escape = is_reference(value)
+    threshold = settings.blob_offload_min_bytes
+    if threshold <= 0 and not escape:
+        return value
+    data = orjson.dumps(value)
+    if len(data) < threshold and not escape:
+        return value
+    key = f"sha256:{hashlib.sha256(data).hexdigest()}"
+    await get_blob_store().put(project_id, key, data)
+    BLOB_BYTES_OFFLOADED.inc(len(data))
+    return {REFERENCE_KEY: key, "size": len(data)}
+
+
+async def resolve_payload(value: Any, project_id: str) -> Any:
+    """Return the payload a stored value stands for, fetching it if offloaded."""
+    if not is_reference(value):
+        return value
+    return orjson.loads(await get_blob_store().get(project_id, value[REFERENCE_KEY]))
+
+
+async def _resolve_or_keep(value: Any, project_id: str) -> Any:
+    try:
+        return await resolve_payload(value, project_id)
+    except VigilError:
+        logger.warning("Blob %s of project %s is unreadable", value[REFERENCE_KEY], project_id)
+        return value
+
+
+async def resolve_payloads(values: Sequence[Any], project_id: str) -> list[Any]:
+    """Resolve *values* of one project; a blob that cannot be read keeps its reference."""
+    resolved = list(values)
+    pending = [i for i, value in enumerate(resolved) if is_reference(value)]
+    for start in range(0, len(pending), RESOLVE_CONCURRENCY):
+        chunk = pending[start : start + RESOLVE_CONCURRENCY]
+        fetched = await asyncio.gather(*(_resolve_or_keep(resolved[i], project_id) for i in chunk))
+        for i, value in zip(chunk, fetched, strict=True):
+            resolved[i] = value
+    return resolved
+
+
+async def resolve_span_payloads(spans: Sequence[dict[str, Any]], project_id: str) -> None:
+    """Replace blob references in span dicts' ``input``/``output`` in place."""
+    fields = [(span, field) for span in spans for field in ("input", "output")]
+    values = await resolve_payloads([span.get(field) for span, field in fields], project_id)
+    for (span, field), value in zip(fields, values, strict=True):
+        span[field] = value
+
+
+async def referenced_keys(session: AsyncSession, project_id: str) -> set[str]:
+    """Return the blob keys that spans of *project_id* refer to."""
+    stmt = (
+        select(SpanModel.input, SpanModel.output)
+        .join(TraceModel, TraceModel.id == SpanModel.trace_id)
+        .where(
+            TraceModel.project_id == project_id,
+            or_(SpanModel.input.is_not(None), SpanModel.output.is_not(None)),
+        )
+        .execution_options(yield_per=500)
+    )
+    keys: set[str] = set()
+    async for row in await session.stream(stmt):
+        keys.update(value[REFERENCE_KEY] for value in row if is_reference(value))
+    return keys
+
+
+async def collect_blobs(
+    session_factory: async_sessionmaker[AsyncSession], now: datetime | None = None
+) -> int:
+    """Delete every unreferenced blob past the grace period; returns the count."""
+    stored_before = (now or datetime.now(UTC)) - timedelta(minutes=settings.blob_gc_grace_minutes)
+    store = get_blob_store()
+    deleted = 0
+    for project_id in await store.projects():
+        # Listed before the references are read: a blob stored in between is
+        # newer than the grace period and is kept.
+        keys = await store.keys(project_id)
+        if not keys:
+            continue
+        async with session_factory() as session:
+            referenced = await referenced_keys(session, project_id)
+        for key in set(keys) - referenced:
+            deleted += await store.delete(project_id, key, stored_before)
+    if deleted:
+        BLOBS_COLLECTED.inc(deleted)
+        logger.info("Deleted %d unreferenced blobs", deleted)
+    return deleted
+
+
+async def collect_blobs_after_cleanup(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """Run :func:`collect_blobs` after rows were removed, logging instead of raising."""
+    try:
+        await collect_blobs(session_factory)
+    except Exception:
+        logger.exception("Blob collection failed")
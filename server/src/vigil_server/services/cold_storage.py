@@ -0,0 +1,293 @@
+"""Cold storage: old traces moved to compressed, append-only segment files.
+
+With ``settings.cold_storage_after_days`` set, :class:`ColdStorage` runs
+every ``settings.cold_storage_interval_minutes`` and moves traces older than
+that out of the database, ``settings.cold_storage_batch_size`` at a time.
+Each batch becomes one new segment file per project under
+``settings.cold_storage_dir``::
+
+    <project_id>/<YYYYMMDD>-<id>.ndjson.zst
+
+A segment is NDJSON with every trace (spans included, shaped like
+``TraceResponse``) compressed as its own frame.  Concatenated frames are
+still a valid zstd (or gzip) stream, so ``zstd -dc segment | jq`` works,
+while the ``archived_traces`` index table records each trace's offset and
+length so a single trace is read back without touching the rest.
+Segments are written and fsynced before the batch is indexed and deleted
+from the hot tables, and are never modified afterwards.  A trace that
+changes between being serialized and being deleted (e.g. a late span is
+ingested) is left in the hot tables and archived again on a later run;
+its stale frame stays in the segment, unreferenced.
+
+Offloaded span payloads are fetched from the blob store and written into
+the segment, so archived traces do not depend on their blobs.
+
+Compression uses zstd when the optional ``zstandard`` package is installed,
+otherwise gzip; the segment suffix records which.
+
+:func:`~vigil_server.services.trace_service.get_trace` and
+:func:`~vigil_server.services.trace_service.get_trace_document` fall back to
+:data:`cold_storage`, so archived traces are returned like hot ones.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import gzip
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from sqlalchemy import delete, select
+
+from vigil_server.config import settings
+from vigil_server.exceptions import VigilError
+from vigil_server.metrics import COLD_TRACES_ARCHIVED
+from vigil_server.models.archived_trace import ArchivedTrace
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.models.trace import Trace as TraceModel
+from vigil_server.schemas.traces import TraceResponse
+from vigil_server.services.blob_store import collect_blobs_after_cleanup, resolve_span_payloads
+from vigil_server.services.executor import run_in_thread
+from vigil_server.services.id_registry import release_traces
+from vigil_server.services.search import unindex_traces
+from vigil_server.services.trace_service import trace_documents_before
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger("vigil_server.services.cold_storage")
+
+SEGMENT_SUFFIX = ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+
+
+def _compress(data: bytes) -> bytes:
+    level = settings.cold_storage_compression_level
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+
+
+def _decompress(segment: str, frame: bytes) -> bytes:
+    if segment.endswith(".gz"):
+        return gzip.decompress(frame)
+    if zstandard is None:
+        raise VigilError("Reading this archived trace requires the zstandard package")
+    return zstandard.ZstdDecompressor().decompress(frame)
+
+
+def write_segment(path: Path, records: list[bytes]) -> list[tuple[int, int]]:
+    """Compress *records* into a new segment file; returns each frame's (offset, length)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    locations = []
+    offset = 0
+    with path.open("xb") as fh:
+        for record in records:
+            frame = _compress(record)
+            fh.write(frame)
+            locations.append((offset, len(frame)))
+            offset += len(frame)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return locations
+
+
+def read_frame(path: Path, offset: int, length: int) -> bytes:
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        return fh.read(length)
+
+
+def trace_from_document(doc: dict[str, Any]) -> TraceModel:
+    """Build a detached ``Trace`` (with spans) from an archived document."""
+    parsed = TraceResponse.model_validate(doc)
+    return TraceModel(
+        id=parsed.id,
+        project_id=parsed.project_id,
+        name=parsed.name,
+        status=parsed.status,
+        external_id=parsed.external_id,
+        metadata_=parsed.metadata,
+        start_time=parsed.start_time,
+        end_time=parsed.end_time,
+        created_at=parsed.created_at,
+        summary=parsed.summary,
+        spans=[
+            SpanModel(
+                id=s.id,
+                trace_id=s.trace_id,
+                parent_span_id=s.parent_span_id,
+                name=s.name,
+                kind=s.kind,
+                status=s.status,
+                input=s.input,
+                output=s.output,
+                metadata_=s.metadata,
+                events=s.events,
+                start_time=s.start_time,
+                end_time=s.end_time,
+                created_at=s.created_at,
+            )
+            for s in parsed.spans
+        ],
+    )
+
+
+class ColdStorage:
+    """Archives old traces to segment files and reads them back."""
+
+    def __init__(
+        self,
+        root: str | Path | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self._root = Path(root) if root is not None else None
+        self._session_factory = session_factory
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def root(self) -> Path:
+        return self._root if self._root is not None else Path(settings.cold_storage_dir)
+
+    async def start(self) -> None:
+        if self._task is not None or settings.cold_storage_after_days <= 0:
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Cold storage archiver started (root=%s)", self.root)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _get_session_factory(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_factory is None:
+            from vigil_server.db.session import async_session
+
+            self._session_factory = async_session
+        return self._session_factory
+
+    async def archive_once(self, now: datetime | None = None) -> int:
+        """Move every trace older than the cutoff to cold storage; returns the count."""
+        cutoff = (now or datetime.now(UTC)) - timedelta(days=settings.cold_storage_after_days)
+        batch_size = settings.cold_storage_batch_size
+        total = 0
+        while True:
+            archived = await self._archive_batch(cutoff, batch_size)
+            total += archived
+            if archived < batch_size:
+                break
+        if total:
+            COLD_TRACES_ARCHIVED.inc(total)
+            logger.info("Archived %d traces to cold storage", total)
+            await collect_blobs_after_cleanup(self._get_session_factory())
+        return total
+
+    async def _archive_batch(self, cutoff: datetime, limit: int) -> int:
+        factory = self._get_session_factory()
+        async with factory() as session:
+            docs = await trace_documents_before(session, cutoff, limit)
+            if not docs:
+                return 0
+            versions = await self._trace_versions(session, [doc["id"] for doc in docs])
+        # Segments hold payloads in full, so their blobs can be collected.
+        for doc in docs:
+            await resolve_span_payloads(doc["spans"], doc["project_id"])
+
+        by_project: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for doc in docs:
+            by_project[doc["project_id"]].append(doc)
+
+        entries = []
+        stamp = datetime.now(UTC)
+        for project_id, project_docs in by_project.items():
+            segment = f"{project_id}/{stamp:%Y%m%d}-{uuid.uuid4().hex[:12]}{SEGMENT_SUFFIX}"
+            records = [orjson.dumps(doc) + b"\n" for doc in project_docs]
+            locations = await run_in_thread(write_segment, self.root / segment, records)
+            for doc, (offset, length) in zip(project_docs, locations, strict=True):
+                entries.append(
+                    ArchivedTrace(
+                        id=doc["id"],
+                        project_id=project_id,
+                        trace_created_at=doc["created_at"],
+                        segment=segment,
+                        offset=offset,
+                        length=length,
+                    )
+                )
+
+        async with factory() as session, session.begin():
+            # Lock the traces and skip any that changed since they were read:
+            # deleting those would lose whatever was written in between.
+            current = await self._trace_versions(session, list(versions), lock=True)
+            trace_ids = [i for i, version in versions.items() if current.get(i) == version]
+            if not trace_ids:
+                return 0
+            archived = set(trace_ids)
+            span_ids = [s["id"] for doc in docs if doc["id"] in archived for s in doc["spans"]]
+            # A trace id re-ingested after archiving replaces its older entry.
+            await session.execute(delete(ArchivedTrace).where(ArchivedTrace.id.in_(trace_ids)))
+            session.add_all(entry for entry in entries if entry.id in archived)
+            await session.execute(delete(SpanModel).where(SpanModel.id.in_(span_ids)))
+            await session.execute(delete(TraceModel).where(TraceModel.id.in_(trace_ids)))
+            await unindex_traces(session, trace_ids)
+            await release_traces(session, trace_ids)
+        return len(trace_ids)
+
+    @staticmethod
+    async def _trace_versions(
+        session: AsyncSession, trace_ids: list[str], lock: bool = False
+    ) -> dict[str, datetime]:
+        stmt = select(TraceModel.id, TraceModel.updated_at).where(TraceModel.id.in_(trace_ids))
+        if lock:
+            stmt = stmt.with_for_update()
+        result = await session.execute(stmt)
+        return {trace_id: updated_at for trace_id, updated_at in result.all()}
+
+    async def load_document(self, session: AsyncSession, trace_id: str) -> dict[str, Any] | None:
+        """Read an archived trace as a ``TraceResponse``-shaped dict, or None."""
+        result = await session.execute(
+            select(ArchivedTrace.segment, ArchivedTrace.offset, ArchivedTrace.length).where(
+                ArchivedTrace.id == trace_id
+            )
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        segment, offset, length = row
+        try:
+            frame = await run_in_thread(read_frame, self.root / segment, offset, length)
+        except OSError as exc:
+            logger.exception("Failed to read cold storage segment %s", segment)
+            raise VigilError("Failed to read archived trace", status_code=500) from exc
+        return orjson.loads(_decompress(segment, frame))  # type: ignore[no-any-return]
+
+    async def load_trace(self, session: AsyncSession, trace_id: str) -> TraceModel | None:
+        """Read an archived trace as a detached ``Trace`` model, or None."""
+        doc = await self.load_document(session, trace_id)
+        return None if doc is None else trace_from_document(doc)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.archive_once()
+            except Exception:
+                logger.exception("Cold storage archiving failed")
+            await asyncio.sleep(settings.cold_storage_interval_minutes * 60)
+
+
+# Singleton instance
+cold_storage = ColdStorage()
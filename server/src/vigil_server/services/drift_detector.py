@@ -5,7 +5,7 @@ from __future__ import annotations
 import logging
 import math
 from collections import defaultdict
-from datetime import UTC
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING
 
 from sqlalchemy import select
@@ -13,6 +13,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from vigil_server.exceptions import VigilError
 from vigil_server.models.drift import DriftAlert
+from vigil_server.services.executor import run_in_process
 
 if TYPE_CHECKING:
     from collections.abc import Sequence
@@ -26,6 +27,9 @@ logger = logging.getLogger("vigil_server.services.drift")
 PSI_LOW = 0.1
 PSI_MEDIUM = 0.2
 
+# Windows with at least this many spans are analysed in a worker process.
+PSI_OFFLOAD_MIN_ROWS = 20_000
+
 
 def compute_psi(baseline: list[float], current: list[float], bins: int = 10) -> float:
     """Compute Population Stability Index between two distributions.
@@ -76,6 +80,46 @@ def severity_from_psi(psi: float) -> str:
     return "high"
 
 
+def analyse_latency_drift(
+    rows: Sequence[tuple[str, datetime | None, datetime | None]],
+    current_start: datetime,
+) -> list[tuple[str, float, str, float, float]]:
+    """Compare per-kind latency distributions of ``(kind, start, end)`` rows.
+
+    Spans starting at or after *current_start* form the current window;
+    all rows form the baseline.  Returns ``(kind, psi, severity,
+    baseline_mean, current_mean)`` for every kind whose PSI reaches
+    ``PSI_LOW``.  Pure function so it can run in a worker process.
+    """
+    baseline_latencies: dict[str, list[float]] = defaultdict(list)
+    current_latencies: dict[str, list[float]] = defaultdict(list)
+
+    for kind, start, end in rows:
+        if not start or not end:
+            continue
+        latency = (end - start).total_seconds()
+        if latency < 0:
+            continue  # Skip invalid spans where end < start
+        if start >= current_start:
+            current_latencies[kind].append(latency)
+        baseline_latencies[kind].append(latency)
+
+    findings: list[tuple[str, float, str, float, float]] = []
+    for kind in baseline_latencies:
+        baseline = baseline_latencies[kind]
+        current = current_latencies.get(kind, [])
+        if len(baseline) < 10 or len(current) < 5:
+            continue
+
+        psi = compute_psi(baseline, current)
+        if psi >= PSI_LOW:
+            baseline_mean = sum(baseline) / len(baseline)
+            current_mean = sum(current) / len(current) if current else 0.0
+            findings.append((kind, psi, severity_from_psi(psi), baseline_mean, current_mean))
+
+    return findings
+
+
 async def detect_drift(
     session: AsyncSession,
     project_id: str,
@@ -86,7 +130,7 @@ async def detect_drift(
 
     Groups spans by kind and compares latency distributions.
     """
-    from datetime import datetime, timedelta
+    from datetime import timedelta
 
     now = datetime.now(UTC)
     baseline_start = now - timedelta(hours=baseline_window_hours)
@@ -106,46 +150,27 @@ async def detect_drift(
         logger.exception("Database error querying spans for drift detection")
         raise VigilError("Failed to query spans for drift detection", status_code=500) from exc
 
-    # Group latencies by kind and window
-    baseline_latencies: dict[str, list[float]] = defaultdict(list)
-    current_latencies: dict[str, list[float]] = defaultdict(list)
-
-    for kind, start, end in rows:
-        if not start or not end:
-            continue
-        latency = (end - start).total_seconds()
-        if latency < 0:
-            continue  # Skip invalid spans where end < start
-        if start >= current_start:
-            current_latencies[kind].append(latency)
-        baseline_latencies[kind].append(latency)
+    if len(rows) >= PSI_OFFLOAD_MIN_ROWS:
+        # Pure-Python and GIL-bound: run in a worker process for large windows.
+        findings = await run_in_process(
+            analyse_latency_drift, list(map(tuple, rows)), current_start
+        )
+    else:
+        findings = analyse_latency_drift(rows, current_start)
 
-    # Compute PSI for each span kind
     alerts: list[DriftAlert] = []
-    for kind in baseline_latencies:
-        baseline = baseline_latencies[kind]
-        current = current_latencies.get(kind, [])
-        if len(baseline) < 10 or len(current) < 5:
-            continue
-
-        psi = compute_psi(baseline, current)
-        sev = severity_from_psi(psi)
-
-        if psi >= PSI_LOW:
-            baseline_mean = sum(baseline) / len(baseline)
-            current_mean = sum(current) / len(current) if current else 0.0
-
-            alert = DriftAlert(
-                project_id=project_id,
-                span_kind=kind,
-                metric_name="latency",
-                baseline_value=baseline_mean,
-                current_value=current_mean,
-                psi_score=psi,
-                severity=sev,
-            )
-            session.add(alert)
-            alerts.append(alert)
+    for kind, psi, sev, baseline_mean, current_mean in findings:
+        alert = DriftAlert(
+            project_id=project_id,
+            span_kind=kind,
+            metric_name="latency",
+            baseline_value=baseline_mean,
+            current_value=current_mean,
+            psi_score=psi,
+            severity=sev,
+        )
+        session.add(alert)
+        alerts.append(alert)
 
     try:
         await session.flush()
@@ -7,6 +7,7 @@ import logging
 from cryptography.fernet import Fernet, InvalidToken
 
 from vigil_server.config import settings
+from vigil_server.services.executor import run_crypto
 
 logger = logging.getLogger("vigil_server.services.encryption")
 
@@ -38,6 +39,16 @@ def decrypt(ciphertext: str) -> str:
         raise ValueError("Decryption failed — encryption key may have changed") from exc
 
 
+async def encrypt_async(plaintext: str) -> str:
+    """Encrypt on the crypto thread pool."""
+    return await run_crypto(encrypt, plaintext)
+
+
+async def decrypt_async(ciphertext: str) -> str:
+    """Decrypt on the crypto thread pool."""
+    return await run_crypto(decrypt, ciphertext)
+
+
 def mask_key(key: str) -> str:
     """Mask an API key for display, e.g. 'sk-abc...xyz' -> 'sk-abc****'."""
     if not key or len(key) < 8:
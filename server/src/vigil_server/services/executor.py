@@ -0,0 +1,123 @@
+"""Shared executors for blocking and CPU-bound work.
+
+Async handlers must not run slow synchronous code on the event loop.  Three
+bounded pools are provided:
+
+* :data:`crypto_executor` for CPU-bound auth work that releases the GIL
+  (bcrypt, Fernet), kept apart so a backlog of file I/O cannot delay logins;
+* :data:`thread_executor` for other blocking work (blob and segment files,
+  dictionary training);
+* :data:`process_executor` for pure-Python CPU work (PSI computation),
+  which would otherwise hold the GIL.
+
+Each pool caps the number of queued plus running jobs; once the cap is
+reached further submissions fail fast with :class:`ServiceBusyError`
+instead of building an unbounded backlog.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from vigil_server.config import settings
+from vigil_server.exceptions import ServiceBusyError
+
+logger = logging.getLogger("vigil_server.services.executor")
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """Lazily created pool with a limit on pending jobs."""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_pending: int) -> None:
+        self.name = name
+        self._factory = factory
+        self._max_pending = max_pending
+        self._pool: Executor | None = None
+        self.pending = 0
+        self.rejected = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            self._pool = self._factory()
+        return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` in the pool and await its result."""
+        if self.pending >= self._max_pending:
+            self.rejected += 1
+            logger.warning("%s executor saturated (%d pending)", self.name, self.pending)
+            raise ServiceBusyError(f"Server busy ({self.name} executor saturated)")
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._get_pool(), call)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Shut the pool down; it is recreated on next use."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _make_thread_pool() -> Executor:
+    return ThreadPoolExecutor(
+        max_workers=settings.executor_thread_workers, thread_name_prefix="vigil-worker"
+    )
+
+
+def _make_crypto_pool() -> Executor:
+    return ThreadPoolExecutor(
+        max_workers=settings.executor_crypto_workers, thread_name_prefix="vigil-crypto"
+    )
+
+
+def _make_process_pool() -> Executor:
+    if settings.executor_process_workers <= 0:
+        # Process pool disabled: fall back to threads.
+        return _make_thread_pool()
+    return ProcessPoolExecutor(
+        max_workers=settings.executor_process_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+crypto_executor = BoundedExecutor("crypto", _make_crypto_pool, settings.executor_max_pending)
+thread_executor = BoundedExecutor("thread", _make_thread_pool, settings.executor_max_pending)
+process_executor = BoundedExecutor("process", _make_process_pool, settings.executor_max_pending)
+
+
+async def run_in_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run GIL-releasing blocking work off the event loop."""
+    return await thread_executor.run(func, *args, **kwargs)
+
+
+async def run_crypto(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-bound hashing or encryption off the event loop."""
+    return await crypto_executor.run(func, *args, **kwargs)
+
+
+async def run_in_process(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run pure-Python CPU-bound work in a worker process.
+
+    *func* and its arguments must be picklable.
+    """
+    return await process_executor.run(func, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Shut down all pools (called on application shutdown)."""
+    crypto_executor.shutdown()
+    thread_executor.shutdown()
+    process_executor.shutdown()
@@ -0,0 +1,343 @@
+"""Compact filter language for the trace and span list endpoints.
+
+A query is a whitespace-separated list of ``field<op>value`` terms, all of
+which must hold::
+
+    kind:llm status:error duration>2s name:search* metadata.user=u1
+
+* ``:`` and ``=`` test equality.  Comma-separated values mean "any of"
+  (``kind:llm,tool``).  On ``name``, a trailing ``*`` matches a prefix,
+  a leading one a suffix and both a substring.
+* ``>``, ``>=``, ``<`` and ``<=`` compare times and durations.  A time is
+  an ISO date/datetime (UTC unless it says otherwise) or an offset back
+  from now such as ``-24h``.  A duration takes a unit: ``ms``, ``s``,
+  ``m``, ``h`` or ``d``.
+* ``!=`` or a leading ``-`` negates a term (``-status:ok``).
+* ``metadata.<key>`` filters on metadata, as the ``metadata.<key>`` query
+  parameters do (see :mod:`vigil_server.db.json_filters`).
+
+:func:`plan_query` compiles a query to WHERE clauses for one target and
+plans it.  Terms that no index can answer are *residual*: name patterns,
+durations and negations (a negated ``kind`` or ``status`` is rewritten
+to the remaining values, so it stays indexed).  A query with residual
+terms must also have a *bounding* term, so that the database only checks
+those terms row by row within a small set of rows.  Bounding terms are an
+id equality, a time lower bound at most ``settings.filter_max_scan_days``
+back on an indexed time column, or a metadata match on PostgreSQL
+(GIN-indexed).  Other queries with residual terms are rejected with a 422
+before they can scan a whole table.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import exists, func, not_
+
+from vigil_server.config import settings
+from vigil_server.db.json_filters import metadata_condition
+from vigil_server.exceptions import VigilError
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.models.trace import Trace as TraceModel
+from vigil_server.schemas.traces import VALID_KINDS, VALID_STATUSES
+
+if TYPE_CHECKING:
+    from sqlalchemy.sql.elements import ColumnElement
+
+MAX_TERMS = 20
+MAX_VALUES = 50
+
+_TERM_RE = re.compile(
+    r"(?P<neg>-)?(?P<field>[A-Za-z_][\w.\-]*)"
+    r"(?P<op>>=|<=|!=|:|=|>|<)"
+    r'(?P<value>"(?:[^"\\]|\\.)*"|[^\s"]*)'
+)
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h|d)$")
+_COMPARISONS = (">", ">=", "<", "<=")
+
+
+@dataclass(frozen=True)
+class Term:
+    """One ``field<op>value`` term of a filter query."""
+
+    field: str
+    op: str
+    value: str
+    negated: bool = False
+
+    def __str__(self) -> str:
+        op = ":" if self.op == "=" else self.op
+        return f"{'-' if self.negated else ''}{self.field}{op}{self.value}"
+
+
+def parse_query(query: str) -> list[Term]:
+    """Split a filter query into terms; raises 422 on a syntax error."""
+    terms = []
+    pos = 0
+    while True:
+        while pos < len(query) and query[pos].isspace():
+            pos += 1
+        if pos == len(query):
+            break
+        match = _TERM_RE.match(query, pos)
+        if match is None or (match.end() < len(query) and not query[match.end()].isspace()):
+            fragment = query[pos:].split(None, 1)[0]
+            raise VigilError(f"Cannot parse filter {fragment!r}; expected field:value", 422)
+        value = match["value"]
+        if value.startswith('"'):
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        if not value:
+            raise VigilError(f"Filter {match[0]!r} has no value", 422)
+        op = match["op"]
+        negated = bool(match["neg"])
+        if op == "!=":
+            op, negated = ":", not negated
+        terms.append(Term(match["field"], "=" if op == ":" else op, value, negated))
+        pos = match.end()
+    if len(terms) > MAX_TERMS:
+        raise VigilError(f"Filter queries are limited to {MAX_TERMS} terms", 422)
+    return terms
+
+
+def parse_duration(value: str) -> float:
+    """Parse ``2s``/``500ms``/``1.5m`` into seconds."""
+    match = _DURATION_RE.match(value)
+    if match is None:
+        raise VigilError(f"Invalid duration {value!r}; use e.g. 500ms, 2s, 5m", 422)
+    return float(match[1]) * _UNITS[match[2]]
+
+
+def parse_time(value: str, now: datetime) -> datetime:
+    """Parse an ISO date/datetime or a ``-24h`` style offset from *now*."""
+    if value.startswith("-"):
+        return now - timedelta(seconds=parse_duration(value[1:]))
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise VigilError(f"Invalid time {value!r}; use an ISO date or e.g. -24h", 422) from exc
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+@dataclass(frozen=True)
+class Field:
+    """How a query field maps onto a column.
+
+    ``type`` is ``enum``, ``id``, ``text``, ``time`` or ``duration``.
+    ``indexed`` says whether an equality or range on it can use an index.
+    """
+
+    type: str
+    column: Any = None
+    indexed: bool = False
+    choices: frozenset[str] | None = None
+
+
+def _duration_ms(start: Any, end: Any, dialect: str) -> ColumnElement[Any]:
+    """Duration in whole milliseconds, so boundaries like ``<=1s`` compare exactly."""
+    if dialect == "postgresql":
+        return func.round(func.extract("epoch", end - start) * 1000)
+    return func.round((func.julianday(end) - func.julianday(start)) * 86400000)
+
+
+SPAN_FIELDS: dict[str, Field] = {
+    "kind": Field("enum", SpanModel.kind, indexed=True, choices=frozenset(VALID_KINDS)),
+    "status": Field("enum", SpanModel.status, indexed=True, choices=frozenset(VALID_STATUSES)),
+    "trace_id": Field("id", SpanModel.trace_id, indexed=True),
+    "parent": Field("id", SpanModel.parent_span_id, indexed=True),
+    "name": Field("text", SpanModel.name),
+    "start": Field("time", SpanModel.start_time, indexed=True),
+    "created": Field("time", SpanModel.created_at, indexed=True),
+    "duration": Field("duration", (SpanModel.start_time, SpanModel.end_time)),
+}
+
+TRACE_FIELDS: dict[str, Field] = {
+    "id": Field("id", TraceModel.id, indexed=True),
+    "external_id": Field("id", TraceModel.external_id, indexed=True),
+    "status": Field("enum", TraceModel.status, choices=frozenset(VALID_STATUSES)),
+    # Traces that contain a span of the given kind.
+    "kind": Field("enum", SpanModel.kind, choices=frozenset(VALID_KINDS)),
+    "name": Field("text", TraceModel.name),
+    "start": Field("time", TraceModel.start_time),
+    "created": Field("time", TraceModel.created_at, indexed=True),
+    "duration": Field("duration", (TraceModel.start_time, TraceModel.end_time)),
+}
+
+_TARGETS = {"spans": SPAN_FIELDS, "traces": TRACE_FIELDS}
+
+
+@dataclass
+class QueryPlan:
+    """Compiled WHERE clauses and how the database can answer them."""
+
+    conditions: list[Any] = field(default_factory=list)
+    indexed: list[str] = field(default_factory=list)
+    residual: list[str] = field(default_factory=list)
+    bounded_by: str | None = None
+
+    def check(self) -> None:
+        """Reject a plan that would check residual terms across a whole table."""
+        if self.residual and self.bounded_by is None:
+            raise VigilError(
+                f"Filter {' '.join(self.residual)} cannot use an index; add a bounding "
+                "filter such as an id or a time range like "
+                f"created>-{settings.filter_max_scan_days}d",
+                422,
+            )
+
+
+def time_window_bounded(start: datetime | None, end: datetime | None, now: datetime) -> bool:
+    """Whether ``[start, end]`` on an indexed time column bounds a scan."""
+    if start is None:
+        return False
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=UTC)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=UTC)
+    return (end or now) - start <= timedelta(days=settings.filter_max_scan_days)
+
+
+def _like_pattern(value: str) -> tuple[str, bool]:
+    """LIKE pattern for a ``*`` glob, and whether it is just an equality."""
+    core = value.strip("*")
+    if "*" in core:
+        raise VigilError(f"Only leading and trailing * are supported in {value!r}", 422)
+    if core == value:
+        return value, True
+    escaped = core.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    prefix = "%" if value.startswith("*") else ""
+    suffix = "%" if value.endswith("*") else ""
+    return f"{prefix}{escaped}{suffix}", False
+
+
+def _compile_term(
+    term: Term, spec: Field, target: str, dialect: str, now: datetime
+) -> tuple[ColumnElement[bool], bool]:
+    """Return ``(condition, sargable)`` for one term."""
+    if spec.type in ("enum", "id", "text"):
+        if term.op != "=":
+            raise VigilError(f"{term.field} only supports ':' in {term}", 422)
+        values = term.value.split(",")
+        if len(values) > MAX_VALUES:
+            raise VigilError(f"At most {MAX_VALUES} values are allowed in {term}", 422)
+        if spec.choices is not None:
+            unknown = sorted(set(values) - spec.choices)
+            if unknown:
+                raise VigilError(
+                    f"Unknown {term.field} {unknown[0]!r}; expected one of "
+                    f"{', '.join(sorted(spec.choices))}",
+                    422,
+                )
+        if spec.type == "text":
+            if len(values) > 1:
+                raise VigilError(f"{term.field} takes a single value in {term}", 422)
+            pattern, exact = _like_pattern(term.value)
+            if exact:
+                return spec.column == pattern, spec.indexed
+            return spec.column.like(pattern, escape="\\"), False
+        condition = spec.column.in_(values) if len(values) > 1 else spec.column == values[0]
+        if target == "traces" and term.field == "kind":
+            return exists().where(SpanModel.trace_id == TraceModel.id, condition), False
+        return condition, spec.indexed
+
+    if term.op not in _COMPARISONS:
+        raise VigilError(f"{term.field} needs a comparison (>, >=, <, <=) in {term}", 422)
+    if spec.type == "time":
+        return _compare(spec.column, term.op, parse_time(term.value, now)), spec.indexed
+    start, end = spec.column
+    duration = _duration_ms(start, end, dialect)
+    return _compare(duration, term.op, round(parse_duration(term.value) * 1000, 3)), spec.indexed
+
+
+def _compare(column: ColumnElement[Any], op: str, value: datetime | float) -> ColumnElement[bool]:
+    return {
+        ">": column > value,
+        ">=": column >= value,
+        "<": column < value,
+        "<=": column <= value,
+    }[op]
+
+
+def plan_query(
+    query: str,
+    target: str,
+    dialect: str,
+    *,
+    bounded_by: str | None = None,
+    now: datetime | None = None,
+) -> QueryPlan:
+    """Compile *query* for ``"traces"`` or ``"spans"`` and check its plan.
+
+    *bounded_by* names a bounding filter the caller applies outside the
+    query (for instance a ``trace_id`` parameter), if any.
+    """
+    now = now or datetime.now(UTC)
+    fields = _TARGETS[target]
+    plan = QueryPlan(bounded_by=bounded_by)
+    metadata: dict[str, str] = {}
+    lower_bounds: dict[str, datetime] = {}
+    upper_bounds: dict[str, datetime] = {}
+
+    for term in parse_query(query):
+        if term.field.startswith("metadata."):
+            if term.op != "=":
+                raise VigilError(f"metadata filters only support ':' in {term}", 422)
+            key = term.field.removeprefix("metadata.")
+            if not all(key.split(".")):
+                raise VigilError(f"Invalid metadata filter key {key!r}", 422)
+            if term.negated:
+                condition = metadata_condition(_metadata_column(target), {key: term.value}, dialect)
+                plan.conditions.append(not_(condition))
+                plan.residual.append(str(term))
+            else:
+                metadata[key] = term.value
+            continue
+
+        spec = fields.get(term.field)
+        if spec is None:
+            raise VigilError(
+                f"Unknown filter field {term.field!r}; expected one of "
+                f"{', '.join(sorted(fields))} or metadata.<key>",
+                422,
+            )
+        if term.negated and spec.choices is not None and term.op == "=":
+            # A negated enum is the IN list of the other values, which indexes can answer.
+            excluded = set(term.value.split(","))
+            others = spec.choices - excluded
+            if others and excluded <= spec.choices:
+                term = Term(term.field, term.op, ",".join(sorted(others)))
+        condition, sargable = _compile_term(term, spec, target, dialect, now)
+        if term.negated:
+            condition, sargable = not_(condition), False
+        plan.conditions.append(condition)
+        (plan.indexed if sargable else plan.residual).append(str(term))
+
+        if sargable and spec.type == "id":
+            plan.bounded_by = plan.bounded_by or str(term)
+        if sargable and spec.type == "time":
+            bound = parse_time(term.value, now)
+            bounds = lower_bounds if term.op in (">", ">=") else upper_bounds
+            bounds[term.field] = bound
+
+    if metadata:
+        plan.conditions.append(metadata_condition(_metadata_column(target), metadata, dialect))
+        terms = " ".join(f"metadata.{k}={v}" for k, v in metadata.items())
+        if dialect == "postgresql":
+            plan.indexed.append(terms)
+            plan.bounded_by = plan.bounded_by or terms
+        else:
+            plan.residual.append(terms)
+
+    for name, start in lower_bounds.items():
+        if plan.bounded_by is None and time_window_bounded(start, upper_bounds.get(name), now):
+            plan.bounded_by = f"{name}>{start.isoformat()}"
+
+    plan.check()
+    return plan
+
+
+def _metadata_column(target: str) -> Any:
+    return SpanModel.metadata_ if target == "spans" else TraceModel.metadata_
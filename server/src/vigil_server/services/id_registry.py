@@ -0,0 +1,81 @@
+"""Claiming and releasing trace and span ids.
+
+See :mod:`vigil_server.models.id_registry` for why the registries exist.
+A claim is a single ``INSERT ... ON CONFLICT DO NOTHING RETURNING``: when
+two transactions claim the same id, the second waits for the first to
+commit and then gets nothing back, so exactly one of them creates the row.
+Code that deletes traces or spans releases their ids, so an id can be
+ingested again once its row is gone (e.g. after archiving).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from vigil_server.models.id_registry import SpanRegistration, TraceRegistration
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _insert(session: AsyncSession, model: type[Any]) -> Any:
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+async def claim_trace(
+    session: AsyncSession, trace_id: str, external_id: str | None, created_at: datetime
+) -> bool:
+    """Register a new trace; False if its id (or external id) is already taken."""
+    stmt = (
+        _insert(session, TraceRegistration)
+        .values(id=trace_id, external_id=external_id, created_at=created_at)
+        .on_conflict_do_nothing()
+        .returning(TraceRegistration.id)
+    )
+    result = await session.execute(stmt)
+    return result.first() is not None
+
+
+async def claim_spans(
+    session: AsyncSession, trace_id: str, span_ids: Sequence[str], created_at: datetime
+) -> set[str]:
+    """Register *span_ids*; returns those that were not registered before."""
+    unique_ids = list(dict.fromkeys(span_ids))
+    if not unique_ids:
+        return set()
+    stmt = (
+        _insert(session, SpanRegistration)
+        .values([{"id": i, "trace_id": trace_id, "created_at": created_at} for i in unique_ids])
+        .on_conflict_do_nothing()
+        .returning(SpanRegistration.id)
+    )
+    result = await session.execute(stmt)
+    return set(result.scalars().all())
+
+
+async def release_traces(session: AsyncSession, trace_ids: Sequence[str]) -> None:
+    """Free the ids of deleted traces and of all their spans."""
+    if trace_ids:
+        await release_trace_spans(session, trace_ids)
+        await session.execute(delete(TraceRegistration).where(TraceRegistration.id.in_(trace_ids)))
+
+
+async def release_trace_spans(session: AsyncSession, trace_ids: Sequence[str]) -> None:
+    """Free the ids of every span of *trace_ids* (the traces themselves stay)."""
+    if trace_ids:
+        await session.execute(
+            delete(SpanRegistration).where(SpanRegistration.trace_id.in_(trace_ids))
+        )
+
+
+async def release_spans(session: AsyncSession, span_ids: Sequence[str]) -> None:
+    """Free the ids of deleted spans."""
+    if span_ids:
+        await session.execute(delete(SpanRegistration).where(SpanRegistration.id.in_(span_ids)))
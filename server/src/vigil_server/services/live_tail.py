@@ -0,0 +1,141 @@
+"""Live tail of ingested spans for WebSocket clients.
+
+A client subscribes with a :class:`TailFilter`; ingested spans are reduced
+to small summaries, matched against each subscriber's filter, and buffered
+per socket by a :class:`TailCoalescer`, which emits at most one
+``spans.batch`` message per ``settings.ws_tail_interval_ms``.  During a
+traffic spike a subscriber therefore receives a steady trickle of batches
+(with a count of spans that did not fit) instead of one message per ingest
+request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel, Field, field_validator
+
+from vigil_server.config import settings
+from vigil_server.schemas.traces import VALID_KINDS, VALID_STATUSES
+
+if TYPE_CHECKING:
+    from vigil_server.schemas.traces import SpanIngest
+
+
+class TailFilter(BaseModel):
+    """Filters carried by a ``subscribe`` message; empty fields match everything."""
+
+    model_config = {"frozen": True, "extra": "forbid"}
+
+    kind: list[str] = Field(default_factory=list)
+    status: list[str] = Field(default_factory=list)
+    name_prefix: str | None = Field(default=None, max_length=512)
+    trace_id: str | None = Field(default=None, max_length=128)
+
+    @field_validator("kind", "status", mode="before")
+    @classmethod
+    def _as_list(cls, v: Any) -> Any:
+        return [v] if isinstance(v, str) else v
+
+    @field_validator("kind")
+    @classmethod
+    def _validate_kind(cls, v: list[str]) -> list[str]:
+        unknown = set(v) - VALID_KINDS
+        if unknown:
+            raise ValueError(f"unknown span kinds: {sorted(unknown)}")
+        return v
+
+    @field_validator("status")
+    @classmethod
+    def _validate_status(cls, v: list[str]) -> list[str]:
+        unknown = set(v) - VALID_STATUSES
+        if unknown:
+            raise ValueError(f"unknown span statuses: {sorted(unknown)}")
+        return v
+
+    def matches(self, span: dict[str, Any]) -> bool:
+        """Return True if the span summary passes every set filter."""
+        if self.kind and span["kind"] not in self.kind:
+            return False
+        if self.status and span["status"] not in self.status:
+            return False
+        if self.trace_id is not None and span["trace_id"] != self.trace_id:
+            return False
+        return self.name_prefix is None or span["name"].startswith(self.name_prefix)
+
+
+def span_summaries(trace_id: str, spans: Sequence[SpanIngest]) -> list[dict[str, Any]]:
+    """Reduce ingested spans to the fields a live-tail view shows."""
+    summaries = []
+    for span in spans:
+        duration_ms = None
+        if span.start_time is not None and span.end_time is not None:
+            duration_ms = round((span.end_time - span.start_time).total_seconds() * 1000, 3)
+        summaries.append(
+            {
+                "span_id": span.span_id,
+                "trace_id": trace_id,
+                "parent_span_id": span.parent_span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "status": span.status,
+                "start_time": span.start_time.isoformat() if span.start_time else None,
+                "end_time": span.end_time.isoformat() if span.end_time else None,
+                "duration_ms": duration_ms,
+            }
+        )
+    return summaries
+
+
+class TailCoalescer:
+    """Per-socket buffer that turns matching spans into rate-limited batches."""
+
+    def __init__(
+        self,
+        tail_filter: TailFilter,
+        emit: Callable[[dict[str, Any]], None],
+        interval_seconds: float | None = None,
+        max_spans: int | None = None,
+    ) -> None:
+        self.filter = tail_filter
+        self._emit = emit
+        self._interval = (
+            settings.ws_tail_interval_ms / 1000 if interval_seconds is None else interval_seconds
+        )
+        self._max_spans = settings.ws_tail_max_spans if max_spans is None else max_spans
+        self._buffer: list[dict[str, Any]] = []
+        self._dropped = 0
+        self._last_flush = 0.0
+        self._handle: asyncio.TimerHandle | None = None
+
+    def offer(self, spans: Sequence[dict[str, Any]]) -> None:
+        """Buffer the spans that match this subscriber's filter."""
+        matched = False
+        for span in spans:
+            if not self.filter.matches(span):
+                continue
+            matched = True
+            if len(self._buffer) < self._max_spans:
+                self._buffer.append(span)
+            else:
+                self._dropped += 1
+        if matched and self._handle is None:
+            delay = max(0.0, self._last_flush + self._interval - time.monotonic())
+            self._handle = asyncio.get_running_loop().call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        self._handle = None
+        self._last_flush = time.monotonic()
+        spans, self._buffer = self._buffer, []
+        dropped, self._dropped = self._dropped, 0
+        self._emit({"type": "spans.batch", "data": {"spans": spans, "dropped": dropped}})
+
+    def close(self) -> None:
+        """Discard buffered spans and cancel any pending flush."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._buffer = []
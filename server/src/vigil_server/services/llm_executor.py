@@ -7,10 +7,13 @@ with SDK monkey-patching and keep the server lean.
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any
 
 import httpx
 
+from vigil_server.metrics import LLM_CALL_DURATION
+
 logger = logging.getLogger("vigil_server.services.llm_executor")
 
 # Rough token estimation: ~4 chars per token
@@ -104,12 +107,21 @@ async def execute_llm_call(
     Makes raw HTTP calls to provider APIs.
     """
     if provider == "openai":
-        return await _call_openai(span_input, api_key, model)
+        call = _call_openai
     elif provider == "anthropic":
-        return await _call_anthropic(span_input, api_key, model)
+        call = _call_anthropic
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await call(span_input, api_key, model)
+        outcome = "ok"
+        return result
+    finally:
+        LLM_CALL_DURATION.labels(provider, outcome).observe(time.perf_counter() - started)
+
 
 async def _call_openai(
     span_input: dict[str, Any], api_key: str, model: str | None
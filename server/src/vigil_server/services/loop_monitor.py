@@ -0,0 +1,166 @@
+"""Event-loop lag monitor.
+
+A ticker task sleeps for ``settings.loop_monitor_interval_ms`` and records
+how late it wakes up in the ``vigil_event_loop_lag_seconds`` histogram.
+Lag is the time the loop spent running something else without yielding,
+e.g. a bcrypt hash, a PSI computation or a synchronous SQLite call.
+
+Measuring lag only tells you *that* the loop was blocked, so a watchdog
+thread also watches the ticker.  When the ticker is overdue by more than
+``settings.loop_monitor_threshold_ms``, the thread grabs the event-loop
+thread's current stack (via :func:`sys._current_frames`) while the
+blocking code is still running, and records it as an offender.  When the
+loop recovers, the ticker fills in how long the stall lasted.  Recent
+offenders are served by ``GET /debug/event-loop``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import UTC, datetime
+from typing import Any
+
+from vigil_server.config import settings
+from vigil_server.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+logger = logging.getLogger("vigil_server.services.loop_monitor")
+
+_STACK_LIMIT = 25
+
+
+class LoopMonitor:
+    """Measures event-loop scheduling lag and captures blocking stacks."""
+
+    def __init__(
+        self,
+        interval_seconds: float | None = None,
+        threshold_seconds: float | None = None,
+        max_offenders: int | None = None,
+    ) -> None:
+        self.interval = (
+            settings.loop_monitor_interval_ms / 1000
+            if interval_seconds is None
+            else interval_seconds
+        )
+        self.threshold = (
+            settings.loop_monitor_threshold_ms / 1000
+            if threshold_seconds is None
+            else threshold_seconds
+        )
+        self._offenders: deque[dict[str, Any]] = deque(
+            maxlen=settings.loop_monitor_max_offenders if max_offenders is None else max_offenders
+        )
+        self._lock = threading.Lock()
+        self._beat = 0.0
+        self._blocked: dict[str, Any] | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Start the ticker on the running loop and the watchdog thread."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick_loop())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="vigil-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            "Event-loop monitor started (interval=%.0fms, threshold=%.0fms)",
+            self.interval * 1000,
+            self.threshold * 1000,
+        )
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._tick()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        lag = max(0.0, now - self._beat - self.interval)
+        self._beat = now
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        EVENT_LOOP_LAG.observe(lag)
+        if lag < self.threshold:
+            return
+
+        EVENT_LOOP_BLOCKED.inc()
+        with self._lock:
+            offender, self._blocked = self._blocked, None
+        if offender is None:
+            # Stalled and recovered between two watchdog checks.
+            offender = self._record(stack=None)
+        offender["blocked_ms"] = round(lag * 1000, 1)
+        logger.warning(
+            "Event loop blocked for %.0f ms%s",
+            lag * 1000,
+            f"\n{offender['stack']}" if offender["stack"] else "",
+        )
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop's stack while it is stalled."""
+        while not self._stop.wait(self.threshold / 2):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold or self._blocked is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT))
+            with self._lock:
+                self._blocked = self._record(stack=stack)
+
+    def _record(self, stack: str | None) -> dict[str, Any]:
+        offender: dict[str, Any] = {
+            "detected_at": datetime.now(UTC).isoformat(),
+            "blocked_ms": None,
+            "stack": stack,
+        }
+        self._offenders.append(offender)
+        return offender
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return current lag figures and recent offenders, newest first."""
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "offenders": list(reversed(self._offenders)),
+        }
+
+
+# Singleton instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,223 @@
+"""Daily partition upkeep and partition-drop retention (PostgreSQL).
+
+After migration 007, ``traces`` and ``spans`` are range-partitioned by day
+on ``created_at``.  :class:`PartitionMaintainer` runs at startup and every
+``settings.partition_maintenance_interval_minutes``: it creates the
+partitions for the next ``settings.partition_premake_days`` days, and when
+``settings.partition_retention_days`` is set it drops every partition that
+lies entirely before the retention horizon.  Dropping a partition removes a
+day of data in one catalog operation instead of deleting it row by row;
+rows in unpartitioned tables that belong to the dropped rows (the id
+registries and the search index, all keyed by the same ``created_at``) are
+deleted up to the same boundary, and blobs left unreferenced by dropped
+spans are collected afterwards.
+
+On SQLite, or on PostgreSQL before the migration, it does nothing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from vigil_server.config import settings
+from vigil_server.metrics import DB_PARTITIONS_DROPPED
+from vigil_server.services.blob_store import collect_blobs_after_cleanup
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger("vigil_server.services.partitions")
+
+PARTITIONED_TABLES = ("traces", "spans")
+
+# Unpartitioned tables whose rows share ``created_at`` with a partitioned row.
+_DEPENDENT_TABLES = {
+    "traces": ("trace_registry",),
+    "spans": ("span_registry", "span_search"),
+}
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    """One partition and its range; ``None`` stands for MINVALUE/MAXVALUE."""
+
+    name: str
+    lower: datetime | None
+    upper: datetime | None
+
+
+def _parse_bound_value(value: str) -> datetime | None:
+    value = value.strip()
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def parse_bound(name: str, bound: str) -> Partition | None:
+    """Parse ``pg_get_expr(relpartbound)`` output; None for DEFAULT partitions."""
+    match = _BOUND_RE.search(bound)
+    if match is None:
+        return None
+    return Partition(name, _parse_bound_value(match[1]), _parse_bound_value(match[2]))
+
+
+def day_start(moment: datetime) -> datetime:
+    return moment.astimezone(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def plan(
+    existing: list[Partition],
+    now: datetime,
+    premake_days: int,
+    retention_days: int,
+) -> tuple[list[datetime], list[str]]:
+    """Return the days to create partitions for and the partitions to drop."""
+    today = day_start(now)
+
+    def covered(start: datetime, end: datetime) -> bool:
+        return any(
+            (p.lower is None or p.lower < end) and (p.upper is None or p.upper > start)
+            for p in existing
+        )
+
+    to_create = [
+        day
+        for day in (today + timedelta(days=offset) for offset in range(premake_days + 1))
+        if not covered(day, day + timedelta(days=1))
+    ]
+
+    to_drop: list[str] = []
+    if retention_days > 0:
+        cutoff = today - timedelta(days=retention_days)
+        to_drop = [p.name for p in existing if p.upper is not None and p.upper <= cutoff]
+    return to_create, to_drop
+
+
+async def _is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": table},
+    )
+    return result.first() is not None
+
+
+async def _partitions(conn: AsyncConnection, table: str) -> list[Partition]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+        ),
+        {"table": table},
+    )
+    parsed = (parse_bound(name, bound) for name, bound in result.all())
+    return [p for p in parsed if p is not None]
+
+
+async def maintain_table(
+    conn: AsyncConnection, table: str, now: datetime | None = None
+) -> tuple[int, int]:
+    """Create upcoming and drop expired partitions of *table*; returns the counts."""
+    existing = await _partitions(conn, table)
+    to_create, to_drop = plan(
+        existing,
+        now or datetime.now(UTC),
+        settings.partition_premake_days,
+        settings.partition_retention_days,
+    )
+    # Never queue behind a long transaction while holding up ingest.
+    await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    for day in to_create:
+        end = day + timedelta(days=1)
+        await conn.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{table}_p{day:%Y%m%d}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+    for name in to_drop:
+        await conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+        DB_PARTITIONS_DROPPED.labels(table).inc()
+        logger.info("Dropped expired partition %s", name)
+    if to_drop:
+        # Dropped partitions always cover everything before their latest bound.
+        horizon = max(p.upper for p in existing if p.name in to_drop and p.upper is not None)
+        for dependent in _DEPENDENT_TABLES.get(table, ()):
+            await conn.execute(
+                text(f'DELETE FROM "{dependent}" WHERE created_at < :horizon'),
+                {"horizon": horizon},
+            )
+    return len(to_create), len(to_drop)
+
+
+class PartitionMaintainer:
+    """Background loop that keeps partitions ahead of time and enforces retention."""
+
+    def __init__(self, engine: AsyncEngine | None = None) -> None:
+        self._engine = engine
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        engine = self._get_engine()
+        if engine.dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Partition maintainer started")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _get_engine(self) -> AsyncEngine:
+        if self._engine is None:
+            from vigil_server.db.session import engine
+
+            self._engine = engine
+        return self._engine
+
+    async def run_once(self) -> None:
+        engine = self._get_engine()
+        spans_dropped = False
+        for table in PARTITIONED_TABLES:
+            async with engine.begin() as conn:
+                if not await _is_partitioned(conn, table):
+                    continue
+                created, dropped = await maintain_table(conn, table)
+            if created or dropped:
+                logger.info("Partitions for %s: created %d, dropped %d", table, created, dropped)
+            spans_dropped = spans_dropped or (table == "spans" and dropped > 0)
+        if spans_dropped:
+            await collect_blobs_after_cleanup(async_sessionmaker(engine, expire_on_commit=False))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Partition maintenance failed")
+            await asyncio.sleep(settings.partition_maintenance_interval_minutes * 60)
+
+
+# Singleton instance
+partition_maintainer = PartitionMaintainer()
@@ -0,0 +1,158 @@
+"""Training and distribution of zstd dictionaries for span payloads.
+
+:func:`train_dictionary` samples recent span payloads, trains a dictionary
+and stores it in ``payload_dictionaries`` with an ``activate_after`` time
+two refresh intervals ahead.  Every worker runs
+:class:`DictionaryRefresher`, which loads new dictionaries every
+``settings.payload_dictionary_refresh_minutes`` and switches
+:data:`~vigil_server.db.compression.payload_codec` to the newest active
+one.  The delay guarantees every worker can read a dictionary before any
+worker writes with it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from sqlalchemy import select
+
+from vigil_server.config import settings
+from vigil_server.db.compression import payload_codec
+from vigil_server.exceptions import VigilError
+from vigil_server.models.payload_dictionary import PayloadDictionary
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.services.executor import run_in_thread
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger("vigil_server.services.payload_dictionaries")
+
+# Payloads smaller than this teach the dictionary nothing useful.
+MIN_SAMPLE_BYTES = 64
+
+
+async def load_dictionaries(session: AsyncSession, now: datetime | None = None) -> int:
+    """Load unseen dictionaries into the codec and activate the newest ready one."""
+    now = now or datetime.now(UTC)
+    stmt = select(PayloadDictionary.id, PayloadDictionary.data).order_by(PayloadDictionary.id)
+    known = payload_codec.dictionary_ids
+    if known:
+        stmt = stmt.where(PayloadDictionary.id.not_in(known))
+    rows = (await session.execute(stmt)).all()
+    for dictionary_id, data in rows:
+        payload_codec.add_dictionary(dictionary_id, data)
+
+    ready = await session.execute(
+        select(PayloadDictionary.id)
+        .where(PayloadDictionary.activate_after <= now)
+        .order_by(PayloadDictionary.id.desc())
+        .limit(1)
+    )
+    newest = ready.scalar()
+    if newest is not None and newest != payload_codec.active_dictionary:
+        payload_codec.activate(newest)
+        logger.info("Compressing span payloads with dictionary %d", newest)
+    return len(rows)
+
+
+def _collect_samples(rows: list[tuple[Any, ...]]) -> list[bytes]:
+    samples = []
+    for row in rows:
+        for value in row:
+            if value:
+                encoded = orjson.dumps(value)
+                if len(encoded) >= MIN_SAMPLE_BYTES:
+                    samples.append(encoded)
+    return samples
+
+
+def _train(size: int, samples: Sequence[bytes]) -> bytes:
+    buffers: list[bytes | bytearray | memoryview] = list(samples)
+    return zstandard.train_dictionary(size, buffers).as_bytes()
+
+
+async def train_dictionary(session: AsyncSession) -> PayloadDictionary:
+    """Train a dictionary from recent span payloads and store it (not yet active)."""
+    if zstandard is None:
+        raise VigilError("Training a payload dictionary requires the zstandard package", 400)
+    result = await session.execute(
+        select(SpanModel.input, SpanModel.output, SpanModel.events)
+        .order_by(SpanModel.created_at.desc())
+        .limit(settings.payload_dictionary_samples)
+    )
+    samples = _collect_samples(list(result.all()))
+    if len(samples) < 10:
+        raise VigilError("Not enough span payloads to train a dictionary", 400)
+    try:
+        data = await run_in_thread(_train, settings.payload_dictionary_size_kb * 1024, samples)
+    except zstandard.ZstdError as exc:
+        raise VigilError(f"Dictionary training failed: {exc}", 400) from exc
+
+    delay = timedelta(minutes=2 * settings.payload_dictionary_refresh_minutes)
+    dictionary = PayloadDictionary(
+        data=data, sample_count=len(samples), activate_after=datetime.now(UTC) + delay
+    )
+    session.add(dictionary)
+    await session.flush()
+    payload_codec.add_dictionary(dictionary.id, data)
+    logger.info(
+        "Trained payload dictionary %d (%d bytes, %d samples)",
+        dictionary.id,
+        len(data),
+        len(samples),
+    )
+    return dictionary
+
+
+class DictionaryRefresher:
+    """Background loop that keeps this worker's codec dictionaries current."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] | None = None) -> None:
+        self._session_factory = session_factory
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        # Runs even with compression off, so rows written earlier stay readable.
+        if self._task is not None or zstandard is None:
+            return
+        await self.refresh()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def refresh(self) -> None:
+        if self._session_factory is None:
+            from vigil_server.db.session import async_session
+
+            self._session_factory = async_session
+        async with self._session_factory() as session:
+            await load_dictionaries(session)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.payload_dictionary_refresh_minutes * 60)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Payload dictionary refresh failed")
+
+
+# Singleton instance
+dictionary_refresher = DictionaryRefresher()
@@ -0,0 +1,219 @@
+"""On-demand request profiling and memory diagnostics.
+
+Nothing in this module runs unless it is switched on.  When
+``settings.debug_token`` is set, the :class:`ProfilingMiddleware
+<vigil_server.middleware.profiling.ProfilingMiddleware>` is installed and a
+single request can be profiled by sending ``X-Vigil-Profile: <token>``, or
+the next *n* requests matching a path prefix can be armed from
+``POST /debug/profiles/arm``.  A profiled request runs under
+:mod:`cProfile` and also records how many SQL statements it executed and
+how long they took; the result is kept in a small in-memory ring keyed by
+request ID.
+
+cProfile follows the thread, not the coroutine: while a request is being
+profiled, other coroutines that run on the event loop show up in its
+profile too.  Only one request is profiled at a time.
+
+:class:`TracemallocDiff` backs ``/debug/tracemalloc``: tracing starts on
+the first call, and each later call returns the allocation growth since
+the previous one.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from vigil_server.config import settings
+
+
+@dataclass
+class QueryStats:
+    """SQL statements executed while handling one request."""
+
+    count: int = 0
+    seconds: float = 0.0
+    _started: list[float] = field(default_factory=list, repr=False)
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+_listeners_installed = False
+
+
+def _before_cursor_execute(*_args: Any) -> None:
+    stats = _query_stats.get()
+    if stats is not None:
+        stats._started.append(time.perf_counter())
+
+
+def _after_cursor_execute(*_args: Any) -> None:
+    stats = _query_stats.get()
+    if stats is not None and stats._started:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - stats._started.pop()
+
+
+def install_query_listeners() -> None:
+    """Hook statement timing into every engine (idempotent)."""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _listeners_installed = True
+
+
+def track_queries() -> tuple[QueryStats, Any]:
+    """Start counting queries in the current context; returns the stats and a reset token."""
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def stop_tracking(token: Any) -> None:
+    _query_stats.reset(token)
+
+
+@dataclass
+class RequestProfile:
+    """Result of profiling one request."""
+
+    request_id: str
+    method: str
+    path: str
+    status: int | None
+    duration_ms: float
+    queries: int
+    query_ms: float
+    created_at: float
+    stats: str = field(repr=False)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "queries": self.queries,
+            "query_ms": self.query_ms,
+            "created_at": self.created_at,
+        }
+
+
+def render_stats(profiler: cProfile.Profile, limit: int) -> str:
+    """Render the top *limit* functions by cumulative time."""
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class ProfileStore:
+    """Most recent request profiles, plus the arm-next-N-requests toggle."""
+
+    def __init__(self, max_profiles: int | None = None) -> None:
+        self._max = settings.profiling_max_profiles if max_profiles is None else max_profiles
+        self._profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = False
+        self._armed = 0
+        self._armed_prefix = ""
+
+    def arm(self, count: int, path_prefix: str = "") -> None:
+        """Profile the next *count* requests whose path starts with *path_prefix*."""
+        self._armed = count
+        self._armed_prefix = path_prefix
+
+    def armed(self) -> dict[str, Any]:
+        return {"remaining": self._armed, "path_prefix": self._armed_prefix}
+
+    def take_armed(self, path: str) -> bool:
+        """Consume one armed slot if *path* matches."""
+        if self._armed <= 0 or not path.startswith(self._armed_prefix):
+            return False
+        self._armed -= 1
+        return True
+
+    def return_armed(self) -> None:
+        """Give back a slot taken with :meth:`take_armed` that was not used."""
+        self._armed += 1
+
+    def acquire(self) -> bool:
+        """Claim the profiler; False if another request is already being profiled."""
+        with self._lock:
+            if self._active:
+                return False
+            self._active = True
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = False
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles[profile.request_id] = profile
+        self._profiles.move_to_end(profile.request_id)
+        while len(self._profiles) > self._max:
+            self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> RequestProfile | None:
+        return self._profiles.get(request_id)
+
+    def list(self) -> list[dict[str, Any]]:
+        return [p.summary() for p in reversed(self._profiles.values())]
+
+
+class TracemallocDiff:
+    """Allocation growth between successive snapshots."""
+
+    def __init__(self) -> None:
+        self._baseline: tracemalloc.Snapshot | None = None
+
+    def diff(self, limit: int = 25, frames: int = 1) -> dict[str, Any]:
+        """Start tracing, or report growth since the previous call."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._baseline = tracemalloc.take_snapshot()
+            return {"status": "started", "top": []}
+
+        snapshot = tracemalloc.take_snapshot()
+        previous, self._baseline = self._baseline, snapshot
+        if previous is None:
+            return {"status": "baseline", "top": []}
+
+        current, peak = tracemalloc.get_traced_memory()
+        top = snapshot.compare_to(previous, "lineno")[:limit]
+        return {
+            "status": "diff",
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in top
+            ],
+        }
+
+    def stop(self) -> None:
+        self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# Singleton instances
+profile_store = ProfileStore()
+tracemalloc_diff = TracemallocDiff()
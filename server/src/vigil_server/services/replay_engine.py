@@ -12,10 +12,12 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import selectinload
 
 from vigil_server.exceptions import NotFoundError, VigilError
+from vigil_server.metrics import REPLAY_RUNS
 from vigil_server.models.replay import ReplayRun
 from vigil_server.models.span import Span as SpanModel
 from vigil_server.models.trace import Trace as TraceModel
 from vigil_server.schemas.replay import ReplayDiffResponse
+from vigil_server.services.blob_store import offload_payload, resolve_payload
 from vigil_server.services.llm_executor import detect_provider, estimate_cost, execute_llm_call
 
 if TYPE_CHECKING:
@@ -75,9 +77,10 @@ async def create_replay_estimate(
     total_cost = 0.0
 
     for span in trace.spans:
-        provider = detect_provider(span.input, span.name)
+        span_input = await resolve_payload(span.input, trace.project_id)
+        provider = detect_provider(span_input, span.name)
         if provider and span.kind == "llm":
-            effective_input = span.input or {}
+            effective_input = span_input or {}
             if span.id in mutations:
                 effective_input = {**effective_input, **mutations[span.id]}
             cost = estimate_cost(effective_input, provider)
@@ -214,12 +217,13 @@ async def _execute_replay_background(
             sorted_spans = _topological_sort(list(trace.spans))
 
             for span in sorted_spans:
-                original_input = copy.deepcopy(span.input) or {}
+                span_input = await resolve_payload(span.input, trace.project_id)
+                original_input = copy.deepcopy(span_input) or {}
                 effective_input = original_input
                 if span.id in mutations:
                     effective_input = {**original_input, **mutations[span.id]}
 
-                provider = detect_provider(span.input, span.name)
+                provider = detect_provider(span_input, span.name)
                 is_llm = provider is not None and span.kind == "llm"
 
                 new_output = None
@@ -245,8 +249,11 @@ async def _execute_replay_background(
                     name=span.name,
                     kind=span.kind,
                     status=span.status,
-                    input=effective_input,
-                    output=new_output if was_executed else span.output,
+                    input=await offload_payload(effective_input, trace.project_id),
+                    # A copied output may be a blob reference; the blob is shared.
+                    output=await offload_payload(new_output, trace.project_id)
+                    if was_executed
+                    else span.output,
                     metadata={**(span.metadata or {}), "replay_source_span_id": span.id},
                     events=span.events,
                     start_time=datetime.now(UTC),
@@ -259,7 +266,7 @@ async def _execute_replay_background(
                     "span_name": span.name,
                     "original_input": original_input,
                     "mutated_input": effective_input,
-                    "original_output": span.output,
+                    "original_output": await resolve_payload(span.output, trace.project_id),
                     "new_output": new_output,
                     "was_executed": was_executed,
                 }
@@ -290,6 +297,8 @@ async def _execute_replay_background(
                     reference_id=replay_id,
                 )
 
+        REPLAY_RUNS.labels("completed").inc()
+
         # Broadcast completion
         if project_id:
             await manager.broadcast(
@@ -306,6 +315,7 @@ async def _execute_replay_background(
 
     except Exception:
         logger.exception("Replay execution failed for run %s", replay_id)
+        REPLAY_RUNS.labels("failed").inc()
         async with async_session() as session, session.begin():
             run = await session.get(ReplayRun, replay_id)
             if run:
@@ -381,7 +391,9 @@ async def replay_trace(
 
     for span in trace.spans:
         if span.id in mutations:
-            original_input = copy.deepcopy(span.input) or {}
+            original_input = (
+                copy.deepcopy(await resolve_payload(span.input, trace.project_id)) or {}
+            )
             mutated_input = {**original_input, **mutations[span.id]}
             diffs.append(
                 {
@@ -389,7 +401,7 @@ async def replay_trace(
                     "span_name": span.name,
                     "original_input": original_input,
                     "mutated_input": mutated_input,
-                    "original_output": span.output,
+                    "original_output": await resolve_payload(span.output, trace.project_id),
                     "note": "Replay would re-execute this span with mutated input",
                 }
             )
@@ -0,0 +1,331 @@
+"""Per-project retention: payload stripping, span compaction and deletion.
+
+Each project's :class:`~vigil_server.models.project_settings.ProjectSettings`
+may set three TTLs (in days, ``None`` keeps data forever):
+
+``payload_ttl_days``
+    Span ``input``/``output`` are set to NULL; names, kinds, statuses,
+    timings and the span tree are kept.
+``raw_span_ttl_days``
+    The trace's aggregates are written to ``traces.summary`` and its spans
+    are deleted.  The trace row stays listable with its summary.  Spans
+    ingested into a trace after it was compacted are added to the summary
+    at ingest (see :func:`merge_into_summary`) and deleted once they are
+    themselves older than the TTL.
+``summary_ttl_days``
+    The trace, its remaining spans and its replay runs are deleted.
+
+Blobs of the payloads removed this way are deleted afterwards by
+:func:`~vigil_server.services.blob_store.collect_blobs`.
+
+:class:`RetentionService` enforces them every
+``settings.retention_interval_minutes``.  Work is done in batches of at most
+``settings.retention_batch_size`` rows, each in its own short transaction,
+with a ``settings.retention_batch_pause_ms`` pause between batches, so row
+locks on the ingest tables are held briefly and ingest is never starved.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import Counter as TallyCounter
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any, cast
+
+from sqlalchemy import CursorResult, case, delete, func, null, or_, select, update
+
+from vigil_server.config import settings
+from vigil_server.metrics import RETENTION_ROWS
+from vigil_server.models.project_settings import ProjectSettings
+from vigil_server.models.replay import ReplayRun
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.models.trace import Trace as TraceModel
+from vigil_server.services.blob_store import collect_blobs_after_cleanup
+from vigil_server.services.id_registry import release_spans, release_trace_spans, release_traces
+from vigil_server.services.search import unindex_spans, unindex_traces
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    from vigil_server.schemas.traces import SpanIngest
+
+logger = logging.getLogger("vigil_server.services.retention")
+
+
+def summarize(
+    span_rows: list[tuple[Any, ...]], kind_rows: list[tuple[Any, ...]]
+) -> dict[str, dict[str, Any]]:
+    """Build per-trace summaries from the aggregate queries in :meth:`_compact_batch`."""
+    kinds: dict[str, dict[str, int]] = {}
+    for trace_id, kind, count in kind_rows:
+        kinds.setdefault(trace_id, {})[kind] = count
+
+    summaries: dict[str, dict[str, Any]] = {}
+    for trace_id, span_count, error_count, first_start, last_end in span_rows:
+        duration_ms = None
+        if first_start is not None and last_end is not None:
+            duration_ms = round((last_end - first_start).total_seconds() * 1000, 3)
+        summaries[trace_id] = {
+            "span_count": span_count,
+            "error_count": int(error_count or 0),
+            "kinds": kinds.get(trace_id, {}),
+            "duration_ms": duration_ms,
+        }
+    return summaries
+
+
+def merge_into_summary(summary: dict[str, Any], spans: Sequence[SpanIngest]) -> dict[str, Any]:
+    """Return *summary* with late-ingested *spans* counted in.
+
+    ``duration_ms`` is left as compacted: the start and end it was computed
+    from are gone with the deleted spans.
+    """
+    kinds = dict(summary.get("kinds", {}))
+    for span in spans:
+        kinds[span.kind] = kinds.get(span.kind, 0) + 1
+    return {
+        **summary,
+        "span_count": summary.get("span_count", 0) + len(spans),
+        "error_count": summary.get("error_count", 0)
+        + sum(span.status == "error" for span in spans),
+        "kinds": kinds,
+    }
+
+
+async def _delete_rows(session: AsyncSession, stmt: Any) -> int:
+    result = cast("CursorResult[Any]", await session.execute(stmt))
+    return result.rowcount or 0
+
+
+class RetentionService:
+    """Background loop that applies each project's retention TTLs."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] | None = None) -> None:
+        self._session_factory = session_factory
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Retention service started")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _get_session_factory(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_factory is None:
+            from vigil_server.db.session import async_session
+
+            self._session_factory = async_session
+        return self._session_factory
+
+    async def run_once(self, now: datetime | None = None) -> dict[str, int]:
+        """Apply retention to every project with a TTL set; returns row counts."""
+        now = now or datetime.now(UTC)
+        async with self._get_session_factory()() as session:
+            result = await session.execute(
+                select(
+                    ProjectSettings.project_id,
+                    ProjectSettings.payload_ttl_days,
+                    ProjectSettings.raw_span_ttl_days,
+                    ProjectSettings.summary_ttl_days,
+                ).where(
+                    or_(
+                        ProjectSettings.payload_ttl_days.is_not(None),
+                        ProjectSettings.raw_span_ttl_days.is_not(None),
+                        ProjectSettings.summary_ttl_days.is_not(None),
+                    )
+                )
+            )
+            policies = result.all()
+
+        totals: TallyCounter[str] = TallyCounter()
+        for project_id, payload_ttl, raw_span_ttl, summary_ttl in policies:
+            # Coarsest first, so later steps do not touch rows about to be deleted.
+            if summary_ttl is not None:
+                cutoff = now - timedelta(days=summary_ttl)
+                totals["traces_deleted"] += await self._drain(
+                    self._delete_batch, project_id, cutoff
+                )
+            if raw_span_ttl is not None:
+                cutoff = now - timedelta(days=raw_span_ttl)
+                totals["traces_compacted"] += await self._drain(
+                    self._compact_batch, project_id, cutoff
+                )
+                totals["late_spans_deleted"] += await self._drain(
+                    self._prune_batch, project_id, cutoff
+                )
+            if payload_ttl is not None:
+                cutoff = now - timedelta(days=payload_ttl)
+                totals["payloads_stripped"] += await self._drain(
+                    self._strip_batch, project_id, cutoff
+                )
+
+        applied = dict(+totals)  # drop zero counts
+        for action, count in applied.items():
+            RETENTION_ROWS.labels(action).inc(count)
+        if applied:
+            logger.info("Retention applied: %s", applied)
+            await collect_blobs_after_cleanup(self._get_session_factory())
+        return applied
+
+    async def _drain(self, step: Any, project_id: str, cutoff: datetime) -> int:
+        """Run *step* batch after batch until it reports a short batch."""
+        total: int = 0
+        batch_size = settings.retention_batch_size
+        while True:
+            async with self._get_session_factory()() as session, session.begin():
+                done = await step(session, project_id, cutoff, batch_size)
+            total += done
+            if done < batch_size:
+                return total
+            await asyncio.sleep(settings.retention_batch_pause_ms / 1000)
+
+    async def _strip_batch(
+        self, session: AsyncSession, project_id: str, cutoff: datetime, limit: int
+    ) -> int:
+        result = await session.execute(
+            select(SpanModel.id, SpanModel.trace_id)
+            .join(TraceModel, TraceModel.id == SpanModel.trace_id)
+            .where(
+                TraceModel.project_id == project_id,
+                SpanModel.created_at < cutoff,
+                or_(SpanModel.input.is_not(None), SpanModel.output.is_not(None)),
+            )
+            .limit(limit)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+        await session.execute(
+            update(SpanModel)
+            .where(SpanModel.id.in_([span_id for span_id, _ in rows]))
+            .values(input=null(), output=null())
+        )
+        await unindex_spans(session, [span_id for span_id, _ in rows])
+        # Bump the traces so cached responses (ETags) are invalidated.
+        await session.execute(
+            update(TraceModel)
+            .where(TraceModel.id.in_({trace_id for _, trace_id in rows}))
+            .values(updated_at=func.now())
+        )
+        return len(rows)
+
+    async def _compact_batch(
+        self, session: AsyncSession, project_id: str, cutoff: datetime, limit: int
+    ) -> int:
+        result = await session.execute(
+            select(TraceModel.id)
+            .where(
+                TraceModel.project_id == project_id,
+                TraceModel.created_at < cutoff,
+                TraceModel.summary.is_(None),
+            )
+            .limit(limit)
+        )
+        trace_ids = list(result.scalars().all())
+        if not trace_ids:
+            return 0
+
+        span_rows = await session.execute(
+            select(
+                SpanModel.trace_id,
+                func.count(),
+                func.sum(case((SpanModel.status == "error", 1), else_=0)),
+                func.min(SpanModel.start_time),
+                func.max(SpanModel.end_time),
+            )
+            .where(SpanModel.trace_id.in_(trace_ids))
+            .group_by(SpanModel.trace_id)
+        )
+        kind_rows = await session.execute(
+            select(SpanModel.trace_id, SpanModel.kind, func.count())
+            .where(SpanModel.trace_id.in_(trace_ids))
+            .group_by(SpanModel.trace_id, SpanModel.kind)
+        )
+        summaries = summarize(list(span_rows.all()), list(kind_rows.all()))
+
+        compacted_at = datetime.now(UTC).isoformat()
+        for trace_id in trace_ids:
+            summary = summaries.get(
+                trace_id,
+                {"span_count": 0, "error_count": 0, "kinds": {}, "duration_ms": None},
+            )
+            await session.execute(
+                update(TraceModel)
+                .where(TraceModel.id == trace_id)
+                .values(summary={**summary, "compacted_at": compacted_at}, updated_at=func.now())
+            )
+        deleted = await _delete_rows(
+            session, delete(SpanModel).where(SpanModel.trace_id.in_(trace_ids))
+        )
+        RETENTION_ROWS.labels("spans_deleted").inc(deleted)
+        await unindex_traces(session, trace_ids)
+        await release_trace_spans(session, trace_ids)
+        return len(trace_ids)
+
+    async def _prune_batch(
+        self, session: AsyncSession, project_id: str, cutoff: datetime, limit: int
+    ) -> int:
+        """Delete expired spans of compacted traces (already counted in the summary)."""
+        result = await session.execute(
+            select(SpanModel.id)
+            .join(TraceModel, TraceModel.id == SpanModel.trace_id)
+            .where(
+                TraceModel.project_id == project_id,
+                TraceModel.summary.is_not(None),
+                SpanModel.created_at < cutoff,
+            )
+            .limit(limit)
+        )
+        span_ids = list(result.scalars().all())
+        if not span_ids:
+            return 0
+        await session.execute(delete(SpanModel).where(SpanModel.id.in_(span_ids)))
+        RETENTION_ROWS.labels("spans_deleted").inc(len(span_ids))
+        await unindex_spans(session, span_ids)
+        await release_spans(session, span_ids)
+        return len(span_ids)
+
+    async def _delete_batch(
+        self, session: AsyncSession, project_id: str, cutoff: datetime, limit: int
+    ) -> int:
+        result = await session.execute(
+            select(TraceModel.id)
+            .where(TraceModel.project_id == project_id, TraceModel.created_at < cutoff)
+            .limit(limit)
+        )
+        trace_ids = list(result.scalars().all())
+        if not trace_ids:
+            return 0
+        # Explicit child deletes: SQLite does not enforce the cascades and the
+        # partitioned PostgreSQL tables have no foreign keys.
+        deleted = await _delete_rows(
+            session, delete(SpanModel).where(SpanModel.trace_id.in_(trace_ids))
+        )
+        RETENTION_ROWS.labels("spans_deleted").inc(deleted)
+        await session.execute(delete(ReplayRun).where(ReplayRun.original_trace_id.in_(trace_ids)))
+        await unindex_traces(session, trace_ids)
+        await session.execute(delete(TraceModel).where(TraceModel.id.in_(trace_ids)))
+        await release_traces(session, trace_ids)
+        return len(trace_ids)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Retention run failed")
+            await asyncio.sleep(settings.retention_interval_minutes * 60)
+
+
+# Singleton instance
+retention_service = RetentionService()
@@ -5,8 +5,11 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import logging
+import time
 from datetime import UTC, datetime
 
+from vigil_server.metrics import DRIFT_CHECK_DURATION
+
 logger = logging.getLogger("vigil_server.services.scheduler")
 
 
@@ -76,6 +79,7 @@ class DriftScheduler:
             logger.debug("Running drift check for project %s", ps.project_id)
             self._last_check[ps.project_id] = now
 
+            started = time.perf_counter()
             try:
                 async with async_session() as session, session.begin():
                     alerts = await detect_drift(session, ps.project_id)
@@ -111,6 +115,8 @@ class DriftScheduler:
                         )
             except Exception:
                 logger.exception("Drift check failed for project %s", ps.project_id)
+            finally:
+                DRIFT_CHECK_DURATION.observe(time.perf_counter() - started)
 
 
 # Singleton
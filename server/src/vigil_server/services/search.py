@@ -0,0 +1,309 @@
+"""Full-text search over span payloads.
+
+At ingest, :func:`index_spans` extracts the string values from each span's
+name, ``input`` and ``output`` (before blob offload, so offloaded payloads
+are searchable too) and writes them to the ``span_search`` index from
+:mod:`vigil_server.models.span_search`.  :func:`search_spans` answers
+queries against it, scoped to one project, ranked (BM25 on SQLite,
+``ts_rank_cd`` on PostgreSQL) and with a highlighted snippet per hit.
+
+Queries are words and ``"quoted phrases"``, all of which must match; a
+trailing ``*`` makes a word a prefix.  On PostgreSQL only the newest
+``settings.search_candidate_limit`` matches are ranked, which keeps very
+common terms from ranking millions of rows.
+
+Retention and cold storage remove the entries of spans whose payloads
+they drop, so only hot payloads are searchable.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from functools import reduce
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import and_, delete, func, insert, literal_column, select
+
+from vigil_server.config import settings
+from vigil_server.exceptions import VigilError
+from vigil_server.models.span import Span as SpanModel
+from vigil_server.models.span_search import TS_CONFIG, span_search
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.sql.elements import ColumnClause, ColumnElement
+
+    from vigil_server.schemas.traces import SpanIngest
+
+logger = logging.getLogger("vigil_server.services.search")
+
+MAX_TERMS = 16
+
+# Highlight markers, swapped for <mark> tags after the snippet is escaped.
+_START, _STOP = "\x02", "\x03"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=24, MinWords=8, "
+    'FragmentDelimiter=" … "'
+)
+_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# The FTS5 table itself, as needed by MATCH and its auxiliary functions.
+_fts: ColumnClause[Any] = literal_column("span_search")
+
+
+@dataclass(frozen=True)
+class SearchTerm:
+    """A word or phrase from a search query."""
+
+    text: str
+    prefix: bool = False
+
+
+def parse_query(query: str) -> list[SearchTerm]:
+    """Split a search query into terms; raises 422 if it has none."""
+    terms = []
+    for match in _TERM_RE.finditer(query):
+        phrase, word = match.groups()
+        if phrase is not None:
+            term = SearchTerm(phrase)
+        elif word.endswith("*"):
+            term = SearchTerm(word.rstrip("*"), prefix=True)
+        else:
+            term = SearchTerm(word)
+        if any(char.isalnum() for char in term.text):
+            terms.append(term)
+    if not terms:
+        raise VigilError("Search query has no searchable terms", 422)
+    if len(terms) > MAX_TERMS:
+        raise VigilError(f"Search queries are limited to {MAX_TERMS} terms", 422)
+    return terms
+
+
+def _fts_string(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def fts5_match(project_id: str, terms: list[SearchTerm]) -> str:
+    """FTS5 MATCH expression for *terms* within one project."""
+    content = " ".join(_fts_string(t.text) + ("*" if t.prefix else "") for t in terms)
+    return f"project_id : {_fts_string(project_id)} AND content : ({content})"
+
+
+def tsquery(terms: list[SearchTerm]) -> ColumnElement[Any]:
+    """PostgreSQL ``tsquery`` requiring every term."""
+    parts = []
+    for term in terms:
+        if term.prefix:
+            lexeme = term.text.replace("\\", "\\\\").replace("'", "''")
+            parts.append(func.to_tsquery(TS_CONFIG, f"'{lexeme}':*"))
+        else:
+            parts.append(func.phraseto_tsquery(TS_CONFIG, term.text))
+    return reduce(lambda left, right: left.op("&&")(right), parts)
+
+
+def _collect_strings(value: Any, out: list[str]) -> None:
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_strings(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_strings(item, out)
+
+
+def extract_text(*values: Any) -> str:
+    """Join the string values found in *values*, capped at the index size limit."""
+    strings: list[str] = []
+    for value in values:
+        _collect_strings(value, strings)
+    return "\n".join(s for s in strings if s)[: settings.search_max_text_chars]
+
+
+async def index_spans(
+    session: AsyncSession,
+    project_id: str,
+    trace_id: str,
+    spans: Sequence[SpanIngest],
+    created_at: datetime | None = None,
+) -> int:
+    """Add newly ingested spans to the search index.
+
+    *created_at* should match the spans' own, so dropping their partition
+    can drop their entries too.
+    """
+    if not settings.search_index_enabled:
+        return 0
+    created_at = created_at or datetime.now(UTC)
+    rows = [
+        {
+            "span_id": span.span_id,
+            "trace_id": trace_id,
+            "project_id": project_id,
+            "created_at": created_at,
+            "content": content,
+        }
+        for span in spans
+        if (content := extract_text(span.name, span.input, span.output))
+    ]
+    if rows:
+        await session.execute(insert(span_search), rows)
+    return len(rows)
+
+
+async def _unindex(session: AsyncSession, column: str, ids: Sequence[str]) -> None:
+    if not ids:
+        return
+    stmt = delete(span_search).where(span_search.c[column].in_(ids))
+    if session.get_bind().dialect.name == "sqlite":
+        # Find the rows through the FTS index; the IN clause keeps it exact.
+        alternatives = " OR ".join(_fts_string(i) for i in ids)
+        stmt = stmt.where(_fts.op("MATCH")(f"{column} : ({alternatives})"))
+    await session.execute(stmt)
+
+
+async def unindex_traces(session: AsyncSession, trace_ids: Sequence[str]) -> None:
+    """Remove every span of *trace_ids* from the search index."""
+    await _unindex(session, "trace_id", trace_ids)
+
+
+async def unindex_spans(session: AsyncSession, span_ids: Sequence[str]) -> None:
+    """Remove *span_ids* from the search index."""
+    await _unindex(session, "span_id", span_ids)
+
+
+def _date_filters(start_date: datetime | None, end_date: datetime | None) -> list[Any]:
+    filters = []
+    if start_date:
+        filters.append(span_search.c.created_at >= start_date)
+    if end_date:
+        filters.append(span_search.c.created_at <= end_date)
+    return filters
+
+
+def _sqlite_search(
+    project_id: str,
+    terms: list[SearchTerm],
+    filters: list[Any],
+    offset: int,
+    limit: int,
+) -> Any:
+    # bm25 is lower-is-better; only the content column carries weight.
+    rank = func.bm25(_fts, 1.0, 0.0, 0.0, 0.0)
+    hits = (
+        select(
+            span_search.c.span_id,
+            span_search.c.trace_id,
+            func.snippet(_fts, 0, _START, _STOP, "…", 24).label("snippet"),
+            (-rank).label("score"),
+        )
+        .where(_fts.op("MATCH")(fts5_match(project_id, terms)), *filters)
+        .order_by(rank)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    return hits, hits.c.snippet
+
+
+def _postgresql_search(
+    project_id: str,
+    terms: list[SearchTerm],
+    filters: list[Any],
+    offset: int,
+    limit: int,
+) -> Any:
+    query = tsquery(terms)
+    candidates = (
+        select(
+            span_search.c.span_id, span_search.c.trace_id, span_search.c.content, span_search.c.tsv
+        )
+        .where(
+            span_search.c.project_id == project_id,
+            span_search.c.tsv.op("@@")(query),
+            *filters,
+        )
+        .order_by(span_search.c.created_at.desc())
+        .limit(settings.search_candidate_limit)
+        .subquery()
+    )
+    rank = func.ts_rank_cd(candidates.c.tsv, query)
+    hits = (
+        select(
+            candidates.c.span_id,
+            candidates.c.trace_id,
+            candidates.c.content,
+            rank.label("score"),
+        )
+        .order_by(rank.desc())
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    # Headlines are costly, so they are only built for the returned page.
+    snippet = func.ts_headline(TS_CONFIG, hits.c.content, tsquery(terms), _HEADLINE_OPTIONS)
+    return hits, snippet
+
+
+def highlight(snippet: str | None) -> str:
+    """Escape a raw snippet and turn its markers into ``<mark>`` tags."""
+    escaped = html.escape(snippet or "", quote=False)
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+async def search_spans(
+    session: AsyncSession,
+    project_id: str,
+    query: str,
+    offset: int = 0,
+    limit: int = 20,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Return the best-ranked spans matching *query* within a project."""
+    terms = parse_query(query)
+    filters = _date_filters(start_date, end_date)
+    if session.get_bind().dialect.name == "postgresql":
+        hits, snippet = _postgresql_search(project_id, terms, filters, offset, limit)
+    else:
+        hits, snippet = _sqlite_search(project_id, terms, filters, offset, limit)
+
+    # The join drops index entries whose span no longer exists; matching the
+    # trace too means an entry only ever joins the span it was written for.
+    stmt = (
+        select(
+            hits.c.span_id,
+            hits.c.trace_id,
+            SpanModel.name,
+            SpanModel.kind,
+            SpanModel.status,
+            SpanModel.start_time,
+            snippet.label("snippet"),
+            hits.c.score,
+        )
+        .join(
+            SpanModel,
+            and_(SpanModel.id == hits.c.span_id, SpanModel.trace_id == hits.c.trace_id),
+        )
+        .order_by(hits.c.score.desc())
+    )
+    result = await session.execute(stmt)
+    return [
+        {
+            "span_id": row.span_id,
+            "trace_id": row.trace_id,
+            "name": row.name,
+            "kind": row.kind,
+            "status": row.status,
+            "start_time": row.start_time,
+            "snippet": highlight(row.snippet),
+            "score": float(row.score),
+        }
+        for row in result.all()
+    ]
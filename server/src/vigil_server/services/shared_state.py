@@ -0,0 +1,344 @@
+"""Pluggable state shared between server workers.
+
+Token buckets, hot cache entries and pub/sub channels that must agree
+across uvicorn workers and hosts live behind :class:`SharedStateBackend`.
+Two implementations are provided:
+
+* :class:`MemoryBackend` keeps everything in the current process.  It is
+  the default, and the right choice for a single worker or for tests.
+* :class:`RedisBackend` stores state in Redis (``settings.redis_url``) so
+  every worker sees the same rate-limit buckets and cache entries.  It
+  needs the optional ``redis`` package.
+
+The backend is chosen by ``settings.shared_state_backend`` and created
+lazily by :func:`get_backend`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from vigil_server.config import settings
+from vigil_server.exceptions import VigilError
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None  # type: ignore[assignment]
+
+logger = logging.getLogger("vigil_server.services.shared_state")
+
+KEY_PREFIX = "vigil:"
+
+
+class SharedStateBackend(ABC):
+    """Interface for token buckets, a small TTL key/value store and pub/sub."""
+
+    #: True when state is visible to other processes.
+    shared: bool = False
+
+    @abstractmethod
+    async def take_token(self, key: str, capacity: int, window_seconds: float) -> float:
+        """Consume one token from the bucket *key*.
+
+        The bucket holds *capacity* tokens and refills completely over
+        *window_seconds*.  Returns 0 if a token was taken, otherwise the
+        number of seconds until one becomes available.
+        """
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        """Return the value stored at *key*, or ``None``."""
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """Store *value* at *key* for *ttl_seconds*."""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Remove *keys*."""
+
+    @abstractmethod
+    async def add_to_index(self, index: str, member: str, ttl_seconds: float) -> None:
+        """Add *member* to the set *index*, extending its lifetime."""
+
+    @abstractmethod
+    async def pop_index(self, index: str) -> list[str]:
+        """Atomically return and remove every member of the set *index*."""
+
+    @abstractmethod
+    async def publish(self, channel: str, payload: bytes) -> None:
+        """Send *payload* to every current subscriber of *channel*."""
+
+    @abstractmethod
+    async def subscribe(self, channel: str) -> Subscription:
+        """Subscribe to *channel*; messages published after this returns are delivered."""
+
+    async def close(self) -> None:  # noqa: B027 - optional hook
+        """Release connections held by the backend."""
+
+
+class Subscription(ABC):
+    """Async iterator over the payloads published to a channel."""
+
+    def __aiter__(self) -> Subscription:
+        return self
+
+    @abstractmethod
+    async def __anext__(self) -> bytes:
+        """Wait for the next payload."""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Stop receiving messages."""
+
+
+class _MemorySubscription(Subscription):
+    def __init__(self, backend: MemoryBackend, channel: str) -> None:
+        self._backend = backend
+        self._channel = channel
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue()
+
+    async def __anext__(self) -> bytes:
+        return await self.queue.get()
+
+    async def close(self) -> None:
+        self._backend._subscribers.get(self._channel, set()).discard(self)
+
+
+class _Bucket:
+    __slots__ = ("tokens", "last_refill", "window")
+
+    def __init__(self, capacity: int, window: float, now: float) -> None:
+        self.tokens = float(capacity)
+        self.last_refill = now
+        self.window = window
+
+
+class MemoryBackend(SharedStateBackend):
+    """Process-local backend.
+
+    Buckets are kept in an LRU capped at ``max_buckets`` entries so traffic
+    from many distinct keys cannot grow it without bound.  A bucket idle for
+    a full refill window is back at capacity, so dropping it is
+    indistinguishable from keeping it; such buckets are swept on access.
+    """
+
+    def __init__(self, max_buckets: int | None = None) -> None:
+        self._max_buckets = settings.rate_limit_max_buckets if max_buckets is None else max_buckets
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self._values: dict[str, tuple[str, float]] = {}
+        self._indexes: dict[str, tuple[set[str], float]] = {}
+        self._subscribers: dict[str, set[_MemorySubscription]] = {}
+
+    @property
+    def bucket_count(self) -> int:
+        return len(self._buckets)
+
+    async def take_token(self, key: str, capacity: int, window_seconds: float) -> float:
+        now = time.monotonic()
+        self._sweep_buckets(now)
+        rate = capacity / window_seconds
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(capacity, window_seconds, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            elapsed = now - bucket.last_refill
+            bucket.tokens = min(capacity, bucket.tokens + elapsed * rate)
+            bucket.last_refill = now
+
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / rate
+
+        bucket.tokens -= 1
+        return 0.0
+
+    def _sweep_buckets(self, now: float) -> None:
+        """Drop least-recently-used buckets that have fully refilled."""
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if now - oldest.last_refill < oldest.window:
+                break
+            self._buckets.popitem(last=False)
+
+    async def get(self, key: str) -> str | None:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        if ttl_seconds <= 0:
+            return
+        self._values[key] = (value, time.monotonic() + ttl_seconds)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._values.pop(key, None)
+
+    async def add_to_index(self, index: str, member: str, ttl_seconds: float) -> None:
+        members, _ = self._indexes.get(index, (set(), 0.0))
+        members.add(member)
+        self._indexes[index] = (members, time.monotonic() + ttl_seconds)
+
+    async def pop_index(self, index: str) -> list[str]:
+        members, expires_at = self._indexes.pop(index, (set(), 0.0))
+        if expires_at <= time.monotonic():
+            return []
+        return sorted(members)
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        for subscription in self._subscribers.get(channel, ()):
+            subscription.queue.put_nowait(payload)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = _MemorySubscription(self, channel)
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, pubsub: Any) -> None:
+        self._pubsub = pubsub
+
+    async def __anext__(self) -> bytes:
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None and message["type"] == "message":
+                data = message["data"]
+                return data.encode() if isinstance(data, str) else bytes(data)
+
+    async def close(self) -> None:
+        await self._pubsub.unsubscribe()
+        await self._pubsub.aclose()
+
+
+# Atomic token bucket.  Uses the server clock so workers with skewed clocks
+# still agree; the hash expires once the bucket would be full again.
+_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens < 1 then
+  retry = (1 - tokens) / rate
+else
+  tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tostring(retry)
+"""
+
+
+class RedisBackend(SharedStateBackend):
+    """Redis-backed state shared by every worker pointing at the same server."""
+
+    shared = True
+
+    def __init__(self, url: str | None = None, client: Any = None) -> None:
+        if client is None:
+            if aioredis is None:
+                raise VigilError(
+                    "shared_state_backend='redis' requires the 'redis' package "
+                    "(pip install 'vigil-server[redis]')"
+                )
+            client = aioredis.from_url(url or settings.redis_url, decode_responses=True)
+        self._client = client
+        self._take_token = client.register_script(_TAKE_TOKEN_SCRIPT)
+
+    async def take_token(self, key: str, capacity: int, window_seconds: float) -> float:
+        retry = await self._take_token(
+            keys=[KEY_PREFIX + "bucket:" + key],
+            args=[capacity, capacity / window_seconds, math.ceil(window_seconds) + 1],
+        )
+        return float(retry)
+
+    async def get(self, key: str) -> str | None:
+        value = await self._client.get(KEY_PREFIX + key)
+        return value if value is None else str(value)
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        if ttl_seconds <= 0:
+            return
+        await self._client.set(KEY_PREFIX + key, value, px=max(1, int(ttl_seconds * 1000)))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*(KEY_PREFIX + k for k in keys))
+
+    async def add_to_index(self, index: str, member: str, ttl_seconds: float) -> None:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.sadd(KEY_PREFIX + index, member)
+            pipe.expire(KEY_PREFIX + index, max(1, math.ceil(ttl_seconds)))
+            await pipe.execute()
+
+    async def pop_index(self, index: str) -> list[str]:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.smembers(KEY_PREFIX + index)
+            pipe.delete(KEY_PREFIX + index)
+            members, _ = await pipe.execute()
+        return sorted(str(m) for m in members)
+
+    async def publish(self, channel: str, payload: bytes) -> None:
+        await self._client.publish(KEY_PREFIX + channel, payload)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(KEY_PREFIX + channel)
+        return _RedisSubscription(pubsub)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_backend: SharedStateBackend | None = None
+
+
+def get_backend() -> SharedStateBackend:
+    """Return the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        kind = settings.shared_state_backend
+        if kind == "redis":
+            _backend = RedisBackend()
+        elif kind == "memory":
+            _backend = MemoryBackend()
+        else:
+            raise VigilError(f"Unknown shared_state_backend: {kind!r}")
+        logger.info("Using %s shared-state backend", kind)
+    return _backend
+
+
+def set_backend(backend: SharedStateBackend | None) -> None:
+    """Replace the active backend (``None`` re-reads settings on next use)."""
+    global _backend
+    _backend = backend
+
+
+async def close_backend() -> None:
+    """Close the active backend (called on application shutdown)."""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
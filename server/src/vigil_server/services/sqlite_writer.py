@@ -0,0 +1,146 @@
+"""Single writer task that batches ingest transactions (SQLite mode).
+
+SQLite allows one writer at a time.  With many concurrent ingest requests
+each opening its own transaction, most of them spend their time waiting on
+the write lock (or fail with "database is locked").  In high-throughput
+mode the ingest route hands its work to :data:`sqlite_writer` instead: a
+single task drains the queue, runs up to ``settings.sqlite_write_batch_max``
+jobs in one transaction on the dedicated write connection, and commits
+once.  If anything in a batch fails, the batch is rolled back and each job
+is retried in its own transaction, so one bad request cannot fail its
+neighbours.
+
+At most ``settings.sqlite_write_queue_max`` jobs wait for the writer; once
+the queue is full, :meth:`SQLiteWriter.submit` sheds the request with a 503
+rather than letting the backlog (and its memory) grow without limit.  Slow
+work that needs no database, such as blob offload, belongs before
+``submit`` so it never runs while the write lock is held.
+
+Jobs must be safe to run twice (they are re-run after a batch rollback).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from vigil_server.config import settings
+from vigil_server.exceptions import ServiceBusyError, VigilError
+from vigil_server.metrics import DB_WRITE_BATCH_SIZE
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger("vigil_server.services.sqlite_writer")
+
+T = TypeVar("T")
+
+Job = Callable[["AsyncSession"], Awaitable[Any]]
+
+
+class SQLiteWriter:
+    """Serialises write jobs through one task and commits them in batches."""
+
+    def __init__(
+        self,
+        max_batch: int | None = None,
+        wait_seconds: float | None = None,
+        max_queue: int | None = None,
+    ) -> None:
+        self._max_batch = settings.sqlite_write_batch_max if max_batch is None else max_batch
+        self._max_queue = settings.sqlite_write_queue_max if max_queue is None else max_queue
+        self._wait = (
+            settings.sqlite_write_batch_wait_ms / 1000 if wait_seconds is None else wait_seconds
+        )
+        self._queue: asyncio.Queue[tuple[Job, asyncio.Future[Any]]] | None = None
+        self._session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        if self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info("SQLite batching writer started (max_batch=%d)", self._max_batch)
+
+    async def stop(self) -> None:
+        """Finish queued jobs, then stop the writer task."""
+        if self._task is None or self._queue is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.join()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    async def submit(self, job: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """Run *job* with a session inside the next batch; returns its result.
+
+        Raises :class:`ServiceBusyError` (503) if the queue is full.
+        """
+        if self._task is None or self._queue is None:
+            raise VigilError("SQLite writer is not running")
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            logger.warning("SQLite write queue full (%d jobs)", self._max_queue)
+            raise ServiceBusyError("Server busy (write queue full)") from None
+        return await future
+
+    def _take_batch(self, limit: int | None = None) -> list[tuple[Job, asyncio.Future[Any]]]:
+        assert self._queue is not None
+        limit = self._max_batch if limit is None else limit
+        batch: list[tuple[Job, asyncio.Future[Any]]] = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        while True:
+            first = await self._queue.get()
+            if self._wait > 0 and self._queue.qsize() < self._max_batch - 1:
+                # Let concurrent requests join the transaction.
+                await asyncio.sleep(self._wait)
+            batch = [first, *self._take_batch(self._max_batch - 1)]
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: list[tuple[Job, asyncio.Future[Any]]]) -> None:
+        batch = [(job, fut) for job, fut in batch if not fut.done()]
+        if not batch:
+            return
+        assert self._session_factory is not None
+        try:
+            async with self._session_factory() as session, session.begin():
+                results = [await job(session) for job, _ in batch]
+        except Exception as exc:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(exc)
+                return
+            logger.debug("Batch of %d writes failed; retrying individually", len(batch))
+            for item in batch:
+                await self._commit([item])
+            return
+
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        for (_, future), result in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+
+# Singleton instance
+sqlite_writer = SQLiteWriter()
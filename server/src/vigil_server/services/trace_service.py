@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import logging
 import uuid
-from datetime import datetime
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import func, select
+from sqlalchemy import and_, exists, func, or_, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
 
+from vigil_server.db.json_filters import metadata_condition
 from vigil_server.exceptions import NotFoundError, VigilError
 from vigil_server.models.span import Span as SpanModel
 from vigil_server.models.trace import Trace as TraceModel
@@ -18,17 +20,66 @@ if TYPE_CHECKING:
     from collections.abc import Sequence
 
     from sqlalchemy.ext.asyncio import AsyncSession
-from vigil_server.schemas.traces import IngestRequest, SpanResponse, TraceResponse
+from vigil_server.schemas.spans import SpanResponse as SpanTreeSpan
+from vigil_server.schemas.spans import SpanTreeNode, SpanTreeResponse
+from vigil_server.schemas.traces import IngestRequest, SpanIngest, SpanResponse, TraceResponse
+from vigil_server.services.blob_store import (
+    offload_payload,
+    resolve_payloads,
+    resolve_span_payloads,
+)
+from vigil_server.services.filter_query import plan_query, time_window_bounded
+from vigil_server.services.id_registry import claim_spans, claim_trace
+from vigil_server.services.retention import merge_into_summary
+from vigil_server.services.search import index_spans
 
 logger = logging.getLogger("vigil_server.services.trace")
 
+# Upper bound on the number of nodes returned by a single span-tree request.
+# Expansion stops at the level that would exceed it; the client expands the
+# remaining nodes lazily via ``parent_span_id``.
+MAX_TREE_NODES = 2000
+
+
+async def offload_span_payloads(
+    spans: Sequence[SpanIngest], project_id: str
+) -> list[tuple[Any, Any]]:
+    """Move large ``input``/``output`` values to the blob store.
+
+    Returns the values to store, per span.  Call this before opening the
+    write transaction so blob I/O does not run while it is held.
+    """
+    return [
+        (await offload_payload(s.input, project_id), await offload_payload(s.output, project_id))
+        for s in spans
+    ]
+
+
+async def _resolve_span_models(
+    spans: Sequence[SpanResponse | SpanTreeSpan], project_id: str
+) -> None:
+    """Replace blob references in response spans' ``input``/``output`` in place."""
+    fields = [(span, field) for span in spans for field in ("input", "output")]
+    values = await resolve_payloads([getattr(span, field) for span, field in fields], project_id)
+    for (span, field), value in zip(fields, values, strict=True):
+        setattr(span, field, value)
+
 
 async def ingest_spans(
     session: AsyncSession,
     request: IngestRequest,
     project_id: str,
+    payloads: list[tuple[Any, Any]] | None = None,
 ) -> tuple[str, int]:
-    """Ingest a batch of spans, creating or updating the parent trace."""
+    """Ingest a batch of spans, creating or updating the parent trace.
+
+    *payloads* are the stored ``input``/``output`` values from
+    :func:`offload_span_payloads`; they are computed here if omitted.
+    Ingest is idempotent: spans whose id is already registered (a retried
+    batch) are skipped.  Raises 409 if a new trace reuses an ``external_id``.
+    """
+    if payloads is None:
+        payloads = await offload_span_payloads(request.spans, project_id)
     # Determine trace_id from first span or generate new
     trace_id = (
         request.spans[0].trace_id
@@ -36,9 +87,14 @@ async def ingest_spans(
         else uuid.uuid4().hex
     )
 
+    now = datetime.now(UTC)
     try:
-        # Upsert trace
+        # Upsert trace.  The claim serialises concurrent first ingests of a trace.
         existing = await session.get(TraceModel, trace_id)
+        if not existing and not await claim_trace(session, trace_id, request.external_id, now):
+            existing = await session.get(TraceModel, trace_id)
+            if existing is None:
+                raise VigilError(f"external_id {request.external_id!r} is already in use", 409)
         if not existing:
             trace = TraceModel(
                 id=trace_id,
@@ -46,14 +102,24 @@ async def ingest_spans(
                 name=request.trace_name,
                 metadata_=request.trace_metadata,
                 external_id=request.external_id,
+                created_at=now,
             )
             session.add(trace)
         else:
+            trace = existing
             if request.trace_name:
                 existing.name = request.trace_name
-
-        # Insert spans
-        for span_data in request.spans:
+            # New spans change the trace's representation; bump its version marker.
+            existing.updated_at = datetime.now(UTC)
+
+        # Insert spans not seen before
+        claimed = await claim_spans(session, trace_id, [s.span_id for s in request.spans], now)
+        new_spans = []
+        for span_data, (stored_input, stored_output) in zip(request.spans, payloads, strict=True):
+            if span_data.span_id not in claimed:
+                continue
+            claimed.discard(span_data.span_id)
+            new_spans.append(span_data)
             span = SpanModel(
                 id=span_data.span_id,
                 trace_id=trace_id,
@@ -61,17 +127,29 @@ async def ingest_spans(
                 name=span_data.name,
                 kind=span_data.kind,
                 status=span_data.status,
-                input=span_data.input,
-                output=span_data.output,
+                input=stored_input,
+                output=stored_output,
                 metadata_=span_data.metadata,
                 events=span_data.events,
                 start_time=span_data.start_time,
                 end_time=span_data.end_time,
+                created_at=now,
             )
             session.add(span)
 
+        if trace.summary is not None and new_spans:
+            # Compacted trace: its counts are read from the summary.
+            trace.summary = merge_into_summary(trace.summary, new_spans)
+
         await session.flush()
-        logger.debug("Ingested %d spans for trace %s", len(request.spans), trace_id)
+        await index_spans(session, trace.project_id, trace_id, new_spans, created_at=now)
+        if len(new_spans) < len(request.spans):
+            logger.debug(
+                "Skipped %d already ingested spans for trace %s",
+                len(request.spans) - len(new_spans),
+                trace_id,
+            )
+        logger.debug("Ingested %d spans for trace %s", len(new_spans), trace_id)
         return trace_id, len(request.spans)
 
     except SQLAlchemyError as exc:
@@ -80,14 +158,51 @@ async def ingest_spans(
 
 
 async def get_trace(session: AsyncSession, trace_id: str) -> TraceModel | None:
-    """Fetch a trace with all its spans."""
+    """Fetch a trace with all its spans, from cold storage if it was archived."""
+    from vigil_server.services.cold_storage import cold_storage
+
     try:
-        return await session.get(TraceModel, trace_id)
+        trace = await session.get(TraceModel, trace_id)
+        if trace is None:
+            trace = await cold_storage.load_trace(session, trace_id)
+        return trace
     except SQLAlchemyError as exc:
         logger.exception("Database error fetching trace %s", trace_id)
         raise VigilError("Failed to fetch trace", status_code=500) from exc
 
 
+def _trace_filters(
+    session: AsyncSession,
+    project_id: str | None,
+    status: str | None,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    metadata: dict[str, str] | None = None,
+    query: str | None = None,
+) -> list[Any]:
+    """Return the WHERE clauses shared by the trace list queries."""
+    filters: list[Any] = []
+    if project_id:
+        filters.append(TraceModel.project_id == project_id)
+    if status:
+        filters.append(TraceModel.status == status)
+    if start_date:
+        filters.append(TraceModel.created_at >= start_date)
+    if end_date:
+        filters.append(TraceModel.created_at <= end_date)
+    dialect = session.get_bind().dialect.name
+    if metadata:
+        filters.append(metadata_condition(TraceModel.metadata_, metadata, dialect))
+    if query:
+        bounded_by = None
+        if time_window_bounded(start_date, end_date, datetime.now(UTC)):
+            bounded_by = "start_date"
+        elif metadata and dialect == "postgresql":
+            bounded_by = "metadata"
+        filters.extend(plan_query(query, "traces", dialect, bounded_by=bounded_by).conditions)
+    return filters
+
+
 async def list_traces(
     session: AsyncSession,
     project_id: str | None = None,
@@ -96,36 +211,264 @@ async def list_traces(
     status: str | None = None,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
+    metadata: dict[str, str] | None = None,
+    query: str | None = None,
 ) -> tuple[Sequence[TraceModel], int]:
     """List traces with pagination and optional filters."""
     try:
-        stmt = select(TraceModel).order_by(TraceModel.created_at.desc())
-        count_stmt = select(func.count()).select_from(TraceModel)
+        filters = _trace_filters(session, project_id, status, start_date, end_date, metadata, query)
+        count_stmt = select(func.count()).select_from(TraceModel).where(*filters)
+        total_result = await session.execute(count_stmt)
+        total = total_result.scalar() or 0
 
-        if project_id:
-            stmt = stmt.where(TraceModel.project_id == project_id)
-            count_stmt = count_stmt.where(TraceModel.project_id == project_id)
+        stmt = (
+            select(TraceModel)
+            .where(*filters)
+            .order_by(TraceModel.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        traces = result.scalars().all()
 
-        if status:
-            stmt = stmt.where(TraceModel.status == status)
-            count_stmt = count_stmt.where(TraceModel.status == status)
+        return traces, total
 
-        if start_date:
-            stmt = stmt.where(TraceModel.created_at >= start_date)
-            count_stmt = count_stmt.where(TraceModel.created_at >= start_date)
+    except SQLAlchemyError as exc:
+        logger.exception("Database error listing traces")
+        raise VigilError("Failed to list traces", status_code=500) from exc
 
-        if end_date:
-            stmt = stmt.where(TraceModel.created_at <= end_date)
-            count_stmt = count_stmt.where(TraceModel.created_at <= end_date)
 
-        total_result = await session.execute(count_stmt)
-        total = total_result.scalar() or 0
+# --- Row-level read path ---
+#
+# The functions below select plain columns and build response dicts shaped
+# exactly like ``TraceResponse``/``SpanResponse`` without going through ORM
+# entities or pydantic models.  They back the large read endpoints, which
+# encode the dicts directly with ``FastJSONResponse``.
+
+SPAN_COLUMNS = (
+    SpanModel.id,
+    SpanModel.trace_id,
+    SpanModel.parent_span_id,
+    SpanModel.name,
+    SpanModel.kind,
+    SpanModel.status,
+    SpanModel.input,
+    SpanModel.output,
+    SpanModel.metadata_,
+    SpanModel.events,
+    SpanModel.start_time,
+    SpanModel.end_time,
+    SpanModel.created_at,
+)
+
+TRACE_COLUMNS = (
+    TraceModel.id,
+    TraceModel.project_id,
+    TraceModel.name,
+    TraceModel.status,
+    TraceModel.external_id,
+    TraceModel.metadata_,
+    TraceModel.start_time,
+    TraceModel.end_time,
+    TraceModel.created_at,
+    TraceModel.summary,
+)
+
+
+def span_row_to_dict(row: Sequence[Any]) -> dict[str, Any]:
+    """Convert a row selected with :data:`SPAN_COLUMNS` to a ``SpanResponse`` dict."""
+    (
+        span_id,
+        trace_id,
+        parent_span_id,
+        name,
+        kind,
+        status,
+        input_,
+        output,
+        metadata,
+        events,
+        start_time,
+        end_time,
+        created_at,
+    ) = row
+    return {
+        "id": span_id,
+        "trace_id": trace_id,
+        "parent_span_id": parent_span_id,
+        "name": name,
+        "kind": kind,
+        "status": status,
+        "input": input_,
+        "output": output,
+        "metadata": metadata or {},
+        "events": events or [],
+        "start_time": start_time,
+        "end_time": end_time,
+        "created_at": created_at,
+    }
+
+
+def _trace_row_to_dict(row: Sequence[Any], spans: list[dict[str, Any]]) -> dict[str, Any]:
+    """Convert a row selected with :data:`TRACE_COLUMNS` to a ``TraceResponse`` dict."""
+    (
+        trace_id,
+        project_id,
+        name,
+        status,
+        external_id,
+        metadata,
+        start_time,
+        end_time,
+        created_at,
+        summary,
+    ) = row
+    return {
+        "id": trace_id,
+        "project_id": project_id,
+        "name": name,
+        "status": status,
+        "external_id": external_id,
+        "metadata": metadata or {},
+        "start_time": start_time,
+        "end_time": end_time,
+        "created_at": created_at,
+        "span_count": summary["span_count"] if summary else len(spans),
+        "summary": summary,
+        "spans": spans,
+    }
+
+
+async def _span_dicts_by_trace(
+    session: AsyncSession, trace_ids: list[str]
+) -> dict[str, list[dict[str, Any]]]:
+    """Load the spans of *trace_ids* as response dicts, grouped by trace."""
+    grouped: dict[str, list[dict[str, Any]]] = {tid: [] for tid in trace_ids}
+    if not trace_ids:
+        return grouped
+    stmt = select(*SPAN_COLUMNS).where(SpanModel.trace_id.in_(trace_ids))
+    result = await session.execute(stmt)
+    for row in result.all():
+        grouped[row[1]].append(span_row_to_dict(row))
+    return grouped
+
+
+async def get_trace_document(session: AsyncSession, trace_id: str) -> dict[str, Any] | None:
+    """Fetch a trace with all its spans as a ``TraceResponse``-shaped dict.
+
+    Offloaded span payloads are fetched from the blob store.
+    """
+    from vigil_server.services.cold_storage import cold_storage
+
+    try:
+        result = await session.execute(select(*TRACE_COLUMNS).where(TraceModel.id == trace_id))
+        row = result.one_or_none()
+        if row is None:
+            doc = await cold_storage.load_document(session, trace_id)
+        else:
+            spans = await _span_dicts_by_trace(session, [trace_id])
+            doc = _trace_row_to_dict(row, spans[trace_id])
+    except SQLAlchemyError as exc:
+        logger.exception("Database error fetching trace %s", trace_id)
+        raise VigilError("Failed to fetch trace", status_code=500) from exc
+    if doc is not None:
+        await resolve_span_payloads(doc["spans"], doc["project_id"])
+    return doc
+
+
+async def trace_documents_before(
+    session: AsyncSession, cutoff: datetime, limit: int
+) -> list[dict[str, Any]]:
+    """Return up to *limit* of the oldest traces created before *cutoff*, with spans."""
+    stmt = (
+        select(*TRACE_COLUMNS)
+        .where(TraceModel.created_at < cutoff)
+        .order_by(TraceModel.created_at)
+        .limit(limit)
+    )
+    rows = (await session.execute(stmt)).all()
+    spans = await _span_dicts_by_trace(session, [row[0] for row in rows])
+    return [_trace_row_to_dict(row, spans[row[0]]) for row in rows]
+
+
+async def get_trace_version(session: AsyncSession, trace_id: str) -> str | None:
+    """Return a cheap version marker for a trace, or ``None`` if it does not exist.
+
+    The marker is the trace's ``updated_at``, which is bumped whenever the
+    trace, its spans or their events change.  Archived traces never change,
+    so theirs is the time they were archived.
+    """
+    from vigil_server.models.archived_trace import ArchivedTrace
 
-        stmt = stmt.offset(offset).limit(limit)
+    try:
+        stmt = select(TraceModel.updated_at).where(TraceModel.id == trace_id)
         result = await session.execute(stmt)
-        traces = result.scalars().all()
+        row = result.one_or_none()
+        if row is None:
+            stmt = select(ArchivedTrace.created_at).where(ArchivedTrace.id == trace_id)
+            row = (await session.execute(stmt)).one_or_none()
+        return None if row is None else str(row[0])
+    except SQLAlchemyError as exc:
+        logger.exception("Database error fetching trace %s", trace_id)
+        raise VigilError("Failed to fetch trace", status_code=500) from exc
 
-        return traces, total
+
+async def get_trace_list_version(
+    session: AsyncSession,
+    project_id: str | None = None,
+    status: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    metadata: dict[str, str] | None = None,
+    query: str | None = None,
+) -> tuple[int, str]:
+    """Return ``(total, marker)`` for the traces matching the list filters.
+
+    ``total`` is the number of matching traces and ``marker`` the latest
+    ``updated_at`` among them; together they change whenever the listing
+    does.
+    """
+    try:
+        filters = _trace_filters(session, project_id, status, start_date, end_date, metadata, query)
+        stmt = (
+            select(func.count(), func.max(TraceModel.updated_at))
+            .select_from(TraceModel)
+            .where(*filters)
+        )
+        total, last_updated = (await session.execute(stmt)).one()
+        return total or 0, str(last_updated)
+    except SQLAlchemyError as exc:
+        logger.exception("Database error listing traces")
+        raise VigilError("Failed to list traces", status_code=500) from exc
+
+
+async def list_trace_documents(
+    session: AsyncSession,
+    project_id: str | None = None,
+    offset: int = 0,
+    limit: int = 50,
+    status: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    metadata: dict[str, str] | None = None,
+    query: str | None = None,
+) -> list[dict[str, Any]]:
+    """Like :func:`list_traces` but returns one page of ``TraceResponse``-shaped dicts.
+
+    The total is available from :func:`get_trace_list_version`.
+    """
+    try:
+        filters = _trace_filters(session, project_id, status, start_date, end_date, metadata, query)
+        stmt = (
+            select(*TRACE_COLUMNS)
+            .where(*filters)
+            .order_by(TraceModel.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = (await session.execute(stmt)).all()
+        spans = await _span_dicts_by_trace(session, [row[0] for row in rows])
+        return [_trace_row_to_dict(row, spans[row[0]]) for row in rows]
 
     except SQLAlchemyError as exc:
         logger.exception("Database error listing traces")
@@ -162,6 +505,7 @@ async def append_event(
         current_events = list(target_span.events or [])
         current_events.append(event)
         target_span.events = current_events
+        trace.updated_at = datetime.now(UTC)
         await session.flush()
         return event
 
@@ -197,8 +541,173 @@ async def update_trace(
         raise VigilError("Failed to update trace", status_code=500) from exc
 
 
+async def get_span_tree(
+    session: AsyncSession,
+    trace_id: str,
+    *,
+    parent_span_id: str | None = None,
+    depth: int = 3,
+    offset: int = 0,
+    limit: int = 50,
+    children_limit: int = 20,
+) -> SpanTreeResponse | None:
+    """Build one page of a trace's span hierarchy server-side.
+
+    The top level is the children of ``parent_span_id``, or the trace's root
+    spans (no parent, or a parent that is not part of the trace) when it is
+    ``None``.  Each further level is fetched with a single query over
+    ``(trace_id, parent_span_id)``, keeping at most ``children_limit``
+    children per node.  Every node carries its total ``child_count`` so
+    truncated subtrees can be expanded lazily.
+
+    Offloaded span payloads are fetched from the blob store.  Returns
+    ``None`` if the trace does not exist.
+    """
+    try:
+        found = await session.execute(
+            select(TraceModel.project_id).where(TraceModel.id == trace_id)
+        )
+        project_id = found.scalar_one_or_none()
+        if project_id is None:
+            return None
+
+        if parent_span_id is not None:
+            top_filter = SpanModel.parent_span_id == parent_span_id
+        else:
+            parent = aliased(SpanModel)
+            top_filter = or_(
+                SpanModel.parent_span_id.is_(None),
+                ~exists().where(
+                    and_(parent.id == SpanModel.parent_span_id, parent.trace_id == trace_id)
+                ),
+            )
+
+        count_stmt = (
+            select(func.count())
+            .select_from(SpanModel)
+            .where(SpanModel.trace_id == trace_id, top_filter)
+        )
+        total = (await session.execute(count_stmt)).scalar() or 0
+
+        top_stmt = (
+            select(SpanModel)
+            .where(SpanModel.trace_id == trace_id, top_filter)
+            .order_by(SpanModel.start_time, SpanModel.created_at, SpanModel.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        top_spans = (await session.execute(top_stmt)).scalars().all()
+
+        nodes = [SpanTreeNode(span=_span_tree_span(s)) for s in top_spans]
+        returned_spans = [n.span for n in nodes]
+        frontier = {n.span.id: n for n in nodes}
+        returned = len(nodes)
+        level = 1
+
+        while frontier:
+            counts = await _child_counts(session, trace_id, list(frontier))
+            for span_id, node in frontier.items():
+                node.child_count = counts.get(span_id, 0)
+
+            if level >= depth:
+                break
+            expected = sum(min(n.child_count, children_limit) for n in frontier.values())
+            if expected == 0 or returned + expected > MAX_TREE_NODES:
+                break
+
+            children = await _limited_children(session, trace_id, list(frontier), children_limit)
+            next_frontier: dict[str, SpanTreeNode] = {}
+            for child in children:
+                child_node = SpanTreeNode(span=_span_tree_span(child))
+                frontier[child.parent_span_id].children.append(child_node)  # type: ignore[index]
+                next_frontier[child.id] = child_node
+                returned_spans.append(child_node.span)
+            returned += len(next_frontier)
+            frontier = next_frontier
+            level += 1
+
+        await _resolve_span_models(returned_spans, project_id)
+        return SpanTreeResponse(
+            trace_id=trace_id,
+            parent_span_id=parent_span_id,
+            nodes=nodes,
+            total=total,
+            offset=offset,
+            limit=limit,
+            depth=depth,
+        )
+
+    except SQLAlchemyError as exc:
+        logger.exception("Database error building span tree for trace %s", trace_id)
+        raise VigilError("Failed to build span tree", status_code=500) from exc
+
+
+async def _child_counts(
+    session: AsyncSession, trace_id: str, parent_ids: list[str]
+) -> dict[str, int]:
+    """Return the number of direct children for each of *parent_ids*."""
+    stmt = (
+        select(SpanModel.parent_span_id, func.count())
+        .where(SpanModel.trace_id == trace_id, SpanModel.parent_span_id.in_(parent_ids))
+        .group_by(SpanModel.parent_span_id)
+    )
+    result = await session.execute(stmt)
+    return {parent_id: count for parent_id, count in result.all() if parent_id is not None}
+
+
+async def _limited_children(
+    session: AsyncSession, trace_id: str, parent_ids: list[str], per_parent: int
+) -> Sequence[SpanModel]:
+    """Fetch at most *per_parent* children of each parent, in start order."""
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=SpanModel.parent_span_id,
+            order_by=(SpanModel.start_time, SpanModel.created_at, SpanModel.id),
+        )
+        .label("rank")
+    )
+    ranked = (
+        select(SpanModel.id.label("id"), rank)
+        .where(SpanModel.trace_id == trace_id, SpanModel.parent_span_id.in_(parent_ids))
+        .subquery()
+    )
+    stmt = (
+        select(SpanModel)
+        .join(ranked, SpanModel.id == ranked.c.id)
+        .where(ranked.c.rank <= per_parent)
+        .order_by(SpanModel.parent_span_id, ranked.c.rank)
+    )
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+def _span_tree_span(s: SpanModel) -> SpanTreeSpan:
+    return SpanTreeSpan(
+        id=s.id,
+        trace_id=s.trace_id,
+        parent_span_id=s.parent_span_id,
+        name=s.name,
+        kind=s.kind,
+        status=s.status,
+        input=s.input,
+        output=s.output,
+        metadata=s.metadata_ or {},
+        events=s.events or [],
+        start_time=s.start_time,
+        end_time=s.end_time,
+        created_at=s.created_at,
+    )
+
+
+async def resolve_trace_response(response: TraceResponse) -> TraceResponse:
+    """Fetch the offloaded span payloads of *response* from the blob store."""
+    await _resolve_span_models(response.spans, response.project_id)
+    return response
+
+
 def build_trace_response(trace: TraceModel) -> TraceResponse:
-    """Convert a trace model to response schema."""
+    """Convert a trace model to response schema (payloads as stored)."""
     spans = [
         SpanResponse(
             id=s.id,
@@ -227,6 +736,7 @@ def build_trace_response(trace: TraceModel) -> TraceResponse:
         start_time=trace.start_time,
         end_time=trace.end_time,
         created_at=trace.created_at,
-        span_count=len(spans),
+        span_count=trace.summary["span_count"] if trace.summary else len(spans),
+        summary=trace.summary,
         spans=spans,
     )
@@ -1,24 +1,145 @@
-"""WebSocket connection manager for per-project real-time broadcasts."""
+"""WebSocket connection manager for per-project real-time broadcasts.
+
+Each worker only holds its own sockets.  When the shared-state backend is
+shared (Redis), :meth:`ConnectionManager.broadcast` publishes to a pub/sub
+channel instead of sending directly, and every worker delivers what it
+receives on that channel to its local sockets, so an event raised on one
+worker reaches dashboards connected to any other.  Messages are published
+in batches: broadcasts made within ``settings.ws_batch_interval_ms`` of each
+other share one pub/sub message.  At most ``settings.ws_outbox_size``
+broadcasts wait to be published; beyond that the oldest are dropped.  With the in-memory backend, or before
+:meth:`ConnectionManager.start` is called, broadcasts go straight to local
+sockets.
+
+Broadcasting never waits on a client.  Every connection has a bounded send
+queue drained by its own task: repeated events about the same trace or
+replay replace each other in the queue, a full queue drops its oldest
+message, and a client that does not accept a message within
+``settings.ws_send_timeout_seconds`` is disconnected.  The server pings
+every connection periodically and closes those it has not heard from
+within ``settings.ws_idle_timeout_seconds``.
+
+Clients can also subscribe to a live tail of ingested spans (see
+:mod:`vigil_server.services.live_tail`); span summaries travel the same
+broadcast path as a ``spans`` message and are filtered and batched per
+socket instead of being queued directly.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import json
 import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Hashable
 from typing import Any
 
 from fastapi import WebSocket
 
+from vigil_server.config import settings
+from vigil_server.serialization import dumps
+from vigil_server.services.live_tail import TailCoalescer, TailFilter
+from vigil_server.services.shared_state import SharedStateBackend, Subscription, get_backend
+
 logger = logging.getLogger("vigil_server.services.websocket")
 
+BROADCAST_CHANNEL = "ws:broadcast"
+
+# Internal message type carrying span summaries for live-tail subscribers.
+SPANS_MESSAGE = "spans"
+
+# Message types where only the latest event per entity matters to a client.
+_COALESCE_FIELDS = {"trace.new": "trace_id", "replay.status": "replay_id"}
+
+
+def _coalesce_key(message: dict[str, Any]) -> Hashable | None:
+    """Return the key under which *message* replaces an older queued one."""
+    msg_type = message.get("type")
+    if msg_type == "ping":
+        return ("ping",)
+    field = _COALESCE_FIELDS.get(msg_type)  # type: ignore[arg-type]
+    data = message.get("data")
+    if field is None or not isinstance(data, dict) or data.get(field) is None:
+        return None
+    return (msg_type, data[field])
+
+
+class _Client:
+    """A connection with its pending messages and sender task."""
+
+    __slots__ = ("ws", "project_id", "pending", "wake", "task", "last_seen", "tail", "_seq")
+
+    def __init__(self, ws: WebSocket, project_id: str) -> None:
+        self.ws = ws
+        self.project_id = project_id
+        self.pending: OrderedDict[Hashable, dict[str, Any]] = OrderedDict()
+        self.wake = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+        self.last_seen = time.monotonic()
+        self.tail: TailCoalescer | None = None
+        self._seq = 0
+
 
 class ConnectionManager:
     """Manages WebSocket connections grouped by project_id."""
 
-    def __init__(self) -> None:
+    def __init__(self, backend: SharedStateBackend | None = None) -> None:
         self._connections: dict[str, set[WebSocket]] = {}
+        self._clients: dict[WebSocket, _Client] = {}
+        self._backend = backend
+        self._fanout: SharedStateBackend | None = None
+        self._outbox: deque[tuple[str, dict[str, Any]]] = deque()
+        self._outbox_size = settings.ws_outbox_size
+        self._outbox_ready = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+        self._batch_interval = settings.ws_batch_interval_ms / 1000
+        self._batch_max = settings.ws_batch_max_messages
+        self._queue_size = settings.ws_send_queue_size
+        self._send_timeout = settings.ws_send_timeout_seconds
+        self._heartbeat_interval = settings.ws_heartbeat_interval_seconds
+        self._idle_timeout = settings.ws_idle_timeout_seconds
+        self.dropped = 0
+        self.coalesced = 0
+        self.send_timeouts = 0
+        self.reaped = 0
+
+    async def start(self) -> None:
+        """Start the heartbeat, plus cross-worker fan-out if the backend is shared."""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+
+        backend = self._backend or get_backend()
+        if not backend.shared:
+            return
+        subscription = await backend.subscribe(BROADCAST_CHANNEL)
+        self._fanout = backend
+        self._tasks += [
+            asyncio.create_task(self._receive_loop(backend, subscription)),
+            asyncio.create_task(self._publish_loop(backend)),
+        ]
+        logger.info("WebSocket fan-out started")
+
+    async def stop(self) -> None:
+        """Flush pending broadcasts and stop background tasks."""
+        if self._fanout is not None:
+            await self._flush(self._fanout)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self._fanout = None
 
     async def connect(self, ws: WebSocket, project_id: str) -> None:
         """Accept and register a WebSocket connection."""
         await ws.accept()
+        client = _Client(ws, project_id)
+        client.task = asyncio.create_task(self._sender(client))
+        self._clients[ws] = client
         if project_id not in self._connections:
             self._connections[project_id] = set()
         self._connections[project_id].add(ws)
@@ -28,28 +149,187 @@ class ConnectionManager:
 
     def disconnect(self, ws: WebSocket, project_id: str) -> None:
         """Remove a WebSocket connection."""
+        client = self._clients.pop(ws, None)
+        if client is not None and client.tail is not None:
+            client.tail.close()
+        task = client.task if client is not None else None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
         if project_id in self._connections:
             self._connections[project_id].discard(ws)
             if not self._connections[project_id]:
                 del self._connections[project_id]
 
+    def touch(self, ws: WebSocket) -> None:
+        """Record that a client is alive (any message received from it)."""
+        client = self._clients.get(ws)
+        if client is not None:
+            client.last_seen = time.monotonic()
+
+    def send(self, ws: WebSocket, message: dict[str, Any]) -> None:
+        """Queue a message for a single connection."""
+        client = self._clients.get(ws)
+        if client is not None:
+            self._enqueue(client, message)
+
+    def subscribe_tail(self, ws: WebSocket, tail_filter: TailFilter) -> None:
+        """Start (or replace) a connection's live-tail subscription."""
+        client = self._clients.get(ws)
+        if client is None:
+            return
+        if client.tail is not None:
+            client.tail.close()
+        client.tail = TailCoalescer(tail_filter, lambda message: self._enqueue(client, message))
+
+    def unsubscribe_tail(self, ws: WebSocket) -> None:
+        """Stop a connection's live-tail subscription."""
+        client = self._clients.get(ws)
+        if client is not None and client.tail is not None:
+            client.tail.close()
+            client.tail = None
+
+    def wants_spans(self, project_id: str) -> bool:
+        """Return True if span summaries for *project_id* may have a subscriber.
+
+        With cross-worker fan-out a subscriber may live on another worker,
+        so this is always True.
+        """
+        if self._fanout is not None:
+            return True
+        return any(
+            self._clients[ws].tail is not None
+            for ws in self._connections.get(project_id, ())
+            if ws in self._clients
+        )
+
+    async def publish_spans(self, project_id: str, spans: list[dict[str, Any]]) -> None:
+        """Offer span summaries to the project's live-tail subscribers."""
+        if spans:
+            await self.broadcast(project_id, {"type": SPANS_MESSAGE, "data": {"spans": spans}})
+
     async def broadcast(self, project_id: str, message: dict[str, Any]) -> None:
-        """Send a message to all connections for a project."""
-        if project_id not in self._connections:
+        """Queue a message for all connections for a project, on every worker.
+
+        Returns without waiting for any client to receive it.
+        """
+        if self._fanout is None:
+            self._deliver_local(project_id, message)
             return
 
-        dead: list[WebSocket] = []
-        for ws in self._connections[project_id]:
+        if len(self._outbox) >= self._outbox_size:
+            # Publishing has fallen behind (backend slow or down); shed the oldest.
+            self._outbox.popleft()
+            self.dropped += 1
+        self._outbox.append((project_id, message))
+        self._outbox_ready.set()
+
+    def _deliver_local(self, project_id: str, message: dict[str, Any]) -> None:
+        """Queue a message for this worker's connections for a project."""
+        is_spans = message.get("type") == SPANS_MESSAGE
+        for ws in self._connections.get(project_id, ()):
+            client = self._clients.get(ws)
+            if client is None:
+                continue
+            if is_spans:
+                if client.tail is not None:
+                    client.tail.offer(message["data"]["spans"])
+            else:
+                self._enqueue(client, message)
+
+    def _enqueue(self, client: _Client, message: dict[str, Any]) -> None:
+        key = _coalesce_key(message)
+        if key is not None and key in client.pending:
+            # Replace in place; the newer event keeps the older one's position.
+            client.pending[key] = message
+            self.coalesced += 1
+            return
+        if key is None:
+            client._seq += 1
+            key = client._seq
+        if len(client.pending) >= self._queue_size:
+            client.pending.popitem(last=False)
+            self.dropped += 1
+        client.pending[key] = message
+        client.wake.set()
+
+    async def _sender(self, client: _Client) -> None:
+        """Drain one connection's queue; disconnect it if sending fails or stalls."""
+        try:
+            while True:
+                await client.wake.wait()
+                client.wake.clear()
+                while client.pending:
+                    _, message = client.pending.popitem(last=False)
+                    await asyncio.wait_for(client.ws.send_json(message), self._send_timeout)
+        except TimeoutError:
+            self.send_timeouts += 1
+            logger.info("WS client for project %s too slow; disconnecting", client.project_id)
+            await self._close(client, code=1013)
+        except Exception:
+            await self._close(client)
+
+    async def _close(self, client: _Client, code: int = 1011) -> None:
+        self.disconnect(client.ws, client.project_id)
+        # A stalled peer must not hold up the heartbeat sweep closing it.
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(client.ws.close(code=code), self._send_timeout)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            await self._heartbeat()
+
+    async def _heartbeat(self) -> None:
+        """Close connections idle past the timeout and ping the rest."""
+        cutoff = time.monotonic() - self._idle_timeout
+        for client in list(self._clients.values()):
+            if client.last_seen < cutoff:
+                self.reaped += 1
+                logger.debug("Reaping idle WS client for project %s", client.project_id)
+                await self._close(client, code=1001)
+            else:
+                self._enqueue(client, {"type": "ping"})
+
+    async def _publish_loop(self, backend: SharedStateBackend) -> None:
+        while True:
+            await self._outbox_ready.wait()
+            if len(self._outbox) < self._batch_max:
+                # Give concurrent broadcasts a moment to join the batch.
+                await asyncio.sleep(self._batch_interval)
+            self._outbox_ready.clear()
+            await self._flush(backend)
+
+    async def _flush(self, backend: SharedStateBackend) -> None:
+        """Publish everything in the outbox, ``ws_batch_max_messages`` per message."""
+        pending = list(self._outbox)
+        self._outbox.clear()
+        for start in range(0, len(pending), self._batch_max):
+            batch = pending[start : start + self._batch_max]
             try:
-                await ws.send_json(message)
+                await backend.publish(BROADCAST_CHANNEL, dumps({"messages": batch}))
             except Exception:
-                dead.append(ws)
+                logger.warning(
+                    "WebSocket fan-out publish failed; delivering locally only", exc_info=True
+                )
+                for project_id, message in batch:
+                    self._deliver_local(project_id, message)
 
-        # Prune dead connections
-        for ws in dead:
-            self._connections[project_id].discard(ws)
-        if project_id in self._connections and not self._connections[project_id]:
-            del self._connections[project_id]
+    async def _receive_loop(self, backend: SharedStateBackend, subscription: Subscription) -> None:
+        while True:
+            try:
+                async for payload in subscription:
+                    for project_id, message in json.loads(payload)["messages"]:
+                        self._deliver_local(project_id, message)
+            except asyncio.CancelledError:
+                await subscription.close()
+                raise
+            except Exception:
+                logger.warning("WebSocket fan-out subscription lost; resubscribing", exc_info=True)
+                with contextlib.suppress(Exception):
+                    await subscription.close()
+                await asyncio.sleep(1)
+                with contextlib.suppress(Exception):
+                    subscription = await backend.subscribe(BROADCAST_CHANNEL)
 
     def connection_count(self, project_id: str | None = None) -> int:
         """Return the number of active connections."""
@@ -57,6 +337,18 @@ class ConnectionManager:
             return len(self._connections.get(project_id, set()))
         return sum(len(v) for v in self._connections.values())
 
+    def stats(self) -> dict[str, int]:
+        """Return connection and back-pressure counters."""
+        return {
+            "connections": len(self._clients),
+            "queued": sum(len(c.pending) for c in self._clients.values()),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "send_timeouts": self.send_timeouts,
+            "reaped": self.reaped,
+            "tail_subscribers": sum(c.tail is not None for c in self._clients.values()),
+        }
+
 
 # Singleton instance
 manager = ConnectionManager()
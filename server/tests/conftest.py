@@ -2,14 +2,19 @@
 
 from __future__ import annotations
 
-import pytest
-import pytest_asyncio
-from httpx import ASGITransport, AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import os
 
-from vigil_server.models import Base
-from vigil_server.dependencies import get_db, get_current_project, get_optional_project
-from vigil_server.main import app
+# The whole suite shares one client address; keep it clear of the rate limiter.
+os.environ.setdefault("VIGIL_RATE_LIMIT_REQUESTS", "100000")
+
+import pytest  # noqa: E402
+import pytest_asyncio  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from vigil_server.models import Base  # noqa: E402
+from vigil_server.dependencies import get_db, get_current_project, get_optional_project, get_read_db  # noqa: E402
+from vigil_server.main import app  # noqa: E402
 
 
 @pytest_asyncio.fixture
@@ -44,6 +49,7 @@ async def client(db_session):
         return "test-project"
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     app.dependency_overrides[get_current_project] = override_get_project
     app.dependency_overrides[get_optional_project] = override_get_project
 
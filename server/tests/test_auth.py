@@ -103,3 +103,78 @@ async def test_jwt_protected_access(client):
     # overrides), hitting /v1/traces without auth would return 401.
     res = await client.get("/v1/traces")
     assert res.status_code == 200
+
+
+class TestAuthCache:
+    def test_positive_and_negative_entries(self):
+        from vigil_server.services.auth_cache import AuthCache
+
+        cache = AuthCache(ttl_seconds=60, negative_ttl_seconds=60, max_entries=10)
+        assert cache.get("tok") == (False, None)
+        cache.set("tok", "proj-1")
+        cache.set("bad", None)
+        assert cache.get("tok") == (True, "proj-1")
+        assert cache.get("bad") == (True, None)
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["negative_hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_expiry_and_lru_eviction(self):
+        from vigil_server.services.auth_cache import AuthCache
+
+        cache = AuthCache(ttl_seconds=60, negative_ttl_seconds=0, max_entries=2)
+        cache.set("bad", None)  # zero negative TTL: not cached
+        assert cache.get("bad") == (False, None)
+
+        cache.set("a", "p")
+        cache.set("b", "p")
+        cache.get("a")  # a is now most recently used
+        cache.set("c", "p")
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, "p")
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_project(self):
+        from vigil_server.services.auth_cache import AuthCache
+
+        cache = AuthCache(ttl_seconds=60, negative_ttl_seconds=60, max_entries=10)
+        cache.set("k1", "p1")
+        cache.set("k2", "p1")
+        cache.set("k3", "p2")
+        assert cache.invalidate_project("p1") == 2
+        assert cache.get("k3") == (True, "p2")
+
+
+@pytest.mark.asyncio
+async def test_resolve_token_project_uses_cache(db_session):
+    """API key lookups are cached, and rotation invalidates them."""
+    from vigil_server.models.project import APIKey, Project
+    from vigil_server.services.auth_cache import auth_cache
+    from vigil_server.services.auth_service import resolve_token_project
+
+    project = Project(name="cached")
+    db_session.add(project)
+    await db_session.flush()
+    key = APIKey(project_id=project.id)
+    db_session.add(key)
+    await db_session.flush()
+
+    assert await resolve_token_project(key.key, db_session) == project.id
+    hits = auth_cache.hits
+    assert await resolve_token_project(key.key, db_session) == project.id
+    assert auth_cache.hits == hits + 1
+
+    key.is_active = False
+    await db_session.flush()
+    auth_cache.invalidate_project(project.id)
+    assert await resolve_token_project(key.key, db_session) is None
+
+
+@pytest.mark.asyncio
+async def test_resolve_token_project_jwt(db_session):
+    from vigil_server.services.auth_service import create_access_token, resolve_token_project
+
+    token = create_access_token(subject="user-1")
+    assert await resolve_token_project(token, db_session) == "default"
+    assert await resolve_token_project("not-a-key", db_session) is None
@@ -0,0 +1,181 @@
+"""Tests for offloading large span payloads to the blob store."""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import UTC, datetime, timedelta
+
+import orjson
+import pytest
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.exceptions import NotFoundError, VigilError
+from vigil_server.models.project_settings import ProjectSettings
+from vigil_server.models.span import Span
+from vigil_server.models.trace import Trace
+from vigil_server.schemas.traces import IngestRequest
+from vigil_server.services.blob_store import (
+    REFERENCE_KEY,
+    LocalBlobStore,
+    collect_blobs,
+    resolve_payload,
+    set_blob_store,
+)
+from vigil_server.services.cold_storage import ColdStorage
+from vigil_server.services.retention import RetentionService
+from vigil_server.services.trace_service import get_trace_document, ingest_spans
+
+BIG = {"messages": [{"role": "user", "content": "x" * 4000}]}
+
+
+@pytest.fixture
+def blob_root(tmp_path, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.blob_offload_min_bytes", 1024)
+    set_blob_store(LocalBlobStore(tmp_path))
+    yield tmp_path
+    set_blob_store(None)
+
+
+@pytest.fixture
+def factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _blob_files(root):
+    return [p for p in root.rglob("*") if p.is_file()]
+
+
+@pytest.mark.asyncio
+async def test_local_store_is_content_addressed_per_project(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    key = f"sha256:{hashlib.sha256(b'abc').hexdigest()}"
+    await store.put("p", key, b"abc")
+    await store.put("p", key, b"abc")
+    assert await store.get("p", key) == b"abc"
+    assert len(_blob_files(tmp_path)) == 1
+    assert await store.projects() == ["p"]
+    assert await store.keys("p") == [key]
+
+    with pytest.raises(NotFoundError):
+        await store.get("q", key)
+    with pytest.raises(NotFoundError):
+        await store.get("p", f"sha256:{'0' * 64}")
+    with pytest.raises(VigilError):
+        await store.get("p", "sha256:../../etc/passwd")
+    with pytest.raises(VigilError):
+        await store.get("../p", key)
+
+    # Blobs stored at or after the cutoff are kept.
+    past = datetime.now(UTC) - timedelta(minutes=5)
+    assert not await store.delete("p", key, past)
+    assert await store.delete("p", key, datetime.now(UTC) + timedelta(seconds=5))
+    assert await store.keys("p") == []
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_offloaded_and_resolved_on_detail(client, db_session, blob_root):
+    res = await client.post(
+        "/v1/traces",
+        json={
+            "spans": [
+                {
+                    "span_id": "s1",
+                    "trace_id": "t1",
+                    "name": "llm",
+                    "input": BIG,
+                    "output": {"text": "short"},
+                },
+                {
+                    "span_id": "s2",
+                    "trace_id": "t1",
+                    "parent_span_id": "s1",
+                    "name": "llm",
+                    "input": BIG,
+                },
+            ]
+        },
+    )
+    assert res.status_code == 201
+
+    rows = await db_session.execute(text("SELECT input, output FROM spans ORDER BY id"))
+    stored = [(orjson.loads(i), orjson.loads(o)) for i, o in rows.all()]
+    assert all(REFERENCE_KEY in stored_input for stored_input, _ in stored)
+    assert stored[0][1] == {"text": "short"}
+    # Identical payloads share one blob, stored under the project.
+    assert [p.relative_to(blob_root).parts[0] for p in _blob_files(blob_root)] == ["test-project"]
+
+    listed = (await client.get("/v1/spans", params={"trace_id": "t1"})).json()
+    assert all(REFERENCE_KEY in span["input"] for span in listed["spans"])
+
+    detail = (await client.get("/v1/traces/t1")).json()
+    assert [span["input"] for span in detail["spans"]] == [BIG, BIG]
+    assert await resolve_payload(stored[0][0], "test-project") == BIG
+    with pytest.raises(NotFoundError):
+        await resolve_payload(stored[0][0], "other-project")
+
+    tree = (await client.get("/v1/traces/t1/tree")).json()
+    root = tree["nodes"][0]
+    assert root["span"]["input"] == BIG
+    assert root["children"][0]["span"]["input"] == BIG
+
+    patched = (await client.patch("/v1/traces/t1", json={"status": "error"})).json()
+    assert [span["input"] for span in patched["spans"]] == [BIG, BIG]
+
+    # A missing blob leaves its reference in place instead of failing the request.
+    for path in _blob_files(blob_root):
+        path.unlink()
+    res = await client.get("/v1/traces/t1")
+    assert res.status_code == 200
+    assert all(REFERENCE_KEY in span["input"] for span in res.json()["spans"])
+
+
+@pytest.mark.parametrize("offload_min_bytes", [0, 1024])
+@pytest.mark.asyncio
+async def test_client_values_shaped_like_references_round_trip(
+    client, blob_root, monkeypatch, offload_min_bytes
+):
+    monkeypatch.setattr("vigil_server.config.settings.blob_offload_min_bytes", offload_min_bytes)
+    forged = {REFERENCE_KEY: f"sha256:{'a' * 64}", "size": 3}
+    res = await client.post(
+        "/v1/traces",
+        json={"spans": [{"span_id": "s1", "trace_id": "t1", "name": "llm", "input": forged}]},
+    )
+    assert res.status_code == 201
+    detail = await client.get("/v1/traces/t1")
+    assert detail.status_code == 200
+    assert detail.json()["spans"][0]["input"] == forged
+
+
+@pytest.mark.asyncio
+async def test_unreferenced_blobs_are_collected(factory, blob_root, monkeypatch, tmp_path_factory):
+    monkeypatch.setattr("vigil_server.config.settings.blob_gc_grace_minutes", 0)
+    monkeypatch.setattr("vigil_server.config.settings.retention_batch_pause_ms", 0)
+    monkeypatch.setattr("vigil_server.config.settings.cold_storage_after_days", 30)
+    monkeypatch.setattr(
+        "vigil_server.config.settings.cold_storage_dir", str(tmp_path_factory.mktemp("cold"))
+    )
+    old = datetime.now(UTC) - timedelta(days=60)
+
+    async with factory() as session, session.begin():
+        session.add(ProjectSettings(project_id="p", payload_ttl_days=30))
+        for trace_id, payload in (("stripped", BIG), ("archived", {"text": "y" * 4000})):
+            request = IngestRequest.model_validate(
+                {"spans": [{"span_id": trace_id, "trace_id": trace_id, "input": payload}]}
+            )
+            await ingest_spans(session, request, "p")
+            await session.execute(update(Trace).where(Trace.id == trace_id).values(created_at=old))
+        await session.execute(update(Span).where(Span.id == "stripped").values(created_at=old))
+    assert len(_blob_files(blob_root)) == 2
+    assert await collect_blobs(factory) == 0
+
+    # Retention strips the first payload and collects its blob.
+    assert await RetentionService(factory).run_once() == {"payloads_stripped": 1}
+    assert len(_blob_files(blob_root)) == 1
+
+    # Archiving writes the payload into the segment, so its blob goes too.
+    assert await ColdStorage(session_factory=factory).archive_once() == 2
+    assert _blob_files(blob_root) == []
+    async with factory() as session:
+        doc = await get_trace_document(session, "archived")
+    assert doc["spans"][0]["input"] == {"text": "y" * 4000}
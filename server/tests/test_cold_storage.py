@@ -0,0 +1,157 @@
+"""Tests for archiving old traces to cold storage segment files."""
+
+from __future__ import annotations
+
+import gzip
+from datetime import UTC, datetime, timedelta
+
+import orjson
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.models.archived_trace import ArchivedTrace
+from vigil_server.models.span import Span
+from vigil_server.models.trace import Trace
+from vigil_server.schemas.traces import IngestRequest
+from vigil_server.services import cold_storage
+from vigil_server.services.cold_storage import ColdStorage
+from vigil_server.services.trace_service import (
+    build_trace_response,
+    get_trace,
+    get_trace_document,
+    get_trace_version,
+    ingest_spans,
+)
+
+NOW = datetime(2025, 6, 30, tzinfo=UTC)
+
+
+async def _trace(session: AsyncSession, project_id: str, name: str, age_days: int) -> str:
+    request = IngestRequest.model_validate(
+        {
+            "trace_name": name,
+            "spans": [
+                {"span_id": f"{name}-root", "trace_id": name, "name": "agent", "kind": "agent"},
+                {
+                    "span_id": f"{name}-llm",
+                    "trace_id": name,
+                    "parent_span_id": f"{name}-root",
+                    "name": "llm",
+                    "kind": "llm",
+                    "input": {"messages": [{"role": "user", "content": name * 20}]},
+                },
+            ],
+        }
+    )
+    trace_id, _ = await ingest_spans(session, request, project_id)
+    created = NOW - timedelta(days=age_days)
+    await session.execute(update(Trace).where(Trace.id == trace_id).values(created_at=created))
+    return trace_id
+
+
+@pytest.fixture
+def factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def store(factory, tmp_path, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.cold_storage_after_days", 30)
+    monkeypatch.setattr("vigil_server.config.settings.cold_storage_batch_size", 2)
+    monkeypatch.setattr("vigil_server.config.settings.cold_storage_dir", str(tmp_path))
+    return ColdStorage(session_factory=factory)
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_traces_and_reads_them_back(store, factory, tmp_path):
+    async with factory() as session, session.begin():
+        hot = await _trace(session, "p", "hot", 1)
+        old = [
+            await _trace(session, project, f"old{i}", 40 + i)
+            for i, project in enumerate(["p", "p", "q"])
+        ]
+
+    assert await store.archive_once(NOW) == 3
+    assert await store.archive_once(NOW) == 0
+
+    async with factory() as session:
+        remaining = await session.execute(select(Trace.id))
+        assert remaining.scalars().all() == [hot]
+        spans = await session.execute(select(func.count()).select_from(Span))
+        assert spans.scalar() == 2
+        index = (await session.execute(select(ArchivedTrace))).scalars().all()
+        assert {entry.id for entry in index} == set(old)
+
+        doc = await get_trace_document(session, old[0])
+        assert doc["name"] == "old0"
+        assert doc["span_count"] == 2
+        assert {s["parent_span_id"] for s in doc["spans"]} == {None, "old0-root"}
+
+        trace = await get_trace(session, old[2])
+        response = build_trace_response(trace)
+        assert response.project_id == "q"
+        assert response.spans[1].input["messages"][0]["content"] == "old2" * 20
+
+        assert await get_trace_version(session, old[1]) is not None
+        assert await get_trace_document(session, "missing") is None
+        assert await get_trace_version(session, "missing") is None
+
+    # Each segment is a plain compressed NDJSON stream.
+    segments = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert sorted(p.parent.name for p in segments) == ["p", "p", "q"]
+    lines = []
+    for path in segments:
+        raw = path.read_bytes()
+        if path.suffix == ".gz":
+            data = gzip.decompress(raw)
+        else:
+            zstandard = pytest.importorskip("zstandard")
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            data = reader.read()
+        lines += data.splitlines()
+    assert sorted(orjson.loads(line)["id"] for line in lines) == sorted(old)
+
+
+@pytest.mark.asyncio
+async def test_archived_trace_served_by_api(store, factory, client):
+    async with factory() as session, session.begin():
+        trace_id = await _trace(session, "test-project", "archived", 60)
+    assert await store.archive_once(NOW) == 1
+
+    res = await client.get(f"/v1/traces/{trace_id}")
+    assert res.status_code == 200
+    assert res.json()["name"] == "archived"
+    assert len(res.json()["spans"]) == 2
+    assert res.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_trace_changed_while_archiving_is_kept(store, factory, monkeypatch):
+    async with factory() as session, session.begin():
+        changed = await _trace(session, "p", "changed", 40)
+        stable = await _trace(session, "p", "stable", 41)
+
+    run_in_thread = cold_storage.run_in_thread
+
+    async def ingest_then_write(*args):
+        late = IngestRequest.model_validate(
+            {"spans": [{"span_id": "changed-late", "trace_id": changed, "name": "tool"}]}
+        )
+        async with factory() as session, session.begin():
+            await ingest_spans(session, late, "p")
+        monkeypatch.setattr(cold_storage, "run_in_thread", run_in_thread)
+        return await run_in_thread(*args)
+
+    monkeypatch.setattr(cold_storage, "run_in_thread", ingest_then_write)
+    assert await store.archive_once(NOW) == 1
+
+    async with factory() as session:
+        assert (await session.execute(select(Trace.id))).scalars().all() == [changed]
+        assert len((await get_trace(session, changed)).spans) == 3
+        assert (await get_trace_document(session, stable))["span_count"] == 2
+
+    assert await store.archive_once(NOW) == 1
+    async with factory() as session:
+        assert (await get_trace_document(session, changed))["span_count"] == 3
+        assert (await session.execute(select(func.count()).select_from(Span))).scalar() == 0
@@ -0,0 +1,40 @@
+"""Tests for read-only sessions and read routing."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.db.session import ReadOnlySession
+from vigil_server.dependencies import get_read_db
+from vigil_server.exceptions import VigilError
+from vigil_server.main import app
+from vigil_server.models.project import Project
+
+
+@pytest.mark.asyncio
+async def test_read_only_session_rejects_writes(db_engine):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, sync_session_class=ReadOnlySession)
+    async with factory() as session:
+        assert (await session.execute(select(Project))).scalars().all() == []
+        session.add(Project(id="p1", name="nope"))
+        with pytest.raises(VigilError):
+            await session.flush()
+
+
+@pytest.mark.asyncio
+async def test_list_endpoints_use_read_session(client, db_engine):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, sync_session_class=ReadOnlySession)
+    used = []
+
+    async def read_db():
+        async with factory() as session:
+            used.append(session)
+            yield session
+
+    app.dependency_overrides[get_read_db] = read_db
+    for path in ("/v1/traces", "/v1/spans", "/v1/projects", "/v1/drift/summary"):
+        resp = await client.get(path)
+        assert resp.status_code == 200, path
+    assert len(used) == 4
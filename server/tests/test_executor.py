@@ -0,0 +1,68 @@
+"""Tests for the shared blocking/CPU executors."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from vigil_server.exceptions import ServiceBusyError
+from vigil_server.services.drift_detector import analyse_latency_drift
+from vigil_server.services.executor import (
+    BoundedExecutor,
+    run_crypto,
+    run_in_process,
+    run_in_thread,
+    thread_executor,
+)
+
+
+@pytest.mark.asyncio
+async def test_run_in_thread_off_loop():
+    loop_thread = threading.get_ident()
+    worker_thread = await run_in_thread(threading.get_ident)
+    assert worker_thread != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_crypto_pool_is_separate_from_io_pool(monkeypatch):
+    # A saturated I/O pool must not reject or delay password hashing.
+    monkeypatch.setattr(thread_executor, "pending", 10**6)
+    with pytest.raises(ServiceBusyError):
+        await run_in_thread(lambda: None)
+
+    name = await run_crypto(lambda: threading.current_thread().name)
+    assert name.startswith("vigil-crypto")
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_sheds_load():
+    release = threading.Event()
+    executor = BoundedExecutor("test", lambda: ThreadPoolExecutor(max_workers=1), max_pending=1)
+
+    first = asyncio.create_task(executor.run(release.wait))
+    await asyncio.sleep(0)
+    with pytest.raises(ServiceBusyError):
+        await executor.run(lambda: None)
+    assert executor.rejected == 1
+
+    release.set()
+    assert await first is True
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_drift_analysis_in_worker_process():
+    now = datetime.now(UTC)
+    current_start = now - timedelta(hours=1)
+    rows = [("llm", now - timedelta(hours=5), now - timedelta(hours=5) + timedelta(seconds=1))] * 20
+    rows += [("llm", now, now + timedelta(seconds=9))] * 10
+
+    findings = await run_in_process(analyse_latency_drift, rows, current_start)
+    assert findings == analyse_latency_drift(rows, current_start)
+    assert findings[0][0] == "llm"
+    assert findings[0][2] == "high"
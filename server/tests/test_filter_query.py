@@ -0,0 +1,120 @@
+"""Tests for the filter query language on trace and span lists."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from vigil_server.exceptions import VigilError
+from vigil_server.services.filter_query import Term, parse_query, plan_query
+
+NOW = datetime(2025, 6, 30, tzinfo=UTC)
+
+
+def test_parse_query():
+    assert parse_query('kind:llm,tool  duration>=2s -status:ok name!="a b" metadata.user=u1') == [
+        Term("kind", "=", "llm,tool"),
+        Term("duration", ">=", "2s"),
+        Term("status", "=", "ok", negated=True),
+        Term("name", "=", "a b", negated=True),
+        Term("metadata.user", "=", "u1"),
+    ]
+    for bad in ("llm", "kind:", 'name:"open', 'kind:"a"b'):
+        with pytest.raises(VigilError):
+            parse_query(bad)
+
+
+def test_planner_rejects_unbounded_residual_filters():
+    with pytest.raises(VigilError, match="cannot use an index"):
+        plan_query("duration>2s", "spans", "sqlite", now=NOW)
+    with pytest.raises(VigilError, match="cannot use an index"):
+        plan_query("status:error created>-90d", "traces", "sqlite", now=NOW)
+
+    plan = plan_query("kind:llm status:error", "spans", "sqlite", now=NOW)
+    assert plan.residual == []
+    plan = plan_query("duration>2s created>-1d", "spans", "sqlite", now=NOW)
+    assert plan.residual == ["duration>2s"]
+    assert plan.bounded_by is not None
+    plan = plan_query("name:search*", "spans", "sqlite", bounded_by="trace_id", now=NOW)
+    assert plan.bounded_by == "trace_id"
+
+    # Metadata containment is GIN-indexed on PostgreSQL only.
+    with pytest.raises(VigilError):
+        plan_query("name:x metadata.user=u1", "traces", "sqlite", now=NOW)
+    plan = plan_query("name:x metadata.user=u1", "traces", "postgresql", now=NOW)
+    assert plan.bounded_by == "metadata.user=u1"
+
+
+def test_invalid_values():
+    for query in ("kind:bogus", "duration>2", "created>yesterday", "kind>llm", "size:1"):
+        with pytest.raises(VigilError):
+            plan_query(query, "spans", "sqlite", bounded_by="trace_id", now=NOW)
+
+
+def test_postgresql_duration_expression():
+    plan = plan_query("duration>1.5s id:t1", "traces", "postgresql", now=NOW)
+    sql = str(plan.conditions[0].compile(dialect=postgresql.dialect()))
+    assert "EXTRACT(epoch FROM traces.end_time - traces.start_time)" in sql
+
+
+def _span(span_id: str, trace_id: str, **fields) -> dict:
+    return {"span_id": span_id, "trace_id": trace_id, **fields}
+
+
+@pytest.mark.asyncio
+async def test_filter_spans_api(client):
+    start = datetime.now(UTC) - timedelta(minutes=5)
+    spans = [
+        _span("a", "t1", name="search_docs", kind="tool", status="ok"),
+        _span("b", "t1", name="llm-call", kind="llm", status="error"),
+        _span("c", "t1", name="search_web", kind="tool", status="error"),
+    ]
+    for span, seconds in zip(spans, (3, 1, 0.5), strict=True):
+        span["start_time"] = start.isoformat()
+        span["end_time"] = (start + timedelta(seconds=seconds)).isoformat()
+    assert (await client.post("/v1/traces", json={"spans": spans})).status_code == 201
+
+    async def ids(q: str, **params) -> list[str]:
+        res = await client.get("/v1/spans", params={"q": q, **params})
+        assert res.status_code == 200, res.text
+        return sorted(span["id"] for span in res.json()["spans"])
+
+    assert await ids("status:error") == ["b", "c"]
+    assert await ids("kind:tool,llm -status:ok") == ["b", "c"]
+    assert await ids("name:search* created>-1h") == ["a", "c"]
+    assert await ids("duration>2s", trace_id="t1") == ["a"]
+    assert await ids("duration<=1s start>-1h") == ["b", "c"]
+
+    res = await client.get("/v1/spans", params={"q": "name:*web"})
+    assert res.status_code == 422
+    assert "cannot use an index" in res.json()["error"]
+
+
+@pytest.mark.asyncio
+async def test_filter_traces_api(client):
+    for trace_id, kind, metadata in (("t1", "llm", {"user": "u1"}), ("t2", "tool", {"user": "u2"})):
+        res = await client.post(
+            "/v1/traces",
+            json={
+                "trace_name": f"run-{trace_id}",
+                "trace_metadata": metadata,
+                "spans": [_span(f"{trace_id}-s", trace_id, kind=kind)],
+            },
+        )
+        assert res.status_code == 201
+
+    async def ids(q: str, **params) -> list[str]:
+        res = await client.get("/v1/traces", params={"q": q, **params})
+        assert res.status_code == 200, res.text
+        return sorted(trace["id"] for trace in res.json()["traces"])
+
+    assert await ids("kind:tool created>-1d") == ["t2"]
+    assert await ids("metadata.user=u1 created>-1d") == ["t1"]
+    assert await ids("id:t1,t2 name:run-t*") == ["t1", "t2"]
+    start = (datetime.now(UTC) - timedelta(days=1)).isoformat()
+    assert await ids("-name:run-t1", start_date=start) == ["t2"]
+
+    res = await client.get("/v1/traces", params={"q": "kind:tool"})
+    assert res.status_code == 422
@@ -2,7 +2,13 @@
 
 from __future__ import annotations
 
+from datetime import UTC, datetime
+
 import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.services.id_registry import claim_spans, claim_trace
 
 
 @pytest.mark.asyncio
@@ -58,3 +64,79 @@ async def test_ingest_empty_spans(client):
     # Empty spans list — the endpoint may handle this differently,
     # but it should not crash
     assert response.status_code in (201, 422)
+
+
+@pytest.mark.asyncio
+async def test_retried_batch_is_not_duplicated(client):
+    payload = {
+        "spans": [
+            {"span_id": "retry-a", "trace_id": "retry-trace", "name": "a"},
+            {"span_id": "retry-b", "trace_id": "retry-trace", "name": "b"},
+        ]
+    }
+    for _ in range(2):
+        res = await client.post("/v1/traces", json=payload)
+        assert res.status_code == 201
+        assert res.json()["span_count"] == 2
+
+    payload["spans"].append({"span_id": "retry-c", "trace_id": "retry-trace", "name": "c"})
+    assert (await client.post("/v1/traces", json=payload)).status_code == 201
+
+    trace = (await client.get("/v1/traces/retry-trace")).json()
+    assert sorted(s["id"] for s in trace["spans"]) == ["retry-a", "retry-b", "retry-c"]
+
+
+@pytest.mark.asyncio
+async def test_external_id_must_be_unique(client):
+    first = {"spans": [{"span_id": "ext-a", "trace_id": "ext-1"}], "external_id": "run-42"}
+    second = {"spans": [{"span_id": "ext-b", "trace_id": "ext-2"}], "external_id": "run-42"}
+    assert (await client.post("/v1/traces", json=first)).status_code == 201
+    res = await client.post("/v1/traces", json=second)
+    assert res.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_id_claims_are_exclusive(db_engine):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    now = datetime.now(UTC)
+    async with factory() as session, session.begin():
+        assert await claim_trace(session, "t", None, now)
+        assert await claim_spans(session, "t", ["a", "b", "a"], now) == {"a", "b"}
+
+    async with factory() as session, session.begin():
+        assert not await claim_trace(session, "t", None, now)
+        assert await claim_spans(session, "t", ["b", "c"], now) == {"c"}
+
+
+@pytest.mark.asyncio
+async def test_payloads_shaped_like_envelopes_round_trip(client, db_session):
+    """Client values carrying the compression envelope key must not break reads."""
+    poisoned = {"__vigil_z__": 1}
+    forged = {"__vigil_z__": 1, "dict": 0, "data": "not base64!"}
+    res = await client.post(
+        "/v1/traces",
+        json={
+            "spans": [
+                {"span_id": "s1", "trace_id": "t1", "name": "a", "input": poisoned},
+                {"span_id": "s2", "trace_id": "t1", "name": "b", "output": forged},
+            ]
+        },
+    )
+    assert res.status_code == 201
+
+    detail = await client.get("/v1/traces/t1")
+    assert detail.status_code == 200
+    spans = {s["id"]: s for s in detail.json()["spans"]}
+    assert spans["s1"]["input"] == poisoned
+    assert spans["s2"]["output"] == forged
+    for path in ("/v1/traces", "/v1/spans", "/v1/traces/t1/tree"):
+        assert (await client.get(path)).status_code == 200
+
+    # Malformed envelopes stored before values were wrapped are returned as-is.
+    await db_session.execute(
+        text("UPDATE spans SET input = :value WHERE id = 's1'"), {"value": '{"__vigil_z__": 1}'}
+    )
+    db_session.expire_all()
+    detail = await client.get("/v1/traces/t1")
+    assert detail.status_code == 200
+    assert {s["id"]: s for s in detail.json()["spans"]}["s1"]["input"] == poisoned
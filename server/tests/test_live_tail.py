@@ -0,0 +1,106 @@
+"""Tests for live-tail span subscriptions."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from pydantic import ValidationError
+
+from vigil_server.schemas.traces import SpanIngest
+from vigil_server.services.live_tail import TailCoalescer, TailFilter, span_summaries
+from vigil_server.services.websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages: list[dict] = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data: dict):
+        self.messages.append(data)
+
+
+def _span(span_id: str, kind: str = "llm", status: str = "ok", name: str = "call") -> dict:
+    return {"span_id": span_id, "trace_id": "t1", "name": name, "kind": kind, "status": status}
+
+
+def test_filter_matching_and_validation():
+    f = TailFilter.model_validate({"kind": "llm", "name_prefix": "openai."})
+    assert f.kind == ["llm"]
+    assert f.matches(_span("a", name="openai.chat"))
+    assert not f.matches(_span("b", name="anthropic.messages"))
+    assert not f.matches(_span("c", kind="tool", name="openai.chat"))
+    assert TailFilter().matches(_span("d", kind="tool"))
+
+    with pytest.raises(ValidationError):
+        TailFilter.model_validate({"kind": ["nope"]})
+    with pytest.raises(ValidationError):
+        TailFilter.model_validate({"colour": "red"})
+
+
+def test_span_summaries():
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    spans = [
+        SpanIngest(
+            span_id="s1", name="x", start_time=start, end_time=start + timedelta(seconds=1.5)
+        )
+    ]
+    (summary,) = span_summaries("t9", spans)
+    assert summary["trace_id"] == "t9"
+    assert summary["duration_ms"] == 1500.0
+    assert summary["start_time"] == start.isoformat()
+    assert "input" not in summary
+
+
+@pytest.mark.asyncio
+async def test_coalescer_batches_and_caps():
+    emitted: list[dict] = []
+    coalescer = TailCoalescer(TailFilter(), emitted.append, interval_seconds=0.05, max_spans=3)
+
+    for i in range(5):
+        coalescer.offer([_span(f"s{i}")])
+    assert emitted == []
+
+    await asyncio.sleep(0.01)
+    # The first batch is not delayed, later ones wait out the interval.
+    assert len(emitted) == 1
+    assert [s["span_id"] for s in emitted[0]["data"]["spans"]] == ["s0", "s1", "s2"]
+    assert emitted[0]["data"]["dropped"] == 2
+
+    coalescer.offer([_span("s5")])
+    coalescer.offer([_span("s6")])
+    await asyncio.sleep(0.01)
+    assert len(emitted) == 1
+    await asyncio.sleep(0.06)
+    assert len(emitted) == 2
+    assert [s["span_id"] for s in emitted[1]["data"]["spans"]] == ["s5", "s6"]
+
+
+@pytest.mark.asyncio
+async def test_manager_routes_spans_to_subscribers_only(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_tail_interval_ms", 10)
+    mgr = ConnectionManager()
+    tailing = FakeWebSocket()
+    other = FakeWebSocket()
+    await mgr.connect(tailing, "proj-1")
+    await mgr.connect(other, "proj-1")
+
+    assert not mgr.wants_spans("proj-1")
+    mgr.subscribe_tail(tailing, TailFilter(status=["error"]))
+    assert mgr.wants_spans("proj-1")
+    assert not mgr.wants_spans("proj-2")
+
+    await mgr.publish_spans("proj-1", [_span("a", status="ok"), _span("b", status="error")])
+    await mgr.publish_spans("proj-1", [_span("c", status="error")])
+    await asyncio.sleep(0.05)
+
+    assert other.messages == []
+    batches = [m for m in tailing.messages if m["type"] == "spans.batch"]
+    assert [s["span_id"] for b in batches for s in b["data"]["spans"]] == ["b", "c"]
+
+    mgr.unsubscribe_tail(tailing)
+    assert not mgr.wants_spans("proj-1")
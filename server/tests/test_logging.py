@@ -0,0 +1,84 @@
+"""Tests for structured, queued logging."""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+
+from vigil_server.logging_config import (
+    ContextQueueHandler,
+    DebugRateLimitFilter,
+    StructuredFormatter,
+)
+from vigil_server.middleware.request_id import _request_id_ctx
+
+
+def _record(msg: str, *args, level: int = logging.INFO, name: str = "vigil_server.test"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_queued_record_keeps_request_id_and_message():
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = ContextQueueHandler(log_queue)
+
+    token = _request_id_ctx.set("req-123")
+    try:
+        handler.handle(_record("ingested %d spans", 3))
+    finally:
+        _request_id_ctx.reset(token)
+
+    # Formatted later, outside the request context (as on the listener thread).
+    entry = json.loads(StructuredFormatter().format(log_queue.get_nowait()))
+    assert entry["message"] == "ingested 3 spans"
+    assert entry["request_id"] == "req-123"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "vigil_server.test"
+
+
+def test_queued_record_carries_formatted_exception():
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = ContextQueueHandler(log_queue)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record("failed")
+        record.exc_info = sys.exc_info()
+    handler.handle(record)
+
+    queued = log_queue.get_nowait()
+    assert queued.exc_info is None
+    assert "ValueError: boom" in json.loads(StructuredFormatter().format(queued))["exception"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = ContextQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record("one"))
+    handler.handle(_record("two"))
+    assert handler.dropped == 1
+
+
+def test_debug_rate_limit_reports_suppressed(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("vigil_server.logging_config.time.monotonic", lambda: now[0])
+    limiter = DebugRateLimitFilter(max_per_second=2)
+
+    passed = [limiter.filter(_record("hot %s", i, level=logging.DEBUG)) for i in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Other levels and other call sites are not limited.
+    assert limiter.filter(_record("hot %s", 0, level=logging.INFO))
+    assert limiter.filter(_record("cold", level=logging.DEBUG))
+
+    now[0] += 1.0
+    record = _record("hot %s", 9, level=logging.DEBUG)
+    assert limiter.filter(record)
+    assert record.suppressed == 3
+    assert json.loads(StructuredFormatter().format(record))["suppressed"] == 3
+
+
+def test_debug_rate_limit_sites_are_bounded():
+    limiter = DebugRateLimitFilter(max_per_second=1, max_sites=3)
+    for i in range(10):
+        assert limiter.filter(_record(f"dynamic {i}", level=logging.DEBUG))
+    assert len(limiter._sites) == 3
@@ -0,0 +1,57 @@
+"""Tests for the event-loop lag monitor."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from vigil_server.metrics import EVENT_LOOP_LAG
+from vigil_server.services.loop_monitor import LoopMonitor
+
+
+def _block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_monitor_captures_blocking_stack():
+    monitor = LoopMonitor(interval_seconds=0.01, threshold_seconds=0.05, max_offenders=5)
+    observed = EVENT_LOOP_LAG.labels().count
+    await monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        _block_the_loop(0.2)
+        await asyncio.sleep(0.03)
+    finally:
+        await monitor.stop()
+
+    snapshot = monitor.snapshot()
+    assert not snapshot["running"]
+    assert snapshot["max_lag_ms"] >= 100
+    (offender,) = snapshot["offenders"]
+    assert offender["blocked_ms"] >= 100
+    assert "_block_the_loop" in offender["stack"]
+    assert EVENT_LOOP_LAG.labels().count > observed
+
+
+@pytest.mark.asyncio
+async def test_monitor_ignores_short_pauses():
+    monitor = LoopMonitor(interval_seconds=0.01, threshold_seconds=0.5)
+    await monitor.start()
+    try:
+        await asyncio.sleep(0.02)
+        _block_the_loop(0.02)
+        await asyncio.sleep(0.02)
+    finally:
+        await monitor.stop()
+    assert monitor.snapshot()["offenders"] == []
+
+
+@pytest.mark.asyncio
+async def test_event_loop_debug_endpoint(client, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.debug_token", "tok")
+    resp = await client.get("/debug/event-loop", headers={"X-Debug-Token": "tok"})
+    assert resp.status_code == 200
+    assert {"last_lag_ms", "max_lag_ms", "offenders"} <= resp.json().keys()
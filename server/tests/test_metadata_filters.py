@@ -0,0 +1,75 @@
+"""Tests for ``metadata.<key>=<value>`` filters on trace and span lists."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from vigil_server.db.json_filters import containment_document, metadata_condition
+from vigil_server.exceptions import VigilError
+from vigil_server.models.trace import Trace
+
+
+async def _ingest(client, trace_id: str, metadata: dict) -> None:
+    res = await client.post(
+        "/v1/traces",
+        json={
+            "trace_name": trace_id,
+            "trace_metadata": metadata,
+            "spans": [
+                {
+                    "span_id": f"{trace_id}-s",
+                    "trace_id": trace_id,
+                    "name": "llm",
+                    "metadata": metadata,
+                }
+            ],
+        },
+    )
+    assert res.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_filter_traces_and_spans_by_metadata(client):
+    await _ingest(client, "t1", {"env": "prod", "user": {"id": "u1"}})
+    await _ingest(client, "t2", {"env": "prod", "user": {"id": "u2"}})
+    await _ingest(client, "t3", {"env": "dev"})
+
+    res = await client.get("/v1/traces", params={"metadata.env": "prod"})
+    assert res.status_code == 200
+    assert res.json()["total"] == 2
+    assert {t["id"] for t in res.json()["traces"]} == {"t1", "t2"}
+
+    res = await client.get("/v1/traces", params={"metadata.env": "prod", "metadata.user.id": "u2"})
+    assert [t["id"] for t in res.json()["traces"]] == ["t2"]
+
+    res = await client.get("/v1/spans", params={"metadata.user.id": "u1"})
+    assert res.json()["total"] == 1
+    assert res.json()["spans"][0]["trace_id"] == "t1"
+
+    res = await client.get("/v1/spans", params={"metadata.env": "staging"})
+    assert res.json()["total"] == 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_metadata_filter_key(client):
+    res = await client.get("/v1/traces", params={"metadata.a b": "x"})
+    assert res.status_code == 422
+    res = await client.get("/v1/spans", params={"metadata.": "x"})
+    assert res.status_code == 422
+
+
+def test_containment_document_merges_nested_keys():
+    assert containment_document({"env": "prod", "user.id": "u1", "user.org": "o"}) == {
+        "env": "prod",
+        "user": {"id": "u1", "org": "o"},
+    }
+    with pytest.raises(VigilError):
+        containment_document({"user": "u1", "user.id": "u1"})
+
+
+def test_postgresql_filter_uses_jsonb_containment():
+    condition = metadata_condition(Trace.metadata_, {"user.id": "u1"}, "postgresql")
+    sql = str(condition.compile(dialect=postgresql.dialect()))
+    assert "@>" in sql
+    assert "AS JSONB" in sql
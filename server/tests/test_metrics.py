@@ -0,0 +1,66 @@
+"""Tests for the Prometheus metrics module and endpoint."""
+
+from __future__ import annotations
+
+import pytest
+
+from vigil_server.metrics import Counter, Histogram, _Metric
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1.0), registered=False)
+    child = h.labels('/a"b')
+    for value in (0.05, 0.5, 0.5, 5.0):
+        child.observe(value)
+
+    text = h.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a\\"b",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{route="/a\\"b"} 4' in text
+    assert 'test_latency_seconds_sum{route="/a\\"b"} 6.05' in text
+
+
+def test_counter_label_arity_is_checked():
+    c = Counter("test_things_total", "Test.", ("kind",), registered=False)
+    c.labels("x").inc(2)
+    assert 'test_things_total{kind="x"} 2' in c.render()
+    with pytest.raises(ValueError):
+        c.labels("x", "y")
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("test_abstract", "Test.", registered=False)  # type: ignore[abstract]
+
+
+@pytest.mark.asyncio
+async def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.metrics_token", "scrape-secret")
+    assert (await client.get("/metrics")).status_code == 401
+    res = await client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+    assert res.status_code == 401
+    res = await client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    payload = {"spans": [{"span_id": "m1", "trace_id": "metrics-trace", "name": "s"}]}
+    res = await client.post("/v1/traces", json=payload)
+    assert res.status_code == 201
+    await client.get("/v1/traces/metrics-trace")
+    await client.request("BREW", "/v1/traces")
+
+    res = await client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = res.text
+    assert 'vigil_http_requests_total{method="POST",route="/v1/traces",status="201"}' in body
+    assert 'route="/v1/traces/{trace_id}"' in body
+    assert 'method="other"' in body
+    assert "BREW" not in body
+    assert "vigil_ingest_spans_total" in body
+    assert "vigil_ingest_batch_size_count" in body
+    assert "vigil_ws_connections 0" in body
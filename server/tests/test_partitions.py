@@ -0,0 +1,58 @@
+"""Tests for partition planning (the SQL side needs PostgreSQL)."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import pytest
+
+from vigil_server.services.partitions import PartitionMaintainer, parse_bound, plan
+
+
+def _day(d: int) -> datetime:
+    return datetime(2025, 3, d, tzinfo=UTC)
+
+
+def test_parse_bound():
+    p = parse_bound(
+        "spans_p20250301",
+        "FOR VALUES FROM ('2025-03-01 00:00:00+00') TO ('2025-03-02 00:00:00+00')",
+    )
+    assert (p.lower, p.upper) == (_day(1), _day(2))
+
+    legacy = parse_bound("spans_legacy", "FOR VALUES FROM (MINVALUE) TO ('2025-02-28 19:00:00-05')")
+    assert legacy.lower is None
+    assert legacy.upper == _day(1)
+
+    assert parse_bound("spans_default", "DEFAULT") is None
+
+
+def test_plan_creates_missing_days_and_drops_expired():
+    existing = [
+        parse_bound("spans_legacy", "FOR VALUES FROM (MINVALUE) TO ('2025-03-02 00:00:00+00')"),
+        parse_bound(
+            "spans_p20250302",
+            "FOR VALUES FROM ('2025-03-02 00:00:00+00') TO ('2025-03-03 00:00:00+00')",
+        ),
+        parse_bound(
+            "spans_p20250310",
+            "FOR VALUES FROM ('2025-03-10 00:00:00+00') TO ('2025-03-11 00:00:00+00')",
+        ),
+    ]
+    now = datetime(2025, 3, 8, 15, 30, tzinfo=UTC)
+
+    to_create, to_drop = plan(existing, now, premake_days=3, retention_days=0)
+    assert to_create == [_day(8), _day(9), _day(11)]
+    assert to_drop == []
+
+    _, to_drop = plan(existing, now, premake_days=3, retention_days=6)
+    # Cutoff is 2025-03-02: only partitions ending on or before it go.
+    assert to_drop == ["spans_legacy"]
+
+
+@pytest.mark.asyncio
+async def test_maintainer_is_inert_on_sqlite(db_engine):
+    maintainer = PartitionMaintainer(db_engine)
+    await maintainer.start()
+    assert maintainer._task is None
+    await maintainer.stop()
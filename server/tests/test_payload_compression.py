@@ -0,0 +1,104 @@
+"""Tests for compressed span payload storage and trained dictionaries."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import orjson
+import pytest
+from sqlalchemy import select, text
+
+from vigil_server.db import compression
+from vigil_server.db.compression import ENVELOPE_KEY, PayloadCodec
+from vigil_server.models.span import Span
+from vigil_server.schemas.traces import IngestRequest
+from vigil_server.services import payload_dictionaries
+from vigil_server.services.payload_dictionaries import load_dictionaries, train_dictionary
+from vigil_server.services.trace_service import get_trace_document, ingest_spans
+
+pytest.importorskip("zstandard")
+
+
+def _messages(i: int) -> dict:
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "You are a careful support agent for Acme. " * 4},
+            {"role": "user", "content": f"Order {i} arrived damaged, ticket {i * 7919}."},
+        ],
+        "tools": [{"type": "function", "function": {"name": "lookup_order", "id": i}}],
+    }
+
+
+@pytest.fixture
+def codec(monkeypatch):
+    codec = PayloadCodec()
+    monkeypatch.setattr(compression, "payload_codec", codec)
+    monkeypatch.setattr(payload_dictionaries, "payload_codec", codec)
+    monkeypatch.setattr("vigil_server.config.settings.payload_compression_min_bytes", 256)
+    return codec
+
+
+async def _ingest(session, trace_id: str, count: int, offset: int = 0) -> None:
+    spans = [
+        {
+            "span_id": f"{trace_id}-{i}",
+            "trace_id": trace_id,
+            "name": "llm",
+            "kind": "llm",
+            "input": _messages(offset + i),
+            "output": {"text": "ok"},
+        }
+        for i in range(count)
+    ]
+    await ingest_spans(session, IngestRequest.model_validate({"spans": spans}), "p")
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_stored_compressed(codec, db_session):
+    await _ingest(db_session, "t1", 3)
+    await db_session.flush()
+
+    raw = await db_session.execute(text("SELECT input, output FROM spans"))
+    for stored_input, stored_output in raw.all():
+        envelope = orjson.loads(stored_input)
+        assert envelope[ENVELOPE_KEY] == 1
+        assert envelope["dict"] == 0
+        assert len(stored_input) < len(orjson.dumps(_messages(0)))
+        assert orjson.loads(stored_output) == {"text": "ok"}  # below the threshold
+
+    db_session.expunge_all()
+    doc = await get_trace_document(db_session, "t1")
+    assert [s["input"] for s in doc["spans"]] == [_messages(i) for i in range(3)]
+
+
+@pytest.mark.asyncio
+async def test_trained_dictionary_activates_after_delay(codec, db_session, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.payload_dictionary_size_kb", 4)
+    await _ingest(db_session, "before", 200)
+    await db_session.flush()
+
+    dictionary = await train_dictionary(db_session)
+    assert dictionary.sample_count >= 200
+    assert codec.active_dictionary == 0  # readable everywhere before it is used
+
+    await load_dictionaries(db_session, now=datetime.now(UTC) + timedelta(hours=1))
+    assert codec.active_dictionary == dictionary.id
+
+    await _ingest(db_session, "after", 2, offset=500)
+    await db_session.flush()
+    db_session.expunge_all()
+
+    raw = await db_session.execute(
+        text("SELECT input FROM spans WHERE trace_id = 'after' ORDER BY id")
+    )
+    assert {orjson.loads(v)["dict"] for (v,) in raw.all()} == {dictionary.id}
+
+    # A fresh worker loads every dictionary and reads both generations.
+    fresh = PayloadCodec()
+    monkeypatch.setattr(compression, "payload_codec", fresh)
+    monkeypatch.setattr(payload_dictionaries, "payload_codec", fresh)
+    await load_dictionaries(db_session)
+    inputs = (await db_session.execute(select(Span.input).order_by(Span.id))).scalars().all()
+    assert _messages(500) in inputs
+    assert _messages(0) in inputs
@@ -0,0 +1,58 @@
+"""Tests for pool configuration and checkout instrumentation."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from vigil_server.db.pool import InstrumentedPool, engine_options, pool_status
+from vigil_server.metrics import DB_POOL_SLOW_CHECKOUTS
+
+
+def test_engine_options(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.db_pool_size", 3)
+    monkeypatch.setattr("vigil_server.config.settings.db_statement_timeout_ms", 5000)
+    monkeypatch.setattr("vigil_server.config.settings.db_statement_cache_size", 0)
+
+    assert "poolclass" not in engine_options("sqlite+aiosqlite://", "primary")
+
+    opts = engine_options("postgresql+asyncpg://u:p@db/vigil", "read")
+    assert issubclass(opts["poolclass"], InstrumentedPool)
+    assert opts["poolclass"].engine_name == "read"
+    assert opts["pool_size"] == 3
+    assert opts["connect_args"] == {
+        "statement_cache_size": 0,
+        "server_settings": {"statement_timeout": "5000"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_blocked_checkout_is_measured_and_logged(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr("vigil_server.config.settings.db_pool_size", 1)
+    monkeypatch.setattr("vigil_server.config.settings.db_max_overflow", 0)
+    monkeypatch.setattr("vigil_server.config.settings.db_pool_checkout_warn_ms", 20)
+    url = f"sqlite+aiosqlite:///{tmp_path}/pool.db"
+    engine = create_async_engine(url, **engine_options(url, "pooltest"))
+    slow_before = DB_POOL_SLOW_CHECKOUTS.labels("pooltest").value
+
+    async def hold(seconds: float) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(seconds)
+
+    try:
+        holder = asyncio.create_task(hold(0.1))
+        await asyncio.sleep(0.02)
+        assert pool_status(engine.pool)["checked_out"] == 1
+        with caplog.at_level(logging.WARNING, logger="vigil_server.db.pool"):
+            await hold(0)
+        await holder
+    finally:
+        await engine.dispose()
+
+    assert DB_POOL_SLOW_CHECKOUTS.labels("pooltest").value == slow_before + 1
+    assert any("pooltest database connection" in r.getMessage() for r in caplog.records)
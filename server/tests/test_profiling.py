@@ -0,0 +1,125 @@
+"""Tests for opt-in request profiling and the /debug endpoints."""
+
+from __future__ import annotations
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from vigil_server.dependencies import get_current_project, get_db, get_optional_project, get_read_db
+from vigil_server.main import create_app
+from vigil_server.middleware.profiling import ProfilingMiddleware
+from vigil_server.services.profiling import ProfileStore, tracemalloc_diff
+
+TOKEN = "s3cret"
+
+
+@pytest_asyncio.fixture
+async def debug_client(db_session, monkeypatch):
+    """Client for an app built with profiling switched on."""
+    monkeypatch.setattr("vigil_server.config.settings.debug_token", TOKEN)
+    app = create_app()
+
+    async def override_get_db():
+        yield db_session
+
+    async def override_get_project():
+        return "test-project"
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_current_project] = override_get_project
+    app.dependency_overrides[get_optional_project] = override_get_project
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+def test_profiling_middleware_not_installed_by_default():
+    app = create_app()
+    assert all(m.cls is not ProfilingMiddleware for m in app.user_middleware)
+
+
+@pytest.mark.asyncio
+async def test_debug_endpoints_hidden_without_token(client):
+    resp = await client.get("/debug/profiles")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_profile_header_records_profile_and_queries(debug_client):
+    resp = await debug_client.get("/v1/traces", headers={"X-Vigil-Profile": TOKEN})
+    assert resp.status_code == 200
+    profile_id = resp.headers["X-Vigil-Profile-Id"]
+    assert profile_id == resp.headers["X-Request-ID"]
+    assert "queries" in resp.headers["Server-Timing"]
+
+    # Unprofiled requests are left alone.
+    plain = await debug_client.get("/v1/traces", headers={"X-Vigil-Profile": "wrong"})
+    assert "X-Vigil-Profile-Id" not in plain.headers
+
+    assert (await debug_client.get("/debug/profiles")).status_code == 403
+    listing = await debug_client.get("/debug/profiles", headers={"X-Debug-Token": TOKEN})
+    (summary,) = [p for p in listing.json()["profiles"] if p["request_id"] == profile_id]
+    assert summary["path"] == "/v1/traces"
+    assert summary["status"] == 200
+    assert summary["queries"] >= 1
+
+    report = await debug_client.get(
+        f"/debug/profiles/{profile_id}", headers={"X-Debug-Token": TOKEN}
+    )
+    assert report.status_code == 200
+    assert "cumulative" in report.text
+
+
+@pytest.mark.asyncio
+async def test_tracemalloc_diff(debug_client):
+    headers = {"X-Debug-Token": TOKEN}
+    try:
+        first = await debug_client.post("/debug/tracemalloc", headers=headers)
+        assert first.json()["status"] == "started"
+        _garbage = [bytearray(1024) for _ in range(200)]
+        second = await debug_client.post("/debug/tracemalloc?limit=5", headers=headers)
+        body = second.json()
+        assert body["status"] == "diff"
+        assert len(body["top"]) <= 5
+        assert body["traced_bytes"] > 0
+    finally:
+        tracemalloc_diff.stop()
+
+
+def test_armed_profiling_counts_down_by_prefix():
+    store = ProfileStore(max_profiles=2)
+    store.arm(2, "/v1/traces")
+    assert not store.take_armed("/v1/projects")
+    assert store.take_armed("/v1/traces/abc")
+    assert store.take_armed("/v1/traces")
+    assert not store.take_armed("/v1/traces")
+
+    assert store.acquire()
+    assert not store.acquire()
+    store.release()
+    assert store.acquire()
+
+
+@pytest.mark.asyncio
+async def test_armed_slot_kept_while_profiler_is_busy(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.debug_token", TOKEN)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    store = ProfileStore(max_profiles=2)
+    middleware = ProfilingMiddleware(app, store=store)
+    store.arm(1, "/v1")
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as ac:
+        assert store.acquire()  # another request is being profiled
+        busy = await ac.get("/v1/traces")
+        assert "X-Vigil-Profile-Id" not in busy.headers
+        assert store.armed()["remaining"] == 1
+
+        store.release()
+        profiled = await ac.get("/v1/traces")
+        assert "X-Vigil-Profile-Id" in profiled.headers
+        assert store.armed()["remaining"] == 0
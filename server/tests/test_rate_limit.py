@@ -0,0 +1,98 @@
+"""Tests for the request-ID and rate-limit middleware."""
+
+from __future__ import annotations
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from vigil_server.middleware.rate_limit import RateLimitMiddleware, rate_limit_key
+from vigil_server.middleware.request_id import RequestIDMiddleware, get_request_id
+from vigil_server.services.auth_cache import auth_cache
+from vigil_server.services.shared_state import MemoryBackend
+
+
+async def _echo_request_id(request):
+    return PlainTextResponse(get_request_id() or "")
+
+
+def _app(capacity: int, monkeypatch) -> RateLimitMiddleware:
+    monkeypatch.setattr("vigil_server.config.settings.rate_limit_requests", capacity)
+    inner = Starlette(routes=[Route("/", _echo_request_id)])
+    return RateLimitMiddleware(RequestIDMiddleware(inner), backend=MemoryBackend())
+
+
+@pytest.mark.asyncio
+async def test_request_id_propagated_and_generated(monkeypatch):
+    app = _app(10, monkeypatch)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        res = await ac.get("/", headers={"X-Request-ID": "abc123"})
+        assert res.headers["X-Request-ID"] == "abc123"
+        assert res.text == "abc123"
+
+        res = await ac.get("/")
+        assert res.headers["X-Request-ID"] == res.text
+        assert len(res.text) == 32
+
+    assert get_request_id() is None
+
+
+@pytest.fixture
+def known_keys():
+    for token in ("key-a", "key-b"):
+        auth_cache.set(token, "proj-1")
+    yield
+    for token in ("key-a", "key-b"):
+        auth_cache.invalidate_token(token)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("known_keys")
+async def test_rate_limit_per_api_key(monkeypatch):
+    app = _app(2, monkeypatch)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        key_a = {"Authorization": "Bearer key-a"}
+        assert (await ac.get("/", headers=key_a)).status_code == 200
+        assert (await ac.get("/", headers=key_a)).status_code == 200
+        limited = await ac.get("/", headers=key_a)
+        assert limited.status_code == 429
+        assert int(limited.headers["Retry-After"]) >= 1
+
+        # Another key from the same address has its own bucket.
+        assert (await ac.get("/", headers={"Authorization": "Bearer key-b"})).status_code == 200
+
+
+def test_rate_limit_key_modes():
+    scope = {
+        "type": "http",
+        "headers": [(b"authorization", b"Bearer tok-1")],
+        "client": ("1.2.3.4", 5000),
+    }
+    assert rate_limit_key(scope, "ip") == "ip:1.2.3.4"
+    assert rate_limit_key({**scope, "headers": []}, "api_key") == "ip:1.2.3.4"
+
+    # Unresolved and rejected tokens share the client's IP bucket.
+    assert rate_limit_key(scope, "api_key") == "ip:1.2.3.4"
+    assert rate_limit_key(scope, "project") == "ip:1.2.3.4"
+    auth_cache.set("tok-1", None)
+    assert rate_limit_key(scope, "api_key") == "ip:1.2.3.4"
+
+    auth_cache.set("tok-1", "proj-9")
+    try:
+        assert rate_limit_key(scope, "api_key").startswith("token:")
+        assert rate_limit_key(scope, "project") == "project:proj-9"
+    finally:
+        auth_cache.invalidate_token("tok-1")
+
+
+@pytest.mark.asyncio
+async def test_random_tokens_share_the_ip_bucket(monkeypatch):
+    app = _app(2, monkeypatch)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        statuses = [
+            (await ac.get("/", headers={"Authorization": f"Bearer junk-{i}"})).status_code
+            for i in range(3)
+        ]
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,181 @@
+"""Tests for per-project retention: payload stripping, compaction and deletion."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.models.project_settings import ProjectSettings
+from vigil_server.models.replay import ReplayRun
+from vigil_server.models.span import Span
+from vigil_server.models.trace import Trace
+from vigil_server.schemas.traces import IngestRequest
+from vigil_server.services.retention import RetentionService
+from vigil_server.services.trace_service import build_trace_response, get_trace, ingest_spans
+
+NOW = datetime(2025, 6, 30, tzinfo=UTC)
+
+
+async def _trace(session: AsyncSession, project_id: str, name: str, age_days: int) -> str:
+    request = IngestRequest.model_validate(
+        {
+            "spans": [
+                {
+                    "span_id": f"{name}-root",
+                    "trace_id": name,
+                    "name": "agent",
+                    "kind": "agent",
+                    "input": {"prompt": "hi"},
+                    "start_time": "2025-01-01T00:00:00Z",
+                    "end_time": "2025-01-01T00:00:02Z",
+                },
+                {
+                    "span_id": f"{name}-llm",
+                    "trace_id": name,
+                    "parent_span_id": f"{name}-root",
+                    "name": "llm",
+                    "kind": "llm",
+                    "status": "error",
+                    "output": {"text": "hello"},
+                    "start_time": "2025-01-01T00:00:00.500Z",
+                    "end_time": "2025-01-01T00:00:01Z",
+                },
+            ]
+        }
+    )
+    trace_id, _ = await ingest_spans(session, request, project_id)
+    created = NOW - timedelta(days=age_days)
+    await session.execute(update(Trace).where(Trace.id == trace_id).values(created_at=created))
+    await session.execute(update(Span).where(Span.trace_id == trace_id).values(created_at=created))
+    return trace_id
+
+
+@pytest.fixture
+def factory(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_retention_applies_each_ttl(factory, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.retention_batch_size", 1)
+    monkeypatch.setattr("vigil_server.config.settings.retention_batch_pause_ms", 0)
+    async with factory() as session, session.begin():
+        session.add(
+            ProjectSettings(
+                project_id="p", payload_ttl_days=7, raw_span_ttl_days=30, summary_ttl_days=90
+            )
+        )
+        fresh = await _trace(session, "p", "fresh", 1)
+        old_payload = await _trace(session, "p", "week", 10)
+        compact = await _trace(session, "p", "month", 40)
+        expired = await _trace(session, "p", "year", 365)
+        session.add(ReplayRun(original_trace_id=expired))
+        untouched = await _trace(session, "other", "other", 365)
+
+    totals = await RetentionService(factory).run_once(NOW)
+    assert totals == {"traces_deleted": 1, "traces_compacted": 1, "payloads_stripped": 2}
+
+    async with factory() as session:
+        fresh_trace = await get_trace(session, fresh)
+        assert fresh_trace.spans[0].input == {"prompt": "hi"}
+
+        stripped = build_trace_response(await get_trace(session, old_payload))
+        assert stripped.span_count == 2
+        assert all(s.input is None and s.output is None for s in stripped.spans)
+        assert {s.parent_span_id for s in stripped.spans} == {None, "week-root"}
+
+        compacted = build_trace_response(await get_trace(session, compact))
+        assert compacted.spans == []
+        assert compacted.span_count == 2
+        assert compacted.summary["error_count"] == 1
+        assert compacted.summary["kinds"] == {"agent": 1, "llm": 1}
+        assert compacted.summary["duration_ms"] == 2000
+
+        assert await session.get(Trace, expired) is None
+        orphans = await session.execute(
+            select(func.count()).select_from(Span).where(Span.trace_id == expired)
+        )
+        assert orphans.scalar() == 0
+        replays = await session.execute(select(func.count()).select_from(ReplayRun))
+        assert replays.scalar() == 0
+
+        assert (await get_trace(session, untouched)).spans[0].input == {"prompt": "hi"}
+
+    # A second run has nothing left to do.
+    assert await RetentionService(factory).run_once(NOW) == {}
+
+    # Deleted traces release their ids, so they can be ingested again.
+    async with factory() as session, session.begin():
+        await _trace(session, "p", "year", 0)
+    async with factory() as session:
+        assert len((await get_trace(session, expired)).spans) == 2
+
+
+async def test_settings_ttls_can_be_set_and_cleared(client):
+    project_id = (await client.post("/v1/projects", json={"name": "Kept"})).json()["id"]
+    res = await client.put(
+        f"/v1/projects/{project_id}/settings",
+        json={"payload_ttl_days": 7, "raw_span_ttl_days": 30},
+    )
+    assert res.status_code == 200
+    assert res.json()["payload_ttl_days"] == 7
+    assert res.json()["summary_ttl_days"] is None
+
+    res = await client.put(f"/v1/projects/{project_id}/settings", json={"payload_ttl_days": None})
+    assert res.json()["payload_ttl_days"] is None
+    assert res.json()["raw_span_ttl_days"] == 30
+
+    res = await client.put(f"/v1/projects/{project_id}/settings", json={"summary_ttl_days": 0})
+    assert res.status_code == 422
+
+    res = await client.put(
+        f"/v1/projects/{project_id}/settings",
+        json={"payload_ttl_days": 60, "raw_span_ttl_days": 30},
+    )
+    assert res.status_code == 422
+    # Conflicts with the stored raw_span_ttl_days of 30.
+    res = await client.put(f"/v1/projects/{project_id}/settings", json={"summary_ttl_days": 10})
+    assert res.status_code == 422
+    res = await client.get(f"/v1/projects/{project_id}/settings")
+    assert res.json()["summary_ttl_days"] is None
+
+
+async def test_late_spans_of_compacted_trace_are_counted_then_pruned(factory, monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.retention_batch_pause_ms", 0)
+    async with factory() as session, session.begin():
+        session.add(ProjectSettings(project_id="p", raw_span_ttl_days=30))
+        trace_id = await _trace(session, "p", "late", 40)
+    assert await RetentionService(factory).run_once(NOW) == {"traces_compacted": 1}
+
+    late = IngestRequest.model_validate(
+        {
+            "spans": [
+                {
+                    "span_id": "late-tool",
+                    "trace_id": trace_id,
+                    "name": "tool",
+                    "kind": "tool",
+                    "status": "error",
+                    "start_time": "2025-01-01T00:00:03Z",
+                }
+            ]
+        }
+    )
+    async with factory() as session, session.begin():
+        await ingest_spans(session, late, "p")
+    async with factory() as session:
+        merged = build_trace_response(await get_trace(session, trace_id))
+    assert merged.span_count == 3
+    assert merged.summary["error_count"] == 2
+    assert merged.summary["kinds"] == {"agent": 1, "llm": 1, "tool": 1}
+    assert [s.id for s in merged.spans] == ["late-tool"]
+
+    later = datetime.now(UTC) + timedelta(days=31)
+    assert await RetentionService(factory).run_once(later) == {"late_spans_deleted": 1}
+    async with factory() as session:
+        pruned = build_trace_response(await get_trace(session, trace_id))
+    assert pruned.spans == []
+    assert pruned.span_count == 3
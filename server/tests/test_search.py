@@ -0,0 +1,122 @@
+"""Tests for full-text search over span payloads."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.exceptions import VigilError
+from vigil_server.models.project_settings import ProjectSettings
+from vigil_server.models.span_search import span_search
+from vigil_server.services.retention import RetentionService
+from vigil_server.services.search import (
+    SearchTerm,
+    extract_text,
+    fts5_match,
+    parse_query,
+    search_spans,
+    tsquery,
+)
+
+
+def _span(span_id: str, trace_id: str, text: str, **extra) -> dict:
+    return {
+        "span_id": span_id,
+        "trace_id": trace_id,
+        "name": "llm",
+        "kind": "llm",
+        "input": {"messages": [{"role": "user", "content": text}]},
+        **extra,
+    }
+
+
+async def _ingest(client, *spans: dict) -> None:
+    res = await client.post("/v1/traces", json={"spans": list(spans)})
+    assert res.status_code == 201
+
+
+def test_parse_query():
+    assert parse_query('refund "order number" cust*  !!') == [
+        SearchTerm("refund"),
+        SearchTerm("order number"),
+        SearchTerm("cust", prefix=True),
+    ]
+    with pytest.raises(VigilError):
+        parse_query(' "" ** ')
+    assert fts5_match('p"1', [SearchTerm("a"), SearchTerm("b", prefix=True)]) == (
+        'project_id : "p""1" AND content : ("a" "b"*)'
+    )
+
+
+def test_extract_text_walks_values(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.search_max_text_chars", 12)
+    assert extract_text("llm", {"a": ["hello", 3, {"b": "world"}]}, None) == "llm\nhello\nwo"
+
+
+def test_postgresql_query_uses_tsquery():
+    sql = str(
+        tsquery([SearchTerm("order number"), SearchTerm("cust", prefix=True)]).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "phraseto_tsquery" in sql
+    assert "to_tsquery" in sql
+    assert "&&" in sql
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_highlights_and_scopes(client):
+    await _ingest(
+        client,
+        _span("s1", "t1", "The customer asked for a refund on order 42"),
+        _span("s2", "t1", "refund refund refund, the refund policy allows a refund"),
+        _span("s3", "t1", "Unrelated <b>weather</b> chatter"),
+    )
+
+    res = await client.get("/v1/spans/search", params={"q": "refund"})
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [r["span_id"] for r in results] == ["s2", "s1"]
+    assert results[0]["trace_id"] == "t1"
+    assert "<mark>refund</mark>" in results[1]["snippet"]
+    assert results[0]["score"] >= results[1]["score"]
+
+    res = await client.get("/v1/spans/search", params={"q": '"order 42" cust*'})
+    assert [r["span_id"] for r in res.json()["results"]] == ["s1"]
+
+    res = await client.get("/v1/spans/search", params={"q": "weather"})
+    snippet = res.json()["results"][0]["snippet"]
+    assert "Unrelated &lt;b&gt;<mark>weather</mark>&lt;/b&gt; chatter" in snippet
+
+    res = await client.get("/v1/spans/search", params={"q": "***"})
+    assert res.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_is_project_scoped(client, db_session):
+    await _ingest(client, _span("s1", "t1", "shared phrase"))
+    assert await search_spans(db_session, "other-project", "shared") == []
+    hits = await search_spans(db_session, "test-project", "shared")
+    assert [hit["span_id"] for hit in hits] == ["s1"]
+
+    later = datetime.now(UTC) + timedelta(hours=1)
+    assert await search_spans(db_session, "test-project", "shared", start_date=later) == []
+
+
+@pytest.mark.asyncio
+async def test_retention_removes_index_entries(client, db_engine):
+    await _ingest(client, _span("s1", "t1", "secret payload"), _span("s2", "t1", "other"))
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session, session.begin():
+        session.add(ProjectSettings(project_id="test-project", payload_ttl_days=1))
+
+    await RetentionService(session_factory=factory).run_once(datetime.now(UTC) + timedelta(days=2))
+
+    async with factory() as session:
+        count = await session.execute(select(func.count()).select_from(span_search))
+        assert count.scalar() == 0
+        assert await search_spans(session, "test-project", "secret") == []
@@ -0,0 +1,57 @@
+"""Tests for the fast JSON response path."""
+
+from __future__ import annotations
+
+import json
+import uuid
+from datetime import UTC, datetime
+
+import pytest
+
+from vigil_server.schemas.traces import SpanResponse, TraceResponse
+from vigil_server.serialization import dumps
+
+
+def test_dumps_matches_pydantic_datetime_format():
+    ts = datetime(2024, 1, 1, 12, 30, tzinfo=UTC)
+    assert json.loads(dumps({"t": ts}))["t"] == "2024-01-01T12:30:00Z"
+
+
+def test_dumps_falls_back_for_big_integers():
+    big = 2**70
+    assert json.loads(dumps({"n": big})) == {"n": big}
+
+
+@pytest.mark.asyncio
+async def test_trace_detail_matches_response_schema(client):
+    """The row-level read path should produce a valid TraceResponse."""
+    trace_id = uuid.uuid4().hex
+    await client.post(
+        "/v1/traces",
+        json={
+            "spans": [
+                {
+                    "span_id": uuid.uuid4().hex,
+                    "trace_id": trace_id,
+                    "name": "llm-call",
+                    "kind": "llm",
+                    "input": {"messages": [{"role": "user", "content": "hi"}]},
+                    "metadata": {"model": "gpt-4o"},
+                    "start_time": "2024-01-01T00:00:00Z",
+                }
+            ],
+            "trace_name": "schema",
+        },
+    )
+
+    res = await client.get(f"/v1/traces/{trace_id}")
+    assert res.status_code == 200
+    trace = TraceResponse.model_validate(res.json())
+    assert trace.span_count == 1
+    assert trace.spans[0].metadata == {"model": "gpt-4o"}
+
+    res = await client.get(f"/v1/spans?trace_id={trace_id}")
+    assert res.status_code == 200
+    span = SpanResponse.model_validate(res.json()["spans"][0])
+    assert span.events == []
+    assert span.input == {"messages": [{"role": "user", "content": "hi"}]}
@@ -0,0 +1,212 @@
+"""Tests for the shared-state backends and the shared auth-cache tier."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from vigil_server.models.project import APIKey, Project
+from vigil_server.services import auth_service, shared_state
+from vigil_server.services.auth_cache import auth_cache
+from vigil_server.services.auth_service import (
+    invalidate_project_tokens,
+    invalidate_project_tokens_on_commit,
+    resolve_token_project,
+)
+from vigil_server.services.shared_state import MemoryBackend, RedisBackend
+
+
+class _SharedMemoryBackend(MemoryBackend):
+    """In-process backend that claims to be shared, to exercise the shared code paths."""
+
+    shared = True
+
+
+@pytest.fixture
+def shared_backend():
+    backend = _SharedMemoryBackend()
+    shared_state.set_backend(backend)
+    auth_cache.clear()
+    yield backend
+    shared_state.set_backend(None)
+    auth_cache.clear()
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def backend(request):
+    """Each backend implementation, run against the same contract tests."""
+    if request.param == "memory":
+        yield MemoryBackend()
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Lua scripting for the token bucket
+    redis_backend = RedisBackend(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    yield redis_backend
+    await redis_backend.close()
+
+
+@pytest.mark.asyncio
+async def test_backend_token_bucket(backend):
+    assert await backend.take_token("k", 2, 60) == 0
+    assert await backend.take_token("k", 2, 60) == 0
+    retry = await backend.take_token("k", 2, 60)
+    assert 0 < retry <= 30
+    # Buckets are independent.
+    assert await backend.take_token("other", 2, 60) == 0
+
+
+@pytest.mark.asyncio
+async def test_backend_values(backend):
+    assert await backend.get("missing") is None
+    await backend.set("k", "v", 60)
+    await backend.set("ignored", "v", 0)
+    assert await backend.get("k") == "v"
+    assert await backend.get("ignored") is None
+    await backend.delete("k", "missing")
+    await backend.delete()
+    assert await backend.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_backend_token_index(backend):
+    await backend.add_to_index("idx", "b", 60)
+    await backend.add_to_index("idx", "a", 60)
+    await backend.add_to_index("idx", "a", 60)
+    assert await backend.pop_index("idx") == ["a", "b"]
+    assert await backend.pop_index("idx") == []
+
+
+@pytest.mark.asyncio
+async def test_backend_pubsub_fan_out(backend):
+    first = await backend.subscribe("chan")
+    second = await backend.subscribe("chan")
+    other = await backend.subscribe("other")
+    await backend.publish("chan", b"hello")
+
+    assert await asyncio.wait_for(anext(first), 1) == b"hello"
+    assert await asyncio.wait_for(anext(second), 1) == b"hello"
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(anext(other), 0.1)
+
+    await first.close()
+    await backend.publish("chan", b"again")
+    assert await asyncio.wait_for(anext(second), 1) == b"again"
+    await second.close()
+    await other.close()
+
+
+@pytest.mark.asyncio
+async def test_token_buckets_are_bounded():
+    backend = MemoryBackend(max_buckets=3)
+    for i in range(10):
+        assert await backend.take_token(f"ip:10.0.0.{i}", 5, 60) == 0
+    assert backend.bucket_count == 3
+
+
+@pytest.mark.asyncio
+async def test_refilled_buckets_are_swept(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("vigil_server.services.shared_state.time.monotonic", lambda: clock[0])
+
+    backend = MemoryBackend()
+    await backend.take_token("a", 1, 10)
+    await backend.take_token("b", 1, 10)
+    assert await backend.take_token("a", 1, 10) > 0
+
+    clock[0] += 11
+    assert await backend.take_token("c", 1, 10) == 0
+    assert backend.bucket_count == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_values_and_index(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("vigil_server.services.shared_state.time.monotonic", lambda: clock[0])
+
+    backend = MemoryBackend()
+    await backend.set("k", "v", 5)
+    await backend.add_to_index("idx", "k", 5)
+    await backend.add_to_index("idx", "k2", 5)
+    assert await backend.get("k") == "v"
+    assert await backend.pop_index("idx") == ["k", "k2"]
+    assert await backend.pop_index("idx") == []
+
+    clock[0] += 6
+    assert await backend.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_survives_local_eviction(db_session, shared_backend):
+    project = Project(name="shared")
+    db_session.add(project)
+    await db_session.flush()
+    key = APIKey(project_id=project.id, name="k")
+    db_session.add(key)
+    await db_session.flush()
+
+    assert await resolve_token_project(key.key, db_session) == project.id
+
+    # Another worker: empty local cache, no database access needed.
+    auth_cache.clear()
+    assert await resolve_token_project(key.key, session=None) == project.id
+
+
+@pytest.mark.asyncio
+async def test_invalidation_clears_shared_tier(db_session, shared_backend):
+    project = Project(name="rotated")
+    db_session.add(project)
+    await db_session.flush()
+    key = APIKey(project_id=project.id, name="k")
+    db_session.add(key)
+    await db_session.flush()
+
+    assert await resolve_token_project(key.key, db_session) == project.id
+    key.is_active = False
+    await db_session.flush()
+    await invalidate_project_tokens(project.id, [key.key])
+
+    assert await resolve_token_project(key.key, db_session) is None
+
+
+class _BrokenBackend(_SharedMemoryBackend):
+    async def pop_index(self, index: str) -> list[str]:
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_invalidation_survives_backend_errors(db_session):
+    shared_state.set_backend(_BrokenBackend())
+    try:
+        await invalidate_project_tokens("p", ["token"])
+    finally:
+        shared_state.set_backend(None)
+
+
+@pytest.mark.asyncio
+async def test_rotation_invalidates_only_after_commit(db_engine, shared_backend):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session, session.begin():
+        project = Project(name="rotating")
+        session.add(project)
+        await session.flush()
+        key = APIKey(project_id=project.id, name="k")
+        session.add(key)
+
+    async with factory() as session:
+        assert await resolve_token_project(key.key, session) == project.id
+
+    async with factory() as session:
+        async with session.begin():
+            stored = await session.get(APIKey, key.id)
+            stored.is_active = False
+            invalidate_project_tokens_on_commit(session, project.id, [key.key])
+            # Not committed yet: the cached resolution is still served.
+            assert auth_cache.get(key.key) == (True, project.id)
+        await asyncio.gather(*auth_service._pending_invalidations)
+
+    assert auth_cache.get(key.key) == (False, None)
+    assert await shared_backend.get(auth_service._shared_token_key(key.key)) is None
+    async with factory() as session:
+        assert await resolve_token_project(key.key, session) is None
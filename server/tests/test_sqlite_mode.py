@@ -0,0 +1,139 @@
+"""Tests for SQLite high-throughput mode: pragmas and the batching writer."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from vigil_server.db.sqlite import apply_pragmas, is_file_sqlite
+from vigil_server.exceptions import ServiceBusyError, VigilError
+from vigil_server.models import Base
+from vigil_server.models.span import Span
+from vigil_server.schemas.traces import IngestRequest
+from vigil_server.services.sqlite_writer import SQLiteWriter
+from vigil_server.services.trace_service import ingest_spans
+
+
+def _request(trace_id: str, span_id: str) -> IngestRequest:
+    return IngestRequest.model_validate(
+        {"spans": [{"span_id": span_id, "trace_id": trace_id, "name": "step"}]}
+    )
+
+
+def test_is_file_sqlite():
+    assert is_file_sqlite("sqlite+aiosqlite:///./vigil.db")
+    assert not is_file_sqlite("sqlite+aiosqlite://")
+    assert not is_file_sqlite("postgresql+asyncpg://u:p@db/vigil")
+
+
+@pytest.mark.asyncio
+async def test_pragmas_enable_wal_and_read_only_pool(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path}/fast.db"
+    writer = create_async_engine(url)
+    reader = create_async_engine(url)
+    apply_pragmas(writer)
+    apply_pragmas(reader, query_only=True)
+    try:
+        async with writer.begin() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM t"))).scalar() == 0
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO t VALUES (1)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+
+@pytest.mark.asyncio
+async def test_writer_batches_concurrent_ingests(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path}/batch.db"
+    engine = create_async_engine(url)
+    apply_pragmas(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    commits = 0
+    original = factory.__call__
+
+    def counting_factory():
+        nonlocal commits
+        commits += 1
+        return original()
+
+    writer = SQLiteWriter(max_batch=50, wait_seconds=0.01)
+    await writer.start(counting_factory)  # type: ignore[arg-type]
+    try:
+        results = await asyncio.gather(
+            *(
+                writer.submit(lambda s, i=i: ingest_spans(s, _request(f"t{i % 3}", f"s{i}"), "p"))
+                for i in range(30)
+            )
+        )
+        assert sorted(r[0] for r in results) == sorted(f"t{i % 3}" for i in range(30))
+        assert commits < 30
+
+        # A failing job (reused external_id) fails alone; its batch-mates commit.
+        taken = _request("tx", "ext-span")
+        taken.external_id = "ext-1"
+        await writer.submit(lambda s: ingest_spans(s, taken, "p"))
+        clash = _request("ty", "clash-span")
+        clash.external_id = "ext-1"
+        ok, retried, dup = await asyncio.gather(
+            writer.submit(lambda s: ingest_spans(s, _request("t9", "fresh"), "p")),
+            writer.submit(lambda s: ingest_spans(s, _request("t0", "s0"), "p")),
+            writer.submit(lambda s: ingest_spans(s, clash, "p")),
+            return_exceptions=True,
+        )
+        assert ok == ("t9", 1)
+        assert retried == ("t0", 1)  # already ingested: accepted, not duplicated
+        assert isinstance(dup, VigilError)
+        assert dup.status_code == 409
+    finally:
+        await writer.stop()
+
+    async with factory() as session:
+        assert (await session.execute(select(func.count()).select_from(Span))).scalar() == 32
+    await engine.dispose()
+    assert not writer.running
+    with pytest.raises(VigilError):
+        await writer.submit(lambda s: ingest_spans(s, _request("t1", "late"), "p"))
+
+
+@pytest.mark.asyncio
+async def test_writer_sheds_load_when_queue_is_full():
+    release = asyncio.Event()
+
+    async def blocked(session):
+        await release.wait()
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def begin(self):
+            return self
+
+    writer = SQLiteWriter(max_batch=1, wait_seconds=0, max_queue=1)
+    await writer.start(_Session)  # type: ignore[arg-type]
+    try:
+        running = asyncio.create_task(writer.submit(blocked))
+        await asyncio.sleep(0)  # the writer takes the first job
+        queued = asyncio.create_task(writer.submit(blocked))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceBusyError):
+            await writer.submit(blocked)
+        release.set()
+        await asyncio.gather(running, queued)
+    finally:
+        await writer.stop()
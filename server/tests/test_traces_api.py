@@ -6,6 +6,8 @@ import uuid
 
 import pytest
 
+from vigil_server.middleware.compression import _choose_encoding
+
 
 @pytest.mark.asyncio
 async def test_list_traces_empty(client):
@@ -181,3 +183,179 @@ async def test_ingest_with_external_id(client):
     trace_id = res.json()["trace_id"]
     get_res = await client.get(f"/v1/traces/{trace_id}")
     assert get_res.json()["external_id"] == "ext-123"
+
+
+async def _ingest_tree(client) -> str:
+    """Ingest root -> (a, b), a -> (a1, a2, a3) and return the trace id."""
+    trace_id = uuid.uuid4().hex
+    spans = [
+        {"span_id": "root", "trace_id": trace_id, "name": "root", "kind": "agent"},
+        {"span_id": "a", "trace_id": trace_id, "parent_span_id": "root", "name": "a"},
+        {"span_id": "b", "trace_id": trace_id, "parent_span_id": "root", "name": "b"},
+    ]
+    spans += [
+        {"span_id": f"a{i}", "trace_id": trace_id, "parent_span_id": "a", "name": f"a{i}"}
+        for i in range(1, 4)
+    ]
+    res = await client.post("/v1/traces", json={"spans": spans, "trace_name": "tree"})
+    assert res.status_code == 201
+    return trace_id
+
+
+@pytest.mark.asyncio
+async def test_span_tree_depth_and_child_counts(client):
+    """GET /v1/traces/{id}/tree should nest spans up to the depth limit."""
+    trace_id = await _ingest_tree(client)
+
+    res = await client.get(f"/v1/traces/{trace_id}/tree?depth=2")
+    assert res.status_code == 200
+    data = res.json()
+    assert data["total"] == 1
+    root = data["nodes"][0]
+    assert root["span"]["id"] == "root"
+    assert root["child_count"] == 2
+    by_id = {c["span"]["id"]: c for c in root["children"]}
+    assert set(by_id) == {"a", "b"}
+    # Third level is not expanded but its size is reported
+    assert by_id["a"]["child_count"] == 3
+    assert by_id["a"]["children"] == []
+
+
+@pytest.mark.asyncio
+async def test_span_tree_lazy_expansion(client):
+    """A subtree can be paged by passing its span id as parent_span_id."""
+    trace_id = await _ingest_tree(client)
+
+    res = await client.get(f"/v1/traces/{trace_id}/tree?parent_span_id=a&depth=1&offset=1&limit=1")
+    assert res.status_code == 200
+    data = res.json()
+    assert data["total"] == 3
+    assert len(data["nodes"]) == 1
+    assert data["nodes"][0]["child_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_span_tree_children_limit(client):
+    """children_limit caps the expanded children while child_count stays exact."""
+    trace_id = await _ingest_tree(client)
+
+    res = await client.get(f"/v1/traces/{trace_id}/tree?depth=3&children_limit=1")
+    root = res.json()["nodes"][0]
+    assert root["child_count"] == 2
+    assert len(root["children"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_span_tree_not_found(client):
+    """GET /v1/traces/{id}/tree should return 404 for nonexistent trace."""
+    res = await client.get("/v1/traces/nonexistent/tree")
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_trace_conditional(client):
+    """GET /v1/traces/{id} should return 304 until the trace changes."""
+    trace_id = uuid.uuid4().hex
+    span = {"span_id": uuid.uuid4().hex, "trace_id": trace_id, "name": "s", "kind": "custom"}
+    await client.post("/v1/traces", json={"spans": [span], "trace_name": "etag"})
+
+    first = await client.get(f"/v1/traces/{trace_id}")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+
+    cached = await client.get(f"/v1/traces/{trace_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Ingesting another span into the trace invalidates the ETag
+    span2 = {"span_id": uuid.uuid4().hex, "trace_id": trace_id, "name": "s2", "kind": "custom"}
+    await client.post("/v1/traces", json={"spans": [span2]})
+    fresh = await client.get(f"/v1/traces/{trace_id}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert len(fresh.json()["spans"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_list_endpoints_conditional(client):
+    """Trace and span listings should honour If-None-Match."""
+    await client.post(
+        "/v1/traces",
+        json={"spans": [{"span_id": uuid.uuid4().hex, "name": "s", "kind": "custom"}]},
+    )
+    for url in ("/v1/traces", "/v1/spans"):
+        first = await client.get(url)
+        etag = first.headers["etag"]
+        cached = await client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+    await client.post(
+        "/v1/traces",
+        json={"spans": [{"span_id": uuid.uuid4().hex, "name": "s", "kind": "custom"}]},
+    )
+    for url in ("/v1/traces", "/v1/spans"):
+        res = await client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_list_etag_depends_on_page_and_filters(client):
+    """A validator for one page or filter must not match another."""
+    await client.post(
+        "/v1/traces",
+        json={"spans": [{"span_id": uuid.uuid4().hex, "name": "s", "kind": "custom"}]},
+    )
+    for url in ("/v1/traces", "/v1/spans"):
+        etag = (await client.get(url, params={"limit": 1})).headers["etag"]
+        for params in ({"limit": 1, "offset": 1}, {"limit": 2}, {"limit": 1, "status": "ok"}):
+            res = await client.get(url, params=params, headers={"If-None-Match": etag})
+            assert res.status_code == 200
+        # Parameter order does not matter.
+        res = await client.get(f"{url}?offset=0&limit=1", headers={"If-None-Match": etag})
+        assert (
+            await client.get(f"{url}?limit=1&offset=0", headers={"If-None-Match": etag})
+        ).headers["etag"] == res.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed(client):
+    """Responses above the size threshold should be gzip-encoded."""
+    trace_id = uuid.uuid4().hex
+    span = {
+        "span_id": uuid.uuid4().hex,
+        "trace_id": trace_id,
+        "name": "big",
+        "kind": "llm",
+        "input": {"prompt": "hello " * 1000},
+    }
+    await client.post("/v1/traces", json={"spans": [span]})
+
+    res = await client.get(f"/v1/traces/{trace_id}", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.num_bytes_downloaded < 6000
+    assert res.json()["spans"][0]["input"]["prompt"].startswith("hello")
+
+    small = await client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+@pytest.mark.asyncio
+async def test_large_response_prefers_brotli(client):
+    """Clients accepting br should get brotli when the package is installed."""
+    pytest.importorskip("brotli")
+    await client.post(
+        "/v1/traces",
+        json={"spans": [{"span_id": uuid.uuid4().hex, "name": "x" * 500, "kind": "custom"}]},
+    )
+    res = await client.get("/v1/traces", headers={"Accept-Encoding": "gzip, br"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "br"
+    assert res.json()["total"] == 1
+
+
+def test_accept_encoding_zero_quality_is_a_refusal():
+    assert _choose_encoding("gzip;q=0.0") is None
+    assert _choose_encoding("gzip; q=0.000, identity") is None
+    assert _choose_encoding("gzip;q=0.5") == "gzip"
+    assert _choose_encoding("gzip;q=bogus") is None
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+
 import pytest
 
-from vigil_server.services.websocket_manager import ConnectionManager
+from vigil_server.services.shared_state import MemoryBackend
+from vigil_server.services.websocket_manager import BROADCAST_CHANNEL, ConnectionManager
 
 
 class FakeWebSocket:
@@ -27,6 +31,24 @@ class FakeWebSocket:
         self.closed = True
 
 
+class BlockedWebSocket(FakeWebSocket):
+    """A client that never finishes receiving."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def send_json(self, data: dict):
+        await self.release.wait()
+        await super().send_json(data)
+
+
+async def _settle():
+    """Let per-connection sender tasks run."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
 @pytest.mark.asyncio
 async def test_connect_disconnect():
     mgr = ConnectionManager()
@@ -47,6 +69,7 @@ async def test_broadcast():
     await mgr.connect(ws2, "proj-1")
 
     await mgr.broadcast("proj-1", {"type": "test", "data": {}})
+    await _settle()
     assert len(ws1.messages) == 1
     assert len(ws2.messages) == 1
     assert ws1.messages[0]["type"] == "test"
@@ -61,6 +84,7 @@ async def test_broadcast_different_projects():
     await mgr.connect(ws2, "proj-2")
 
     await mgr.broadcast("proj-1", {"type": "test", "data": {}})
+    await _settle()
     assert len(ws1.messages) == 1
     assert len(ws2.messages) == 0  # Different project
 
@@ -77,6 +101,7 @@ async def test_broadcast_prunes_dead_connections():
     ws2.closed = True
 
     await mgr.broadcast("proj-1", {"type": "test", "data": {}})
+    await _settle()
     assert mgr.connection_count("proj-1") == 1
     assert len(ws1.messages) == 1
 
@@ -99,3 +124,163 @@ async def test_connection_count_total():
     assert mgr.connection_count() == 2
     assert mgr.connection_count("proj-1") == 1
     assert mgr.connection_count("proj-2") == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_block_broadcast():
+    mgr = ConnectionManager()
+    slow = BlockedWebSocket()
+    fast = FakeWebSocket()
+    await mgr.connect(slow, "proj-1")
+    await mgr.connect(fast, "proj-1")
+
+    await asyncio.wait_for(mgr.broadcast("proj-1", {"type": "test", "data": {}}), timeout=0.1)
+    await _settle()
+    assert len(fast.messages) == 1
+    assert slow.messages == []
+
+    slow.release.set()
+    await _settle()
+    assert len(slow.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_is_disconnected(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_send_timeout_seconds", 0.01)
+    mgr = ConnectionManager()
+    stalled = BlockedWebSocket()
+    await mgr.connect(stalled, "proj-1")
+
+    await mgr.broadcast("proj-1", {"type": "test", "data": {}})
+    for _ in range(50):
+        if mgr.connection_count("proj-1") == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert mgr.connection_count("proj-1") == 0
+    assert mgr.stats()["send_timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_coalesces_and_drops(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_send_queue_size", 3)
+    mgr = ConnectionManager()
+    ws = BlockedWebSocket()
+    await mgr.connect(ws, "proj-1")
+
+    # The first message is taken by the sender task, which then blocks.
+    await mgr.broadcast("proj-1", {"type": "test", "data": {"n": 0}})
+    await _settle()
+
+    await mgr.broadcast("proj-1", {"type": "trace.new", "data": {"trace_id": "t1", "n": 1}})
+    await mgr.broadcast("proj-1", {"type": "trace.new", "data": {"trace_id": "t1", "n": 2}})
+    for n in range(3, 6):
+        await mgr.broadcast("proj-1", {"type": "test", "data": {"n": n}})
+
+    stats = mgr.stats()
+    assert stats["coalesced"] == 1
+    assert stats["dropped"] == 1
+    assert stats["queued"] == 3
+
+    ws.release.set()
+    await _settle()
+    assert [m["data"]["n"] for m in ws.messages] == [0, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_pings_and_reaps_idle(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_idle_timeout_seconds", 60)
+    mgr = ConnectionManager()
+    alive = FakeWebSocket()
+    idle = FakeWebSocket()
+    await mgr.connect(alive, "proj-1")
+    await mgr.connect(idle, "proj-1")
+    mgr._clients[idle].last_seen -= 120
+
+    await mgr._heartbeat()
+    await _settle()
+
+    assert mgr.connection_count("proj-1") == 1
+    assert alive.messages == [{"type": "ping"}]
+    assert mgr.stats()["reaped"] == 1
+
+
+class StalledCloseWebSocket(FakeWebSocket):
+    """A client whose close handshake never completes."""
+
+    async def close(self, code: int = 1000):
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_does_not_wait_on_stalled_close(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_send_timeout_seconds", 0.05)
+    mgr = ConnectionManager()
+    stalled = StalledCloseWebSocket()
+    await mgr.connect(stalled, "proj-1")
+    mgr._clients[stalled].last_seen -= 10_000
+
+    await asyncio.wait_for(mgr._heartbeat(), timeout=1)
+    assert mgr.connection_count("proj-1") == 0
+
+
+class _SharedMemoryBackend(MemoryBackend):
+    """In-process pub/sub standing in for Redis."""
+
+    shared = True
+
+
+@pytest.mark.asyncio
+async def test_broadcast_fans_out_across_workers():
+    backend = _SharedMemoryBackend()
+    worker_a = ConnectionManager(backend=backend)
+    worker_b = ConnectionManager(backend=backend)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        ws_a = FakeWebSocket()
+        ws_b = FakeWebSocket()
+        await worker_a.connect(ws_a, "proj-1")
+        await worker_b.connect(ws_b, "proj-1")
+
+        # Raised on worker A, delivered on both.
+        await worker_a.broadcast("proj-1", {"type": "trace.new", "data": {"n": 1}})
+        await worker_a.broadcast("proj-1", {"type": "trace.new", "data": {"n": 2}})
+        for _ in range(50):
+            if len(ws_a.messages) == 2 and len(ws_b.messages) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        assert [m["data"]["n"] for m in ws_b.messages] == [1, 2]
+        assert [m["data"]["n"] for m in ws_a.messages] == [1, 2]
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_broadcasts_are_batched():
+    backend = _SharedMemoryBackend()
+    subscription = await backend.subscribe(BROADCAST_CHANNEL)
+    mgr = ConnectionManager(backend=backend)
+    await mgr.start()
+    try:
+        for i in range(5):
+            await mgr.broadcast("proj-1", {"type": "test", "data": {"i": i}})
+        payload = await asyncio.wait_for(subscription.__anext__(), timeout=1)
+        assert len(json.loads(payload)["messages"]) == 5
+    finally:
+        await mgr.stop()
+        await subscription.close()
+
+
+@pytest.mark.asyncio
+async def test_outbox_is_bounded(monkeypatch):
+    monkeypatch.setattr("vigil_server.config.settings.ws_outbox_size", 3)
+    mgr = ConnectionManager(backend=_SharedMemoryBackend())
+    # Fan-out enabled but the publish loop never runs, as when Redis stalls.
+    mgr._fanout = mgr._backend
+    for i in range(5):
+        await mgr.broadcast("proj-1", {"type": "test", "data": {"i": i}})
+
+    assert [message["data"]["i"] for _, message in mgr._outbox] == [2, 3, 4]
+    assert mgr.stats()["dropped"] == 2